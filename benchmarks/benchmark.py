@@ -0,0 +1,269 @@
+"""
+Measures how much time Contexts itself spends running a large suite of trivial specs,
+split into discovery, importing (with assertion rewriting), dispatch and reporting.
+
+Each measurement is taken in a fresh interpreter, with the normal plugins,
+and the best of several runs is kept. Importing is measured twice: 'cold',
+with no rewritten bytecode cached, and 'warm', once the cache has been filled.
+
+    python benchmarks/benchmark.py --save    # on the master branch, to record a baseline
+    python benchmarks/benchmark.py           # on your branch, to compare against it
+
+Exits with code 1 if any phase got slower than the baseline by more than the tolerance.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, 'baseline.json')
+
+# (phase, the unit its time is divided by)
+PHASES = [
+    ('discovery', 'files'),
+    ('import_cold', 'files'),
+    ('import_warm', 'files'),
+    ('dispatch', 'contexts'),
+    ('reporting', 'assertions'),
+]
+
+
+SPEC_TEMPLATE = """\
+class WhenBenchmarking{index}:
+    def establish_the_number(self):
+        self.number = 1
+
+    def because_we_add_one(self):
+        self.number += 1
+
+{assertions}
+    def cleanup_the_number(self):
+        del self.number
+
+"""
+
+ASSERTION_TEMPLATE = """\
+    def it_should_be_two_{index}(self):
+        assert self.number == 2
+
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the overhead of the Contexts test runner.")
+    parser.add_argument('--files', type=int, default=500, help="Number of spec files to generate. (Default: 500)")
+    parser.add_argument('--classes', type=int, default=4, help="Number of spec classes in each file. (Default: 4)")
+    parser.add_argument('--assertions', type=int, default=3, help="Number of assertions in each class. (Default: 3)")
+    parser.add_argument('--files-per-folder', type=int, default=50, help="Number of spec files in each folder. (Default: 50)")
+    parser.add_argument('--repeat', type=int, default=3, help="Number of times to measure each phase. (Default: 3)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, metavar='FILE', help="Baseline file to compare against (or save to).")
+    parser.add_argument('--save', action='store_true', help="Save the results as the new baseline instead of comparing.")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown before a phase counts as a regression. (Default: 0.25)")
+    parser.add_argument('--measure', metavar='FOLDER', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure is not None:
+        json.dump(measure(args.measure), sys.stdout)
+        return
+
+    sizes = {
+        'files': args.files,
+        'contexts': args.files * args.classes,
+        'assertions': args.files * args.classes * args.assertions
+    }
+    with tempfile.TemporaryDirectory() as tempdir:
+        specs = os.path.join(tempdir, 'specs')
+        generate(specs, args.files, args.classes, args.assertions, args.files_per_folder)
+        seconds = run_benchmarks(specs, tempdir, args.repeat)
+
+    results = {
+        'python': platform.python_implementation() + ' ' + platform.python_version(),
+        'sizes': sizes,
+        'seconds': seconds,
+        'per_unit': {phase: seconds[phase] / sizes[unit] for phase, unit in PHASES}
+    }
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print_results(results)
+        print("Saved baseline to " + args.baseline)
+        return
+
+    baseline = load_baseline(args.baseline)
+    regressions = print_results(results, baseline, args.tolerance)
+    if baseline is None:
+        print()
+        print("No baseline found - run with --save to record one.")
+    sys.exit(1 if regressions else 0)
+
+
+def generate(folder, files, classes, assertions, files_per_folder):
+    for i in range(files):
+        subfolder = os.path.join(folder, 'specs_{}'.format(i // files_per_folder))
+        os.makedirs(subfolder, exist_ok=True)
+        with open(os.path.join(subfolder, 'test_module_{}.py'.format(i)), 'w') as f:
+            for j in range(classes):
+                assertion_source = ''.join(ASSERTION_TEMPLATE.format(index=k) for k in range(assertions))
+                f.write(SPEC_TEMPLATE.format(index=j, assertions=assertion_source))
+
+
+def run_benchmarks(specs, tempdir, repeat):
+    env = dict(os.environ, CONTEXTS_CACHE_DIR=os.path.join(tempdir, 'cache'))
+    # the warm measurements need the rewritten bytecode to be cached
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    measurements = []
+    for _ in range(repeat):
+        clear_bytecode(specs)
+        cold = run_measurement(specs, env)
+        warm = run_measurement(specs, env)
+        cold['import_cold'] = cold.pop('import')
+        warm['import_warm'] = warm.pop('import')
+        measurements.extend([cold, warm])
+
+    return {phase: min(m[phase] for m in measurements if phase in m) for phase, _ in PHASES}
+
+
+def clear_bytecode(folder):
+    for parent, dirnames, _ in os.walk(folder):
+        if '__pycache__' in dirnames:
+            shutil.rmtree(os.path.join(parent, '__pycache__'))
+            dirnames.remove('__pycache__')
+
+
+def run_measurement(specs, env):
+    output = subprocess.check_output([sys.executable, __file__, '--measure', specs], env=env)
+    return json.loads(output.decode('utf-8'))
+
+
+def measure(specs):
+    from contexts import run_with_plugins
+    from contexts.plugin_discovery import load_plugins
+
+    timer = PhaseTimer()
+    real_stdout = sys.stdout
+    sys.argv = ['contexts', specs, '--no-random']
+    # the reporters pick up sys.stdout when they're created
+    sys.stdout = io.StringIO()
+    try:
+        plugins = [TimedPlugin(p, timer) if is_reporter(p) else p for p in load_plugins()]
+        plugins.insert(0, timer)
+        run_with_plugins(plugins)
+    finally:
+        sys.stdout = real_stdout
+
+    return timer.results()
+
+
+def is_reporter(plugin):
+    return type(plugin).__module__.startswith('contexts.plugins.reporting')
+
+
+class PhaseTimer(object):
+    """
+    Notes when each phase of the test run starts, and adds up the time spent in the reporters.
+    """
+    def __init__(self):
+        self.times = {}
+        self.reporting = 0
+        self.reporting_before_dispatch = 0
+        self.reporting_before_end = 0
+
+    def test_run_started(self):
+        self.times['started'] = time.perf_counter()
+
+    def process_module_specification_list(self, specifications):
+        self.times['discovered'] = time.perf_counter()
+
+    def process_module_list(self, modules):
+        self.times['imported'] = time.perf_counter()
+        self.reporting_before_dispatch = self.reporting
+
+    def test_run_ended(self):
+        self.times['ended'] = time.perf_counter()
+        self.reporting_before_end = self.reporting
+
+    def results(self):
+        t = self.times
+        return {
+            'discovery': t['discovered'] - t['started'],
+            'import': t['imported'] - t['discovered'],
+            'dispatch': t['ended'] - t['imported'] - (self.reporting_before_end - self.reporting_before_dispatch),
+            'reporting': self.reporting
+        }
+
+
+class TimedPlugin(object):
+    """
+    Wraps a plugin, adding the time spent in each of its hooks to the timer.
+    """
+    def __init__(self, plugin, timer):
+        self.plugin = plugin
+        self.timer = timer
+
+    def __getattr__(self, name):
+        method = getattr(self.plugin, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.timer.reporting += time.perf_counter() - start
+        return timed
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def print_results(results, baseline=None, tolerance=0):
+    sizes = results['sizes']
+    print("{files} files, {contexts} contexts, {assertions} assertions ({python})".format(python=results['python'], **sizes))
+    if baseline is not None and baseline['sizes'] != sizes:
+        print("The baseline was recorded for {files} files, {contexts} contexts, {assertions} assertions; "
+              "comparing the time per unit.".format(**baseline['sizes']))
+    print()
+
+    header = "{:<12} {:>10} {:>16}".format("phase", "total", "per unit")
+    if baseline is not None:
+        header += " {:>16} {:>8}".format("baseline", "change")
+    print(header)
+
+    regressions = []
+    for phase, unit in PHASES:
+        per_unit = results['per_unit'][phase]
+        line = "{:<12} {:>9.3f}s {:>16}".format(phase, results['seconds'][phase], format_per_unit(per_unit, unit))
+        if baseline is not None:
+            old = baseline['per_unit'][phase]
+            change = per_unit / old - 1 if old else 0
+            line += " {:>16} {:>+7.0%}".format(format_per_unit(old, unit), change)
+            if change > tolerance:
+                line += "  SLOWER"
+                regressions.append(phase)
+        print(line)
+
+    if regressions:
+        print()
+        print("Slower than the baseline by more than {:.0%}: {}".format(tolerance, ', '.join(regressions)))
+    return regressions
+
+
+def format_per_unit(seconds, unit):
+    return "{:.1f}us/{}".format(seconds * 1e6, unit.rstrip('s'))
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,11 @@ builtin_plugins = [
     'ExitCodeReporter = contexts.plugins.reporting:ExitCodeReporter',
     'ArgvForwarder = contexts.plugins.argv_forwarder:ArgvForwarder',
     'Shuffler = contexts.plugins.shuffling:Shuffler',
+    'Profiler = contexts.plugins.profiling:Profiler',
+    'ProcessCountSupplier = contexts.plugins.parallel:ProcessCountSupplier',
+    'DiscoveryIndexSupplier = contexts.plugins.discovery_index:DiscoveryIndexSupplier',
+    'ResultCache = contexts.plugins.result_cache:ResultCache',
+    'Sharder = contexts.plugins.sharding:Sharder',
     'Importer = contexts.plugins.importing:Importer',
     'AssertionRewritingImporter = contexts.plugins.importing.assertion_rewriting:AssertionRewritingImporter',
     'DecoratorBasedIdentifier = contexts.plugins.identification.decorators:DecoratorBasedIdentifier',
@@ -20,8 +25,11 @@ builtin_plugins = [
     'FailuresOnlyBefore = contexts.plugins.reporting.cli:FailuresOnlyBefore',
     'FailuresOnlyAfter = contexts.plugins.reporting.cli:FailuresOnlyAfter',
     'FinalCountsReporter = contexts.plugins.reporting.cli:FinalCountsReporter',
+    'DurationsReporter = contexts.plugins.reporting.cli:DurationsReporter',
     'TimedReporter = contexts.plugins.reporting.cli:TimedReporter',
+    'ProfileReporter = contexts.plugins.profiling:ProfileReporter',
     'XmlReporter = contexts.plugins.reporting.xml:XmlReporter',
+    'JsonLinesReporter = contexts.plugins.reporting.jsonlines:JsonLinesReporter',
 ]
 
 
@@ -35,18 +43,21 @@ setup(
     long_description="""See the Github project page (https://github.com/benjamin-hodgson/Contexts) for more information.""",
     package_dir={'': 'src'},
     packages=find_packages('src'),
+    python_requires=">=3.7",
     install_requires=["setuptools >= 1.0"],
     extras_require={'colour': ["colorama >= 0.2.7"]},
     entry_points={
-        'console_scripts': ['run-contexts=contexts.__main__:cmd'],
+        'console_scripts': ['run-contexts=contexts.__main__:cmd', 'contexts-merge=contexts.merging:cmd'],
         'contexts.plugins': builtin_plugins,
     },
     classifiers=[
         "Development Status :: 4 - Beta",
         "Programming Language :: Python",
-        "Programming Language :: Python :: 3.3",
-        "Programming Language :: Python :: 3.4",
-        "Programming Language :: Python :: 3.5",
+        "Programming Language :: Python :: 3",
+        "Programming Language :: Python :: 3 :: Only",
+        "Programming Language :: Python :: 3.7",
+        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
         "License :: OSI Approved :: MIT License",
         "Intended Audience :: Developers",
         "Intended Audience :: Information Technology",
@@ -1,5 +1,6 @@
+import argparse
 import sys
-from .plugin_discovery import load_plugins
+from .plugin_discovery import add_run_mode_arguments, load_plugins
 from . import run_with_plugins
 
 
@@ -8,6 +9,44 @@ def cmd():
         print_version()
         sys.exit(0)
 
+    mode, argv = parse_run_mode(sys.argv[1:])
+
+    if mode.server:
+        from .server import serve
+        serve(argv)
+        sys.exit(0)
+
+    if mode.connect:
+        from .server import connect
+        exit_code = connect(argv)
+        if exit_code is not None:
+            sys.exit(exit_code)
+        # there's no server running, so run the tests here instead
+
+    init_colorama()
+
+    if mode.watch:
+        from .watching import watch
+        watch()
+        sys.exit(0)
+
+    plugin_list = load_plugins()
+    exit_code = run_with_plugins(plugin_list)
+    sys.exit(exit_code)
+
+
+def parse_run_mode(argv):
+    """
+    Find out whether to watch, serve or connect to a server, before any plugins are loaded.
+    Returns the parsed options and the rest of the arguments.
+    """
+    # abbreviations aren't allowed because only the plugins' parser knows what they'd be short for
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    add_run_mode_arguments(parser)
+    return parser.parse_known_args(argv)
+
+
+def init_colorama():
     try:
         import colorama
     except ImportError:
@@ -15,14 +54,10 @@ def cmd():
     else:
         colorama.init()
 
-    plugin_list = load_plugins()
-    exit_code = run_with_plugins(plugin_list)
-    sys.exit(exit_code)
-
 
 def print_version():
-    import pkg_resources
-    version = pkg_resources.require('contexts')[0].version
+    from .distributions import version as get_version
+    version = get_version('contexts')
     py_version = '.'.join(str(i) for i in sys.version_info[0:3])
 
     print("Contexts version " + version)
@@ -0,0 +1,156 @@
+"""
+Running tests from a zip archive, as if it were a folder.
+
+A path inside an archive looks like a path inside a folder whose name is the
+archive's: ``tests.zip/specs/test_something.py``. Such paths don't exist on the
+file system, so code which needs to look inside an archive asks this module first.
+"""
+import os
+import time
+import zipfile
+
+
+_archives = {}
+
+
+def is_archive(path):
+    """
+    Check whether a path which was given as a test target is a zip archive.
+    Archives only count as folders once they've been checked like this.
+    """
+    if path.endswith('.py') or not os.path.isfile(path):
+        return False
+    return open_archive(path) is not None
+
+
+def find_archive(path):
+    """
+    Find the archive containing a path, or None if the path isn't inside an archive.
+    Paths which exist on the file system aren't inside an archive, so the only cost
+    for them is a stat.
+    """
+    path = os.path.abspath(path)
+    candidate = path
+    while not os.path.exists(candidate):
+        parent = os.path.dirname(candidate)
+        if parent == candidate:
+            return None
+        candidate = parent
+    if candidate == path:
+        archive = _archives.get(path)
+        return archive if archive is not None and archive.is_up_to_date() else None
+    if not os.path.isfile(candidate):
+        return None
+    return open_archive(candidate)
+
+
+def open_archive(path):
+    archive = _archives.get(path)
+    if archive is None or not archive.is_up_to_date():
+        try:
+            archive = Archive(path)
+        except (OSError, zipfile.BadZipFile):
+            archive = None
+        _archives[path] = archive
+        if archive is not None:
+            _archives[archive.path] = archive
+    return archive
+
+
+def isdir(path):
+    archive = find_archive(path)
+    return archive is not None and archive.isdir(path)
+
+
+def isfile(path):
+    if os.path.isfile(path):
+        return True
+    archive = find_archive(path)
+    return archive is not None and archive.isfile(path)
+
+
+class Archive(object):
+    def __init__(self, path):
+        self.path = os.path.realpath(path)
+        self.mtime = os.stat(self.path).st_mtime_ns
+        self.folders = {'': (set(), set())}
+        self.infos = {}
+        self.zipfile = zipfile.ZipFile(self.path)
+        self.pid = os.getpid()
+        for info in self.zipfile.infolist():
+            self.add(info)
+
+    def add(self, info):
+        name = info.filename.rstrip('/')
+        if not name:
+            return
+        folder, _, basename = name.rpartition('/')
+        if info.filename.endswith('/'):
+            self.get_folder(folder)[0].add(basename)
+            self.get_folder(name)
+        else:
+            self.get_folder(folder)[1].add(basename)
+            self.infos[name] = info
+        # archives don't always have entries for the folders themselves
+        while folder:
+            folder, _, basename = folder.rpartition('/')
+            self.get_folder(folder)[0].add(basename)
+
+    def get_folder(self, name):
+        return self.folders.setdefault(name, (set(), set()))
+
+    def is_up_to_date(self):
+        try:
+            return os.stat(self.path).st_mtime_ns == self.mtime
+        except OSError:
+            return False
+
+    def member_name(self, path):
+        relative = os.path.relpath(os.path.realpath(path), self.path)
+        return '' if relative == os.curdir else relative.replace(os.sep, '/')
+
+    def isdir(self, path):
+        return self.member_name(path) in self.folders
+
+    def isfile(self, path):
+        return self.member_name(path) in self.infos
+
+    def listdir(self, folder):
+        dirnames, filenames = self.list_folder(folder)
+        return sorted(dirnames + filenames)
+
+    def list_folder(self, folder):
+        name = self.member_name(folder)
+        if name not in self.folders:
+            raise FileNotFoundError(folder)
+        dirnames, filenames = self.folders[name]
+        return sorted(dirnames), sorted(filenames)
+
+    def walk(self):
+        """
+        Like os.walk, starting at the top of the archive.
+        """
+        to_visit = [self.path]
+        while to_visit:
+            folder = to_visit.pop()
+            dirnames, filenames = self.list_folder(folder)
+            yield folder, dirnames, filenames
+            to_visit.extend(os.path.join(folder, d) for d in reversed(dirnames))
+
+    def read(self, path):
+        if not self.isfile(path):
+            raise FileNotFoundError(path)
+        if self.pid != os.getpid():
+            # a forked process mustn't share the open file (and its position) with its parent
+            self.zipfile = zipfile.ZipFile(self.path)
+            self.pid = os.getpid()
+        return self.zipfile.read(self.infos[self.member_name(path)])
+
+    def stat(self, path):
+        """
+        Returns the size and mtime of a file, in the form importlib's path_stats uses.
+        """
+        if not self.isfile(path):
+            raise FileNotFoundError(path)
+        info = self.infos[self.member_name(path)]
+        return {'mtime': time.mktime(info.date_time + (0, 0, -1)), 'size': info.file_size}
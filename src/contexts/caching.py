@@ -0,0 +1,33 @@
+import os
+
+
+def get_cache_path(filename, environ=os.environ):
+    """
+    Find the path of one of Contexts's cache files.
+
+    Caches live in a folder called .contexts_cache in the current directory,
+    unless the CONTEXTS_CACHE_DIR environment variable says otherwise.
+    """
+    folder = environ.get('CONTEXTS_CACHE_DIR', '.contexts_cache')
+    return os.path.abspath(os.path.join(folder, filename))
+
+
+def write_atomically(path, data):
+    """
+    Write bytes to a file without ever leaving a half-written file in place,
+    creating the containing folder if necessary. Returns a boolean indicating
+    whether the file was written - failing to write a cache is never an error.
+    """
+    temp_path = '{}.{}'.format(path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+    return True
@@ -1,9 +1,15 @@
 import inspect
 import os
+import sys
+import time
+import traceback
 import types
+import weakref
 from contextlib import contextmanager
+from . import archives
 from . import discovery
 from . import errors
+from . import parallel
 from .plugin_interface import PluginInterface, TEST_FOLDER, CONTEXT, EXAMPLES, SETUP, ACTION, ASSERTION, TEARDOWN, NO_EXAMPLE
 
 
@@ -12,6 +18,7 @@ class TestRun(object):
         self.source = source
         self.plugin_composite = plugin_composite
         self.exception_handler = ExceptionHandler(self.plugin_composite)
+        self.folders = discovery.FolderCache()
 
     def run(self):
         with self.exception_handler.run_test_run(self):
@@ -21,16 +28,36 @@ class TestRun(object):
             else:
                 modules = self.import_modules()
                 self.plugin_composite.process_module_list(modules)
-                for module in modules:
-                    suite = Suite(module, self.plugin_composite)
-                    suite.run()
+                processes = self.get_process_count()
+                if processes > 1:
+                    self.run_in_parallel(modules, processes)
+                else:
+                    for module in modules:
+                        suite = Suite(module, self.plugin_composite)
+                        suite.run()
+
+    def run_in_parallel(self, modules, processes):
+        suites = [Suite(module, self.plugin_composite) for module in modules]
+        classes = [cls for suite in suites for cls in suite.classes]
+        with parallel.WorkerPool(classes, self.plugin_composite, processes, run_test_class) as pool:
+            for suite in suites:
+                suite.run(pool.run_class)
+
+    def get_process_count(self):
+        processes = self.plugin_composite.get_process_count()
+        # plugins that don't care may hand back anything at all
+        if not isinstance(processes, int) or not parallel.can_fork():
+            return 1
+        return processes
 
     def import_modules(self):
         if isinstance(self.source, types.ModuleType):
             return [self.source]
+        if archives.is_archive(self.source):
+            return self.import_modules_from_folder(self.source)
         if os.path.isfile(self.source):
             folder, filename = os.path.split(self.source)
-            importer = discovery.create_importer(folder, self.plugin_composite, self.exception_handler)
+            importer = discovery.create_importer(folder, self.plugin_composite, self.exception_handler, self.folders)
             module = importer.import_file(filename)
             if module is None:
                 return []
@@ -39,16 +66,52 @@ class TestRun(object):
             return self.import_modules_from_folder(self.source)
 
     def import_modules_from_folder(self, directory):
-        module_list = discovery.ModuleList(self.plugin_composite, self.exception_handler)
+        specs = self.find_module_specs(directory)
+        self.plugin_composite.process_module_specification_list(specs)
 
-        for folder, dirnames, _ in os.walk(directory):
-            self.remove_non_test_folders(folder, dirnames)
-            importer = discovery.create_importer(folder, self.plugin_composite, self.exception_handler)
-            for folder, filename in importer.module_specs():
-                module_list.add(folder, filename)
+        module_list = discovery.ModuleList(self.plugin_composite, self.exception_handler)
+        for folder, module_name in specs:
+            module_list.add(folder, module_name)
 
         return [m for m in module_list.modules if m is not None]
 
+    def find_module_specs(self, directory):
+        archive = archives.find_archive(directory)
+        if archive is not None:
+            # an archive can't change while we're running it, so there's nothing to index
+            specs = []
+            for folder, dirnames, filenames in archive.walk():
+                specs.extend(self.scan_folder(folder, dirnames, filenames))
+            return specs
+
+        index_path = self.plugin_composite.get_discovery_index_path()
+        if not isinstance(index_path, str):
+            specs = []
+            for folder, dirnames, filenames in os.walk(directory):
+                specs.extend(self.scan_folder(folder, dirnames, filenames))
+            return specs
+
+        index = discovery.DiscoveryIndex.load(index_path, self.get_discovery_index_key(directory))
+        specs = index.find_module_specs(directory, self.scan_folder)
+        index.save()
+        return specs
+
+    def scan_folder(self, folder, dirnames, filenames):
+        self.folders.record(folder, filenames)
+        self.remove_non_test_folders(folder, dirnames)
+        importer = discovery.create_importer(folder, self.plugin_composite, self.exception_handler, self.folders)
+        return importer.module_specs()
+
+    def get_discovery_index_key(self, directory):
+        # which folders and files are tests depends on which plugins are active and how they're configured
+        plugin_names = [type(p).__module__ + '.' + type(p).__qualname__ for p in self.plugin_composite.plugins]
+        # ...including configuration which isn't on the command line, like the contents of a --filespec file
+        plugin_keys = [p.get_discovery_index_key() for p in self.plugin_composite.plugins if hasattr(p, 'get_discovery_index_key')]
+        # the modules' names depend on which of the folders above this one are packages,
+        # and the index doesn't keep an eye on those folders
+        package_spec = list(self.folders.get_package_specification(os.path.realpath(directory)))
+        return [os.path.realpath(directory), plugin_names, sys.argv[1:], plugin_keys, package_spec]
+
     def remove_non_test_folders(self, parent, dirnames):
         replacement = []
         for dirname in dirnames:
@@ -69,11 +132,15 @@ class Suite(object):
         self.classes = self.get_classes()
         self.plugin_composite.process_class_list(self.module, self.classes)
 
-    def run(self):
+    def run(self, run_class=None):
+        if run_class is None:
+            run_class = self.run_class
         with self.exception_handler.run_suite(self):
             for cls in self.classes:
-                test_class = TestClass(cls, self.plugin_composite)
-                test_class.run()
+                run_class(cls)
+
+    def run_class(self, cls):
+        run_test_class(cls, self.plugin_composite)
 
     def get_classes(self):
         classes = []
@@ -84,6 +151,11 @@ class Suite(object):
         return classes
 
 
+def run_test_class(cls, plugin_composite):
+    test_class = TestClass(cls, plugin_composite)
+    test_class.run()
+
+
 class TestClass(object):
     def __init__(self, cls, plugin_composite):
         self.cls = cls
@@ -132,28 +204,38 @@ class TestClass(object):
         class_setup = None
         class_teardown = None
 
-        for name in cls.__dict__:
-            val = getattr(cls, name)
-
-            if callable(val) and not isprivate(name):
-                response = self.plugin_composite.identify_method(val)
-
-                if response is EXAMPLES and bottom_of_tree:
-                    assert_not_too_many_special_methods(self.examples_method, cls, val)
-                    self.examples_method = val
-                elif response is SETUP:
-                    assert_not_too_many_special_methods(class_setup, cls, val)
-                    class_setup = val
-                    self.unbound_setups.append(val)
-                elif response is ACTION and bottom_of_tree:
-                    assert_not_too_many_special_methods(self.unbound_action, cls, val)
-                    self.unbound_action = val
-                elif response is ASSERTION and bottom_of_tree:
-                    self.unbound_assertions.append(val)
-                elif response is TEARDOWN:
-                    assert_not_too_many_special_methods(class_teardown, cls, val)
-                    class_teardown = val
-                    self.unbound_teardowns.append(val)
+        for val, response in self.identify_methods(cls):
+            if response is EXAMPLES and bottom_of_tree:
+                assert_not_too_many_special_methods(self.examples_method, cls, val)
+                self.examples_method = val
+            elif response is SETUP:
+                assert_not_too_many_special_methods(class_setup, cls, val)
+                class_setup = val
+                self.unbound_setups.append(val)
+            elif response is ACTION and bottom_of_tree:
+                assert_not_too_many_special_methods(self.unbound_action, cls, val)
+                self.unbound_action = val
+            elif response is ASSERTION and bottom_of_tree:
+                self.unbound_assertions.append(val)
+            elif response is TEARDOWN:
+                assert_not_too_many_special_methods(class_teardown, cls, val)
+                class_teardown = val
+                self.unbound_teardowns.append(val)
+
+    def identify_methods(self, cls):
+        # base classes tend to be shared by lots of test classes,
+        # so each class's own methods are only identified once per test run
+        identified_methods = self.plugin_composite.identified_methods
+        if cls not in identified_methods:
+            identified_methods[cls] = [(val, self.plugin_composite.identify_method(val)) for val in get_public_methods(cls)]
+        return identified_methods[cls]
+
+
+def get_public_methods(cls):
+    for name in cls.__dict__:
+        val = getattr(cls, name)
+        if callable(val) and not isprivate(name):
+            yield val
 
 
 def isprivate(name):
@@ -191,26 +273,45 @@ class Context(object):
     def run(self):
         with self.exception_handler.run_context(self):
             try:
-                self.run_setup()
-                self.run_action()
-                self.run_assertions()
+                self.run_phase('setup', self.run_setup)
+                self.run_phase('action', self.run_action)
+                self.run_phase('assertions', self.run_assertions)
             finally:
-                self.run_teardown()
+                self.run_phase('teardown', self.run_teardown)
+
+    def run_phase(self, phase, run):
+        started = time.perf_counter_ns()
+        try:
+            run()
+        finally:
+            elapsed = time.perf_counter_ns() - started
+            self.plugin_composite.context_phase_timed(self.instance.__class__, self.example, phase, elapsed)
 
     def run_setup(self):
-        for setup in self.setups:
-            run_with_test_data(setup, self.example)
+        with self.running_user_code():
+            for setup in self.setups:
+                run_with_test_data(setup, self.example)
 
     def run_action(self):
-        run_with_test_data(self.action, self.example)
+        with self.running_user_code():
+            run_with_test_data(self.action, self.example)
 
     def run_assertions(self):
         for assertion in self.assertions:
-            assertion.run(self.example)
+            assertion.run(self.example, self.running_user_code)
 
     def run_teardown(self):
-        for teardown in self.teardowns:
-            run_with_test_data(teardown, self.example)
+        with self.running_user_code():
+            for teardown in self.teardowns:
+                run_with_test_data(teardown, self.example)
+
+    @contextmanager
+    def running_user_code(self):
+        self.plugin_composite.user_code_started(self.instance.__class__, self.example)
+        try:
+            yield
+        finally:
+            self.plugin_composite.user_code_ended(self.instance.__class__, self.example)
 
 
 def bind_methods(funcs, instance):
@@ -224,20 +325,42 @@ class Assertion(object):
         self.plugin_composite = plugin_composite
         self.exception_handler = ExceptionHandler(self.plugin_composite)
 
-    def run(self, test_data):
+    def run(self, test_data, running_user_code):
         with self.exception_handler.run_assertion(self):
-            run_with_test_data(self.func, test_data)
+            with running_user_code():
+                run_with_test_data(self.func, test_data)
 
 
 def run_with_test_data(func, test_data):
-    sig = inspect.signature(func)
-    if test_data is not NO_EXAMPLE and sig.parameters:
-        if isinstance(test_data, tuple) and len(sig.parameters) == len(test_data):
-            func(*test_data)
-        else:
-            func(test_data)
-    else:
-        func()
+    if test_data is not NO_EXAMPLE:
+        parameter_count = count_parameters(func)
+        if parameter_count:
+            if isinstance(test_data, tuple) and parameter_count == len(test_data):
+                func(*test_data)
+            else:
+                func(test_data)
+            return
+    func()
+
+
+# inspect.signature is slow, and the same methods get called once for every example,
+# so the parameter counts of bound methods are cached against the underlying functions
+_parameter_counts = weakref.WeakKeyDictionary()
+
+
+def count_parameters(func):
+    if not isinstance(func, types.MethodType):
+        return len(inspect.signature(func).parameters)
+
+    try:
+        return _parameter_counts[func.__func__]
+    except KeyError:
+        pass
+    except TypeError:  # can't make a weak reference to it
+        return len(inspect.signature(func).parameters)
+
+    count = _parameter_counts[func.__func__] = len(inspect.signature(func).parameters)
+    return count
 
 
 class ExceptionHandler(object):
@@ -251,6 +374,7 @@ class ExceptionHandler(object):
             yield
         except Exception as e:
             self.plugin_composite.unexpected_error(e)
+            release_traceback(e)
         self.plugin_composite.test_run_ended()
 
     @contextmanager
@@ -259,6 +383,7 @@ class ExceptionHandler(object):
             yield
         except Exception as e:
             self.plugin_composite.unexpected_error(e)
+            release_traceback(e)
 
     @contextmanager
     def run_suite(self, suite):
@@ -269,11 +394,15 @@ class ExceptionHandler(object):
     @contextmanager
     def run_class(self, test_class):
         self.plugin_composite.test_class_started(test_class.cls)
+        started = time.perf_counter()
         try:
             yield
         except Exception as e:
+            self.plugin_composite.test_class_timed(test_class.cls, time.perf_counter() - started)
             self.plugin_composite.test_class_errored(test_class.cls, e)
+            release_traceback(e)
         else:
+            self.plugin_composite.test_class_timed(test_class.cls, time.perf_counter() - started)
             self.plugin_composite.test_class_ended(test_class.cls)
 
     @contextmanager
@@ -283,6 +412,7 @@ class ExceptionHandler(object):
             yield
         except Exception as e:
             self.plugin_composite.context_errored(context.instance.__class__, context.example, e)
+            release_traceback(e)
         else:
             self.plugin_composite.context_ended(context.instance.__class__, context.example)
 
@@ -293,23 +423,70 @@ class ExceptionHandler(object):
             yield
         except AssertionError as e:
             self.plugin_composite.assertion_failed(assertion.func, e)
+            release_traceback(e)
         except Exception as e:
             self.plugin_composite.assertion_errored(assertion.func, e)
+            release_traceback(e)
         else:
             self.plugin_composite.assertion_passed(assertion.func)
 
 
+def release_traceback(exception):
+    """
+    Once the plugins have been told about an exception, let go of the frames its traceback
+    refers to (along with the test instances and fixtures in them), so that a long run with
+    lots of failures doesn't keep them all alive. Plugins which want to keep a failure
+    around should keep an errors.FormattedException instead.
+    """
+    to_release = [exception]
+    seen = set()
+    while to_release:
+        exception = to_release.pop()
+        if exception is None or id(exception) in seen:
+            continue
+        seen.add(id(exception))
+        if exception.__traceback__ is not None:
+            traceback.clear_frames(exception.__traceback__)
+            exception.__traceback__ = None
+        to_release.extend([exception.__cause__, exception.__context__])
+
+
 class PluginComposite(object):
+    """
+    Calls each plugin in turn until one of them returns something.
+
+    The plugins' methods are looked up once, when the composite is created,
+    so calling a hook doesn't involve any attribute lookups on the plugins.
+    Hooks which none of the plugins implement do nothing.
+    """
     def __init__(self, plugins):
         self.plugins = plugins
+        self.identified_methods = {}
+        for name in HOOK_NAMES:
+            methods = tuple(m for m in (getattr(plugin, name, None) for plugin in plugins) if m is not None)
+            setattr(self, name, create_hook(methods))
 
     def __getattr__(self, name):
-        if name not in PluginInterface.__dict__:  # not expecting this to happen
-            raise AttributeError('The method {} is not part of the plugin interface'.format(name))
-
-        def plugin_method(*args, **kwargs):
-            for plugin in self.plugins:
-                reply = getattr(plugin, name, lambda *_: None)(*args, **kwargs)
-                if reply is not None:
-                    return reply
-        return plugin_method
+        # only called for names which aren't hooks
+        raise AttributeError('The method {} is not part of the plugin interface'.format(name))
+
+
+HOOK_NAMES = frozenset(name for name in PluginInterface.__dict__ if not name.startswith('_'))
+
+
+def create_hook(methods):
+    if not methods:
+        return do_nothing
+    if len(methods) == 1:
+        return methods[0]
+
+    def plugin_method(*args, **kwargs):
+        for method in methods:
+            reply = method(*args, **kwargs)
+            if reply is not None:
+                return reply
+    return plugin_method
+
+
+def do_nothing(*args, **kwargs):
+    pass
@@ -1,5 +1,8 @@
+import json
 import os
 from collections import namedtuple
+from . import archives
+from .caching import write_atomically
 from .plugin_interface import TEST_FILE
 
 
@@ -7,19 +10,21 @@ PackageSpecification = namedtuple('PackageSpecification', ['parent_folder', 'pac
 ModuleSpecification = namedtuple('ModuleSpecification', ['parent_folder', 'module_name'])
 
 
-def create_importer(folder, plugin_composite, exception_handler):
-    if ispackage(folder):
-        return PackageModuleImporter(folder, plugin_composite, exception_handler)
+def create_importer(folder, plugin_composite, exception_handler, folders=None):
+    if folders is None:
+        folders = FolderCache()
+    if folders.ispackage(folder):
+        return PackageModuleImporter(folder, plugin_composite, exception_handler, folders)
     else:
-        return FolderModuleImporter(folder, plugin_composite, exception_handler)
+        return FolderModuleImporter(folder, plugin_composite, exception_handler, folders)
 
 
 class Importer(object):
     def get_file_details(self):
         specs = []
-        for filename in os.listdir(self.directory):
+        for filename in self.folders.listdir(self.directory):
             full_path = os.path.realpath(os.path.join(self.directory, filename))
-            if not os.path.isfile(full_path) or filename == '__init__.py':
+            if not archives.isfile(full_path) or filename == '__init__.py':
                 continue
             if self.plugin_composite.identify_file(full_path) is TEST_FILE:
                 module_name = self.module_prefix + remove_extension(filename)
@@ -28,12 +33,13 @@ class Importer(object):
 
 
 class FolderModuleImporter(Importer):
-    def __init__(self, directory, plugin_composite, exception_handler):
+    def __init__(self, directory, plugin_composite, exception_handler, folders):
         self.directory = directory
         self.location = self.directory
         self.module_prefix = ''
         self.plugin_composite = plugin_composite
         self.exception_handler = exception_handler
+        self.folders = folders
 
     def module_specs(self):
         return self.get_file_details()
@@ -45,15 +51,16 @@ class FolderModuleImporter(Importer):
 
 
 class PackageModuleImporter(Importer):
-    def __init__(self, directory, plugin_composite, exception_handler):
+    def __init__(self, directory, plugin_composite, exception_handler, folders):
         directory = os.path.realpath(directory)
-        self.package_spec = get_package_specification(directory)
+        self.package_spec = folders.get_package_specification(directory)
 
         self.directory = directory
         self.location = self.package_spec[0]
         self.module_prefix = self.package_spec[1] + '.'
         self.plugin_composite = plugin_composite
         self.exception_handler = exception_handler
+        self.folders = folders
 
     def module_specs(self):
         return get_parent_package_specs(*self.package_spec) + self.get_file_details()
@@ -85,6 +92,19 @@ def get_parent_package_specs(top_folder, package_name):
     return parent_package_specs
 
 
+def with_parent_packages(specifications):
+    """
+    A module can only be imported after the packages that contain it,
+    so take a collection of (location, module_name) pairs and add their parent packages.
+    """
+    result = set()
+    for location, name in specifications:
+        parts = name.split('.')
+        for i in range(1, len(parts) + 1):
+            result.add((location, '.'.join(parts[:i])))
+    return result
+
+
 # FIXME: i don't think it's right for ModuleList to exist. TestRun is a list of
 # modules ('Suites') so we dont need another list of modules.
 # however i also feel weird about the two alternatves: initialising TestRun with an empty
@@ -102,20 +122,121 @@ class ModuleList(object):
             self.modules.append(module)
 
 
-def get_package_specification(directory):
-    current_parent = os.path.dirname(directory)
-    package_names = [os.path.basename(directory)]
-
-    while ispackage(current_parent):
-        dirpath, current_parent = current_parent, os.path.dirname(current_parent)
-        package_names.append(os.path.basename(dirpath))
-
-    full_package_name = '.'.join(reversed(package_names))
-    return PackageSpecification(current_parent, full_package_name)
-
+class DiscoveryIndex(object):
+    """
+    Remembers, between test runs, which subfolders of each test folder contain tests
+    and which modules each one contains.
+
+    A folder's modification time only changes when entries are added to it, removed from it
+    or renamed, so a folder with the same mtime as last time can't contain any new tests.
+    A folder which has changed is re-scanned along with everything underneath it
+    (because adding an __init__.py changes the names of all the modules below it).
+    """
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.folders = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path, key):
+        index = cls(path, key)
+        try:
+            with open(path, 'r') as f:
+                contents = json.load(f)
+        except (OSError, ValueError):
+            return index
+        if contents.get('key') == key:
+            index.folders = contents['folders']
+        return index
+
+    def save(self):
+        if self.dirty:
+            contents = {'key': self.key, 'folders': self.folders}
+            write_atomically(self.path, json.dumps(contents).encode('utf-8'))
+
+    def find_module_specs(self, directory, scan_folder):
+        """
+        scan_folder(folder, dirnames, filenames) should remove the non-test folders from dirnames
+        in place and return the module specifications in the folder, like os.walk's callers do.
+        """
+        old_folders, self.folders = self.folders, {}
+        specs = []
+        self.visit(directory, scan_folder, old_folders, specs, False)
+        if self.folders.keys() != old_folders.keys():
+            self.dirty = True
+        return specs
 
-def ispackage(directory):
-    return "__init__.py" in os.listdir(directory)
+    def visit(self, folder, scan_folder, old_folders, specs, parent_changed):
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+        except OSError:
+            return
+
+        entry = old_folders.get(folder)
+        changed = parent_changed or entry is None or entry['mtime'] != mtime
+        if changed:
+            dirnames, filenames = list_folder(folder)
+            folder_specs = scan_folder(folder, dirnames, filenames)
+            entry = {'mtime': mtime, 'subfolders': dirnames, 'specs': [list(spec) for spec in folder_specs]}
+            self.dirty = True
+        self.folders[folder] = entry
+
+        specs.extend(ModuleSpecification(*spec) for spec in entry['specs'])
+        for dirname in entry['subfolders']:
+            self.visit(os.path.join(folder, dirname), scan_folder, old_folders, specs, changed)
+
+
+def list_folder(folder):
+    dirnames, filenames = [], []
+    try:
+        entries = sorted(os.scandir(folder), key=lambda e: e.name)
+    except OSError:
+        return dirnames, filenames
+    for entry in entries:
+        # os.walk doesn't follow symlinks either
+        if entry.is_dir(follow_symlinks=False):
+            dirnames.append(entry.name)
+        else:
+            filenames.append(entry.name)
+    return dirnames, filenames
+
+
+class FolderCache(object):
+    """
+    Remembers the contents of each folder for the duration of a test run,
+    so that working out which folders are packages (and which packages they belong to)
+    doesn't need to list the same folders over and over again.
+
+    Folders which have already been listed by os.walk can be recorded up front.
+    """
+    def __init__(self):
+        self.listings = {}
+        self.package_specs = {}
+
+    def record(self, folder, filenames):
+        self.listings[folder] = filenames
+
+    def listdir(self, folder):
+        if folder not in self.listings:
+            archive = archives.find_archive(folder)
+            self.listings[folder] = archive.listdir(folder) if archive is not None else os.listdir(folder)
+        return self.listings[folder]
+
+    def ispackage(self, folder):
+        return "__init__.py" in self.listdir(folder)
+
+    def get_package_specification(self, directory):
+        if directory not in self.package_specs:
+            parent = os.path.dirname(directory)
+            name = os.path.basename(directory)
+            if parent != directory and self.ispackage(parent):
+                top_folder, parent_name = self.get_package_specification(parent)
+                spec = PackageSpecification(top_folder, parent_name + '.' + name)
+            else:
+                spec = PackageSpecification(parent, name)
+            self.package_specs[directory] = spec
+        return self.package_specs[directory]
 
 
 def remove_extension(filename):
@@ -0,0 +1,126 @@
+"""
+Finding out about installed distributions (their entry points and versions)
+without importing pkg_resources, which scans every installed distribution as it's imported.
+"""
+import hashlib
+import importlib
+import json
+import os
+import sys
+from .caching import get_cache_path, write_atomically
+
+
+def entry_points(group, environ=os.environ):
+    """
+    Get a list of ``(name, value)`` pairs for the entry points in a group,
+    where the value is of the form ``'module:attribute'``.
+
+    The entry points are remembered in a manifest in the cache folder.
+    The manifest is thrown away when the interpreter or the distributions
+    on ``sys.path`` (or their entry points) change.
+    """
+    path = get_cache_path('entry_points.json', environ)
+    key = environment_key()
+
+    manifest = load_manifest(path)
+    if manifest.get('key') == key and group in manifest.get('groups', {}):
+        return [tuple(pair) for pair in manifest['groups'][group]]
+
+    found = read_entry_points(group)
+
+    groups = manifest.get('groups', {}) if manifest.get('key') == key else {}
+    groups[group] = found
+    write_atomically(path, json.dumps({'key': key, 'groups': groups}).encode('utf-8'))
+    return found
+
+
+def load(value):
+    """
+    Import the object an entry point refers to.
+    """
+    module_name, _, attrs = value.partition(':')
+    obj = importlib.import_module(module_name.strip())
+    if attrs:
+        for attr in attrs.strip().split('.'):
+            obj = getattr(obj, attr)
+    return obj
+
+
+def version(distribution_name):
+    metadata = import_metadata()
+    if metadata is not None:
+        return metadata.version(distribution_name)
+    import pkg_resources
+    return pkg_resources.require(distribution_name)[0].version
+
+
+def read_entry_points(group):
+    metadata = import_metadata()
+    if metadata is None:
+        import pkg_resources
+        found = [(ep.name, ep.module_name + (':' + '.'.join(ep.attrs) if ep.attrs else ''))
+                 for ep in pkg_resources.iter_entry_points(group)]
+    else:
+        all_entry_points = metadata.entry_points()
+        if hasattr(all_entry_points, 'select'):
+            selected = all_entry_points.select(group=group)
+        else:  # Python < 3.10
+            selected = all_entry_points.get(group, [])
+        found = [(ep.name, ep.value) for ep in selected]
+
+    # a distribution which appears on sys.path twice shows up twice
+    unique = []
+    for pair in found:
+        if pair not in unique:
+            unique.append(pair)
+    return unique
+
+
+def import_metadata():
+    # importlib.metadata isn't free to import either, so it's only imported when the manifest is out of date
+    try:
+        import importlib.metadata
+    except ImportError:  # Python < 3.8
+        return None
+    return importlib.metadata
+
+
+def environment_key():
+    """
+    A fingerprint of the interpreter and the distributions it can see.
+    Only directory listings and a stat of each distribution's metadata are needed,
+    so this is much cheaper than reading the metadata itself.
+    """
+    parts = [sys.executable, sys.version]
+    # sys.path[0] is the script's folder or the working directory, so it depends on how and where
+    # the tests were started - but it's not where distributions are installed
+    for entry in sys.path[1:]:
+        parts.append(entry)
+        try:
+            names = sorted(os.listdir(entry or '.'))
+        except OSError:  # not a folder (a zip file, perhaps), or it doesn't exist
+            parts.append(str(get_mtime(entry)))
+            continue
+        for name in names:
+            if name.endswith(('.dist-info', '.egg-info', '.egg', '.egg-link', '.pth')):
+                metadata_path = os.path.join(entry or '.', name)
+                parts.append(name)
+                parts.append(str(get_mtime(metadata_path)))
+                parts.append(str(get_mtime(os.path.join(metadata_path, 'entry_points.txt'))))
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
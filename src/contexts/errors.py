@@ -1,6 +1,42 @@
+import traceback
+
+
 class MethodNamingError(Exception):
     pass
 
 
 class TooManySpecialMethodsError(Exception):
     pass
+
+
+class FormattedException(Exception):
+    """
+    A lightweight record of an exception, with its traceback already formatted.
+
+    Plugins receive the real exception, but the test runner lets go of its traceback
+    (and the frames, test instances and fixtures the traceback refers to) as soon
+    as the plugins have been notified. A plugin which needs to hang on to a failure
+    until later should keep one of these instead.
+    """
+    def __init__(self, type_name, message, traceback_lines, filename=None, lineno=None):
+        super().__init__(type_name, message, traceback_lines)
+        self.type_name = type_name
+        self.message = message
+        self.traceback_lines = traceback_lines
+        self.filename = filename
+        self.lineno = lineno
+
+    @classmethod
+    def from_exception(cls, exception):
+        if isinstance(exception, FormattedException):
+            return exception
+        lines = traceback.format_exception(type(exception), exception, exception.__traceback__)
+        frames = traceback.extract_tb(exception.__traceback__)
+        filename, lineno = (frames[-1].filename, frames[-1].lineno) if frames else (None, None)
+        return cls(type(exception).__name__, str(exception), ''.join(lines).strip().split('\n'), filename, lineno)
+
+    def __str__(self):
+        return self.message
+
+    def __reduce__(self):
+        return (type(self), (self.type_name, self.message, self.traceback_lines, self.filename, self.lineno))
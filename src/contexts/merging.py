@@ -0,0 +1,64 @@
+import argparse
+import sys
+import xml.etree.ElementTree as ET
+from .plugins.reporting.cli import FinalCountsReporter
+from .plugins.reporting.xml import TestSuitesWriter
+
+
+def cmd():
+    parser = argparse.ArgumentParser(
+        prog='contexts-merge',
+        description="Merge the XML reports from several test runs (such as the shards of a sharded run) into one.")
+    parser.add_argument('inputs', nargs='+', metavar='FILE', help="XML reports to merge.")
+    parser.add_argument('-o', '--output', required=True, metavar='FILE', help="Path for the merged XML report.")
+    args = parser.parse_args()
+
+    counts = merge(args.inputs, TestSuitesWriter(args.output))
+    counts.summarise()
+    sys.exit(1 if counts.failed else 0)
+
+
+def merge(paths, writer, stream=sys.stdout):
+    """
+    Copy the <testsuite> elements from each report to the writer, one at a time,
+    so that reports of any size can be merged without reading them into memory.
+    Returns a FinalCountsReporter holding the totals.
+    """
+    counts = FinalCountsReporter(stream)
+    seconds = 0
+
+    for path in paths:
+        depth = 0
+        root = None
+        for event, element in ET.iterparse(path, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if depth == 1:
+                    root = element
+                    if element.tag == 'testsuites':
+                        seconds += float(element.get('time', 0))
+                continue
+
+            depth -= 1
+            is_top_level_suite = element.tag == 'testsuite' and (depth == 1 or element is root)
+            if not is_top_level_suite:
+                continue
+
+            if element is root:  # a report containing a single suite
+                seconds += float(element.get('time', 0))
+            add_to_counts(counts, element)
+            element.tail = None
+            writer.write(ET.tostring(element, encoding='unicode'))
+            if element is not root:
+                root.remove(element)
+
+    writer.close(counts.assertion_count, counts.error_count, counts.failure_count, seconds)
+    return counts
+
+
+def add_to_counts(counts, suite):
+    counts.context_count += 1
+    counts.assertion_count += int(suite.get('tests', 0))
+    counts.failure_count += int(suite.get('failures', 0))
+    counts.error_count += int(suite.get('errors', 0))
+    counts.failed = counts.failed or bool(counts.failure_count or counts.error_count)
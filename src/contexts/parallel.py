@@ -0,0 +1,307 @@
+import collections
+import functools
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import sys
+from .errors import FormattedException
+from .plugin_interface import NO_EXAMPLE
+
+
+# The progress notifications which a worker sends back to the parent process.
+# All the other hooks (identifying methods, processing assertion lists...)
+# are answered by the worker's own copy of the plugins.
+EVENTS = frozenset([
+    'test_class_started', 'test_class_ended', 'test_class_errored', 'test_class_timed',
+    'context_started', 'context_ended', 'context_errored', 'context_phase_timed',
+    'assertion_started', 'assertion_passed', 'assertion_failed', 'assertion_errored',
+    'unexpected_error'
+])
+WRITE = 'write'
+
+
+def can_fork():
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+class WorkerPool(object):
+    """
+    Runs test classes in a pool of forked worker processes.
+
+    Each worker records the progress notifications for its test class
+    (and anything the class wrote to stdout or stderr), and the parent replays them
+    to the real plugins in the order the classes would have been run serially.
+    The classes are handed out to the workers slowest first, though.
+
+    The workers are forked, so they inherit the classes and the plugins and are only
+    ever sent the position of a class in the list. They aren't daemonic, so the tests
+    can start processes of their own (including a WorkerPool). If a worker dies,
+    the class it was running is reported as errored and a new worker takes its place.
+    """
+    def __init__(self, classes, plugin_composite, processes, run_class):
+        self.classes = classes
+        self.plugin_composite = plugin_composite
+        self.processes = min(processes, len(classes)) or 1
+        self.run_class_in_worker = run_class
+        self.next_index = 0
+        self.results = {}
+        self.workers = []
+
+    def __enter__(self):
+        self.context = multiprocessing.get_context('fork')
+        self.to_send = collections.deque(self.schedule())
+        try:
+            for _ in range(self.processes):
+                self.start_worker()
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+
+    def schedule(self):
+        estimates = estimate_durations(self.classes, self.plugin_composite)
+        return sorted(range(len(self.classes)), key=lambda i: estimates[i], reverse=True)
+
+    def start_worker(self):
+        if not self.to_send:
+            return
+        worker = Worker(self.context, [self.plugin_composite, self.run_class_in_worker, self.classes], self.workers)
+        self.workers.append(worker)
+        self.send_work(worker)
+
+    def send_work(self, worker):
+        if self.to_send:
+            worker.send(self.to_send.popleft())
+
+    def run_class(self, cls):
+        index = self.next_index
+        self.next_index += 1
+
+        result = self.wait_for(index)
+        if isinstance(result, RemoteException):
+            self.plugin_composite.test_class_started(cls)
+            self.plugin_composite.test_class_errored(cls, result)
+        else:
+            replay(result, cls, self.plugin_composite)
+
+    def wait_for(self, index):
+        while index not in self.results:
+            busy = [w for w in self.workers if w.index is not None]
+            ready = multiprocessing.connection.wait([w.connection for w in busy] + [w.process.sentinel for w in busy])
+            for worker in busy:
+                if worker.connection not in ready and worker.process.sentinel not in ready:
+                    continue
+                try:
+                    # a worker which has died also looks ready to read, until we find the pipe is empty
+                    finished_index, result = worker.receive()
+                except EOFError:
+                    self.results[worker.index] = worker.died()
+                    self.workers.remove(worker)
+                    self.start_worker()
+                else:
+                    self.results[finished_index] = result
+                    self.send_work(worker)
+        return self.results.pop(index)
+
+
+class Worker(object):
+    def __init__(self, context, work, siblings):
+        self.connection, child_connection = context.Pipe()
+        # the worker mustn't hold on to the other workers' pipes, or they'd never see the parent hang up
+        to_close = [self.connection] + [w.connection for w in siblings]
+        self.process = context.Process(target=work_loop, args=(child_connection, to_close, work))
+        self.process.start()
+        child_connection.close()
+        self.index = None
+
+    def send(self, index):
+        self.index = index
+        try:
+            self.connection.send(index)
+        except BrokenPipeError:  # it's died already - wait_for will notice
+            pass
+
+    def receive(self):
+        result = self.connection.recv()
+        self.index = None
+        return result
+
+    def died(self):
+        self.process.join()
+        self.connection.close()
+        message = 'The worker process running this class exited unexpectedly (exit code {})'.format(self.process.exitcode)
+        return RemoteException('WorkerDied', message, ['WorkerDied: ' + message])
+
+    def stop(self):
+        self.connection.close()
+        self.process.terminate()
+        self.process.join()
+
+
+def work_loop(connection, to_close, work):
+    for inherited in to_close:
+        inherited.close()
+    while True:
+        try:
+            index = connection.recv()
+        except EOFError:  # the parent has finished with us
+            return
+        connection.send(run_in_worker(index, work))
+
+
+def estimate_durations(classes, plugin_composite):
+    """
+    Guess how long each class will take, preferring the durations that plugins remember.
+    Classes nobody remembers are guessed from the size of their module, shared between
+    the module's classes and converted to seconds at the rate of the classes we do know about.
+    """
+    durations = [plugin_composite.get_expected_duration(cls) for cls in classes]
+    # plugins that don't care may hand back anything at all
+    durations = [d if isinstance(d, (int, float)) and not isinstance(d, bool) else None for d in durations]
+
+    classes_per_module = collections.Counter(cls.__module__ for cls in classes)
+    sizes = [get_module_size(cls.__module__) / classes_per_module[cls.__module__] for cls in classes]
+
+    known_duration = sum(d for d in durations if d is not None)
+    known_size = sum(size for d, size in zip(durations, sizes) if d is not None)
+    seconds_per_byte = known_duration / known_size if known_duration and known_size else 1
+
+    return [d if d is not None else size * seconds_per_byte for d, size in zip(durations, sizes)]
+
+
+def get_module_size(module_name):
+    filename = getattr(sys.modules.get(module_name), '__file__', None)
+    if filename is None:
+        return 0
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+
+def run_in_worker(index, work):
+    plugin_composite, run_class, classes = work
+    recorder = EventRecorder(plugin_composite)
+
+    real_stdout, real_stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = StreamRecorder(recorder, 'stdout'), StreamRecorder(recorder, 'stderr')
+    try:
+        run_class(classes[index], recorder)
+    except Exception as e:
+        return index, RemoteException.from_exception(e)
+    finally:
+        sys.stdout, sys.stderr = real_stdout, real_stderr
+
+    return index, recorder.events
+
+
+class EventRecorder(object):
+    def __init__(self, plugin_composite):
+        self.plugin_composite = plugin_composite
+        self.events = []
+
+    def __getattr__(self, name):
+        if name in EVENTS:
+            return functools.partial(self.record, name)
+        return getattr(self.plugin_composite, name)
+
+    def record(self, name, *args):
+        if name.startswith('context_'):
+            cls, example, *rest = args
+            encoded = [encode(cls), encode_example(example)] + [encode(arg) for arg in rest]
+        else:
+            encoded = [encode(arg) for arg in args]
+        self.events.append((name, encoded))
+
+    def write(self, stream_name, string):
+        self.events.append((WRITE, (stream_name, string)))
+
+
+class StreamRecorder(object):
+    def __init__(self, recorder, stream_name):
+        self.recorder = recorder
+        self.stream_name = stream_name
+
+    def write(self, string):
+        self.recorder.write(self.stream_name, string)
+        return len(string)
+
+    def flush(self):
+        pass
+
+
+def replay(events, cls, plugin_composite):
+    for name, args in events:
+        if name == WRITE:
+            stream_name, string = args
+            getattr(sys, stream_name).write(string)
+        else:
+            getattr(plugin_composite, name)(*[decode(arg, cls) for arg in args])
+
+
+def encode(arg):
+    if isinstance(arg, (int, float, str)):
+        return arg
+    if isinstance(arg, type):
+        return ClassReference()
+    if isinstance(arg, BaseException):
+        return RemoteException.from_exception(arg)
+    return FunctionReference(arg.__name__)
+
+
+def encode_example(example):
+    if example is NO_EXAMPLE:
+        return NoExampleReference()
+    try:
+        pickle.dumps(example)
+    except Exception:
+        return RemoteExample(str(example))
+    return example
+
+
+def decode(arg, cls):
+    if isinstance(arg, ClassReference):
+        # workers only ever report on the test class they were asked to run
+        return cls
+    if isinstance(arg, NoExampleReference):
+        return NO_EXAMPLE
+    if isinstance(arg, FunctionReference):
+        return getattr(cls, arg.name, arg)
+    return arg
+
+
+class ClassReference(object):
+    pass
+
+
+class NoExampleReference(object):
+    pass
+
+
+class FunctionReference(object):
+    def __init__(self, name):
+        self.name = name
+        self.__name__ = name
+
+
+class RemoteExample(object):
+    def __init__(self, string):
+        self.string = string
+
+    def __str__(self):
+        return self.string
+
+    __repr__ = __str__
+
+
+class RemoteException(FormattedException):
+    """
+    Stands in for an exception that was raised in a worker process.
+    Tracebacks can't cross a process boundary, so the worker formats it before sending it back.
+    """
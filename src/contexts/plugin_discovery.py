@@ -1,41 +1,80 @@
 import argparse
+import builtins
+import collections
 import inspect
 import itertools
+import json
 import os
 import sys
-import pkg_resources
+from . import distributions
+from .caching import get_cache_path, write_atomically
 
 
-def load_plugins():
-    plugin_loader = PluginLoader()
+def load_plugins(environ=os.environ):
+    manifest = PluginManifest.load(distributions.entry_points('contexts.plugins', environ), environ)
+    plugin_loader = PluginLoader(manifest)
 
     parser = argparse.ArgumentParser()
-
-    plugin_loader.load_plugins()
+    add_run_mode_arguments(parser)
     plugin_loader.setup_parser(parser)
 
     args = parser.parse_args(sys.argv[1:])
 
+    plugin_loader.load_plugins(args, parser)
     plugin_loader.initialise_plugins(args)
     plugin_loader.cross_pollinate()
 
     return plugin_loader.to_list()
 
 
-class PluginLoader(object):
-    def load_plugins(self):
-        builder = PluginListBuilder()
-        for entry_point in pkg_resources.iter_entry_points('contexts.plugins'):
-            cls = entry_point.load()
-            builder.add(cls)
+def add_run_mode_arguments(parser):
+    """
+    The options which decide how run-contexts goes about running the tests. They're acted on
+    before the plugins are loaded (see contexts.__main__), but the plugins' parser has them too,
+    so that they're listed by --help and accepted alongside the plugins' options.
+    """
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--watch',
+                       action='store_true',
+                       help="Keep running, and re-run the affected tests whenever a test file or a module it imported changes.")
+    group.add_argument('--server',
+                       action='store_true',
+                       help="Start a server which keeps Contexts imported, for 'run-contexts --connect' to run the tests in. "
+                            "See 'run-contexts --server --help' for the server's options.")
+    group.add_argument('--connect',
+                       action='store_true',
+                       help="Ask the server running in this folder to run the tests, or run them here if there isn't one.")
 
-        self.plugins = [activate_plugin(p) for p in builder.to_list()]
+
+class PluginLoader(object):
+    """
+    Plugins are only imported once it's known that they might be active.
+    Their command-line options come from the manifest, unless the manifest
+    couldn't record them, in which case the plugin has to be imported to set up the parser.
+    """
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.order = manifest.get_order()
+        self.instances = {}
 
     def setup_parser(self, parser):
-        for plug in self.plugins:
+        for name in self.order:
+            entry = self.manifest.plugins[name]
+            if entry['arguments'] is not None:
+                replay_arguments(parser, entry['arguments'])
+                continue
+            plug = self.activate(name)
             if hasattr(plug, "setup_parser"):
                 plug.setup_parser(parser)
 
+    def load_plugins(self, args, parser):
+        self.plugins = [self.activate(name) for name in self.order if might_be_active(self.manifest.plugins[name], args, parser)]
+
+    def activate(self, name):
+        if name not in self.instances:
+            self.instances[name] = activate_plugin(distributions.load(self.manifest.plugins[name]['value']))
+        return self.instances[name]
+
     def initialise_plugins(self, args):
         new_list = []
         for plug in self.plugins:
@@ -64,6 +103,12 @@ class PluginLoader(object):
         return self.plugins
 
 
+def might_be_active(entry, args, parser):
+    if entry['activated_by'] is None:
+        return True
+    return any(getattr(args, dest, None) != parser.get_default(dest) for dest in entry['activated_by'])
+
+
 def activate_plugin(cls):
     try:
         sig = inspect.signature(cls)
@@ -80,17 +125,217 @@ def activate_plugin(cls):
     return cls()
 
 
+class PluginManifest(object):
+    """
+    What Contexts needs to know about the installed plugins before deciding which ones to import:
+    the order of the list, each plugin's command-line options, and which options activate it.
+    Building the manifest means importing every plugin, so it's saved in the cache folder
+    and only rebuilt when the plugins' entry points or source files change.
+    """
+    def __init__(self, entry_points, plugins, files, order):
+        self.entry_points = entry_points
+        self.plugins = plugins
+        self.files = files
+        self.order = order
+
+    @classmethod
+    def load(cls, entry_points, environ=os.environ):
+        path = get_cache_path('plugins.json', environ)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            manifest = cls([tuple(pair) for pair in data['entry_points']], data['plugins'], data['files'], data['order'])
+        except (OSError, ValueError, KeyError, TypeError):
+            manifest = None
+
+        if manifest is None or not manifest.is_up_to_date(entry_points):
+            manifest = cls.build(entry_points)
+            manifest.save(path)
+        return manifest
+
+    @classmethod
+    def build(cls, entry_points):
+        classes = collections.OrderedDict((name, distributions.load(value)) for name, value in entry_points)
+        names = {c: name for name, c in classes.items()}
+
+        plugins = collections.OrderedDict()
+        files = {}
+        for name, plugin_class in classes.items():
+            left, right = get_location(plugin_class)
+            plugins[name] = {
+                'value': dict(entry_points)[name],
+                'left': names.get(left),
+                'right': names.get(right),
+                'activated_by': get_activating_options(plugin_class),
+                'arguments': record_arguments(activate_plugin(plugin_class))
+            }
+            filename = getattr(sys.modules.get(plugin_class.__module__), '__file__', None)
+            if filename is not None:
+                files[filename] = distributions.get_mtime(filename)
+        return cls(list(entry_points), plugins, files, resolve_order(plugins))
+
+    def is_up_to_date(self, entry_points):
+        if self.entry_points != list(entry_points):
+            return False
+        return all(distributions.get_mtime(filename) == mtime for filename, mtime in self.files.items())
+
+    def save(self, path):
+        data = {'entry_points': self.entry_points, 'plugins': self.plugins, 'files': self.files, 'order': self.order}
+        write_atomically(path, json.dumps(data).encode('utf-8'))
+
+    def get_order(self):
+        return self.order
+
+
+def resolve_order(plugins):
+    builder = PluginListBuilder()
+    for name, entry in plugins.items():
+        builder.add(name, (entry['left'], entry['right']))
+    return builder.to_list()
+
+
+def get_activating_options(cls):
+    if not hasattr(cls, 'activated_by'):
+        return None
+    options = cls.activated_by()
+    if not isinstance(options, (list, tuple)) or not all(isinstance(o, str) for o in options):
+        return None
+    return list(options)
+
+
+def record_arguments(plugin):
+    """
+    Find out what the plugin does to the argument parser, in a form which can be saved and replayed.
+    Returns None if the plugin does something which can't be replayed.
+    """
+    if not hasattr(plugin, 'setup_parser'):
+        return []
+    recording = ParserRecording()
+    parser = argparse.ArgumentParser()
+    # each plugin gets a parser of its own, so an option which two plugins both add
+    # (like Colouriser and UnColouriser's --no-colour) is recorded for both of them
+    plugin.setup_parser(RecordingParser(parser, recording, 0))
+    return recording.calls if recording.replayable else None
+
+
+def replay_arguments(parser, calls):
+    targets = [parser]
+    for target, method_name, args, kwargs in calls:
+        args = [decode_value(a) for a in args]
+        kwargs = {k: decode_value(v) for k, v in kwargs.items()}
+        try:
+            result = getattr(targets[target], method_name)(*args, **kwargs)
+        except argparse.ArgumentError:
+            # the plugin was expecting this, see record_arguments
+            continue
+        if method_name != 'add_argument':
+            targets.append(result)
+
+
+class ParserRecording(object):
+    def __init__(self):
+        self.calls = []
+        self.replayable = True
+        self.target_count = 1
+
+    def record(self, target, method_name, args, kwargs):
+        try:
+            encoded = [target, method_name, [encode_value(a) for a in args], {k: encode_value(v) for k, v in kwargs.items()}]
+        except UnrecordableValue:
+            self.replayable = False
+        else:
+            self.calls.append(encoded)
+        if method_name != 'add_argument':
+            self.target_count += 1
+            return self.target_count - 1
+
+
+class RecordingParser(object):
+    """
+    Stands in for an argument parser (or a group of arguments) while a plugin sets it up.
+    Calls are passed on to the real parser and recorded if they succeed.
+    """
+    def __init__(self, target, recording, index):
+        self.target = target
+        self.recording = recording
+        self.index = index
+
+    def add_argument(self, *args, **kwargs):
+        result = self.target.add_argument(*args, **kwargs)
+        self.recording.record(self.index, 'add_argument', args, kwargs)
+        return result
+
+    def add_mutually_exclusive_group(self, *args, **kwargs):
+        return self.add_group('add_mutually_exclusive_group', args, kwargs)
+
+    def add_argument_group(self, *args, **kwargs):
+        return self.add_group('add_argument_group', args, kwargs)
+
+    def add_group(self, method_name, args, kwargs):
+        group = getattr(self.target, method_name)(*args, **kwargs)
+        index = self.recording.record(self.index, method_name, args, kwargs)
+        return RecordingParser(group, self.recording, index)
+
+    def __getattr__(self, name):
+        # anything else the plugin does to the parser can't be replayed
+        self.recording.replayable = False
+        return getattr(self.target, name)
+
+
+class UnrecordableValue(Exception):
+    pass
+
+
+def encode_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [encode_value(v) for v in value]
+    qualname = getattr(value, '__qualname__', None)
+    module = getattr(value, '__module__', None)
+    if callable(value) and qualname is not None and module is not None and '<' not in qualname:
+        return {'callable': module + ':' + qualname}
+    raise UnrecordableValue(value)
+
+
+def decode_value(value):
+    if isinstance(value, list):
+        return [decode_value(v) for v in value]
+    if isinstance(value, dict):
+        module, _, qualname = value['callable'].partition(':')
+        if module == 'builtins':
+            return getattr(builtins, qualname)
+        return LazyCallable(value['callable'])
+    return value
+
+
+class LazyCallable(object):
+    """
+    Stands in for a function (such as an argument's type) from a plugin which hasn't been imported.
+    The plugin is only imported if the function is called.
+    """
+    def __init__(self, reference):
+        self.reference = reference
+        self.__name__ = reference.rpartition('.')[2].rpartition(':')[2]
+
+    def __call__(self, *args, **kwargs):
+        return distributions.load(self.reference)(*args, **kwargs)
+
+    def __repr__(self):
+        return self.__name__
+
+
 class PluginListBuilder(object):
     def __init__(self):
         self.graph = Graph()
 
-    def add(self, cls):
-        left, right = get_location(cls)
-        self.graph.add_node(cls)
+    def add(self, node, location):
+        left, right = location
+        self.graph.add_node(node)
         if right is not None:
-            self.graph.add_edge(cls, right)
+            self.graph.add_edge(node, right)
         if left is not None:
-            self.graph.add_edge(left, cls)
+            self.graph.add_edge(left, node)
 
     def to_list(self):
         return self.graph.topological_sort()
@@ -155,7 +400,7 @@ class TopologicalSorter(object):
 
         node_data['temp_mark'] = True
 
-        for m in node_data['edges_to']:
+        for m in sorted(node_data['edges_to']):
             self.visit(m)
 
         self.output.append(node)
@@ -4,6 +4,10 @@ class PluginInterface(object):
 
     You do not need to inherit from this class in your own plugins.
     Just create a new class and implement `initialise` (and one or more other hooks).
+
+    The hooks which are told about an error or a failure are given the exception, but its traceback's frames
+    are cleared as soon as the hook returns. A plugin which wants to format the exception later should keep
+    ``FormattedException.from_exception(exception)`` (see :mod:`contexts.errors`) instead.
     """
     @classmethod
     def locate(cls):
@@ -20,6 +24,17 @@ class PluginInterface(object):
         does not mind what it comes before or after, respectively.
         Returning ``None`` from this method is equivalent to returning ``(None, None)``.
         """
+    @classmethod
+    def activated_by(cls):
+        """
+        Called when the plugin is first installed (the answer is remembered between test runs)
+        to find out which command-line options turn the plugin on.
+        If a plugin implements this method, it won't be imported or initialised at all
+        unless one of these options has been given a value other than its default.
+
+        :return: A list of the ``dest`` names of options the plugin adds in :meth:`setup_parser`,
+            or ``None`` if the plugin should always be initialised.
+        """
     def setup_parser(self, parser):
         """
         Called before command-line arguments are parsed.
@@ -92,6 +107,15 @@ class PluginInterface(object):
 
         :param cls: The class object that is being run.
         :param exception: The exception that got caused the error.
+            Its traceback is cleared when this hook returns (see :class:`PluginInterface`).
+        """
+    def test_class_timed(self, cls, duration):
+        """
+        Called when a test class finishes its run, just before ``test_class_ended`` or ``test_class_errored``.
+
+        :param cls: The class object that was run.
+        :param duration: The time it took to run the class, in seconds.
+            When test classes are run in worker processes this is the time it took in the worker.
         """
 
     def context_started(self, cls, example):
@@ -118,6 +142,39 @@ class PluginInterface(object):
         :param example: The current example, which may be :const:`~contexts.plugin_interface.NO_EXAMPLE`
             if it is not a parametrised test.
         :param exception: The exception that caused the error.
+            Its traceback is cleared when this hook returns (see :class:`PluginInterface`).
+        """
+    def context_phase_timed(self, cls, example, phase, nanoseconds):
+        """
+        Called when each phase of a test context finishes (whether or not it succeeded),
+        before ``context_ended`` or ``context_errored``.
+
+        :param cls: The class object of the test being run.
+        :param example: The current example, which may be :const:`~contexts.plugin_interface.NO_EXAMPLE`
+            if it is not a parametrised test.
+        :param phase: Which phase finished: ``'setup'``, ``'action'``, ``'assertions'`` or ``'teardown'``.
+            (A phase which was skipped because an earlier one failed is not reported.)
+        :param nanoseconds: How long the phase took, in nanoseconds.
+        """
+    def user_code_started(self, cls, example):
+        """
+        Called just before the test's own methods are run: before the setups, the action
+        and the teardowns, and before each assertion (after ``assertion_started``).
+        Any time spent between this and ``user_code_ended`` was spent in the test's code
+        rather than in the test runner or in the other plugins' hooks.
+
+        :param cls: The class object of the test being run.
+        :param example: The current example, which may be :const:`~contexts.plugin_interface.NO_EXAMPLE`
+            if it is not a parametrised test.
+        """
+    def user_code_ended(self, cls, example):
+        """
+        Called just after the test's own methods have run (whether or not they succeeded),
+        before the test runner reports the outcome to the plugins.
+
+        :param cls: The class object of the test being run.
+        :param example: The current example, which may be :const:`~contexts.plugin_interface.NO_EXAMPLE`
+            if it is not a parametrised test.
         """
 
     def assertion_started(self, func):
@@ -138,6 +195,7 @@ class PluginInterface(object):
 
         :param func: The assertion method being run.
         :param exception: The exception that caused the error.
+            Its traceback is cleared when this hook returns (see :class:`PluginInterface`).
         """
     def assertion_failed(self, func, exception):
         """
@@ -145,6 +203,7 @@ class PluginInterface(object):
 
         :param func: The assertion method being run.
         :param exception: The exception that caused the failure.
+            Its traceback is cleared when this hook returns (see :class:`PluginInterface`).
         """
 
     def unexpected_error(self, exception):
@@ -152,6 +211,7 @@ class PluginInterface(object):
         Called when an error occurs outside of a Context or Assertion.
 
         :param exception: The exception that caused the failure.
+            Its traceback is cleared when this hook returns (see :class:`PluginInterface`).
         """
 
     def get_object_to_run(self):
@@ -216,6 +276,17 @@ class PluginInterface(object):
             * ``None`` - plugin does not wish to identify the method (though other plugins may still cause it to be run)
         """
 
+    def process_module_specification_list(self, specifications):
+        """
+        A hook to change (or examine) the list of modules which were found in a folder, before any of them are imported.
+        Plugins may modify the list in-place by adding or removing specifications.
+
+        The list may contain the same package more than once, because each module in a package
+        is preceded by the packages which contain it.
+
+        :param specifications: A list of 2-tuples of ``(location, name)``, as they will be passed
+            to :meth:`~contexts.plugin_interface.PluginInterface.import_module`.
+        """
     def process_module_list(self, modules):
         """
         A hook to change (or examine) the list of modules which will be run with the full list of found modules.
@@ -254,6 +325,53 @@ class PluginInterface(object):
             * ``None``, if the plugin is not able to import the module.
         """
 
+    def get_discovery_index_path(self):
+        """
+        Called before the test runner searches a folder for tests, to find out whether
+        it should remember the results of the search for future test runs.
+
+        This method should return one of:
+            * The path to a file (as a string), in which the test runner will keep an index of the
+              test folders and modules it found. On later runs, only folders which have changed
+              will be searched again.
+            * ``None``, if you do not want to override the default behaviour (searching every folder every time).
+        """
+    def get_discovery_index_key(self):
+        """
+        Called when the test runner loads the discovery index, to find out whether the plugin
+        is configured in a way which affects which folders and files it identifies as tests
+        (and which isn't visible on the command line, such as the contents of a file the plugin reads).
+        Unlike most hooks, every plugin's answer is used: the index is thrown away and rebuilt
+        if any of them have changed since it was saved.
+
+        This method should return one of:
+            * A value which can be saved as JSON (using lists rather than tuples),
+              which changes whenever the plugin's identification would change.
+            * ``None``, if nothing but the command line affects the plugin's identification.
+        """
+    def get_process_count(self):
+        """
+        Called after the test modules have been imported, when the test runner wants to know
+        how many worker processes it should spread the test classes across.
+
+        This method should return one of:
+            * An integer. Values greater than 1 cause the test classes to be run in a pool of
+              forked worker processes; progress notifications are still delivered to plugins
+              in the parent process, in the same order as a serial run.
+            * ``None``, if you do not want to override the default behaviour (running everything in one process).
+        """
+    def get_expected_duration(self, cls):
+        """
+        Called before test classes are run in worker processes. The slowest classes are started first,
+        so that the run isn't left waiting for one slow class at the end.
+
+        :param cls: The class object that is about to be run.
+
+        This method should return one of:
+            * A number of seconds which the class is expected to take (for example, the time it took last time).
+            * ``None``, if you do not want to override the default behaviour (guessing from the size of the class's file).
+        """
+
     def get_exit_code(self):
         """
         Called at the end of the test runner to obtain the exit code for the process.
@@ -3,6 +3,10 @@ import sys
 
 
 class ArgvForwarder(object):
+    @classmethod
+    def activated_by(cls):
+        return ['argv']
+
     def setup_parser(self, parser):
         parser.add_argument("--argv", dest="argv", type=str)
 
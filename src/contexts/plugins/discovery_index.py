@@ -0,0 +1,24 @@
+from ..caching import get_cache_path
+
+
+class DiscoveryIndexSupplier(object):
+    @classmethod
+    def activated_by(cls):
+        return ['discovery_index']
+
+    def setup_parser(self, parser):
+        parser.add_argument('--index',
+                            action='store_true',
+                            dest='discovery_index',
+                            default=False,
+                            help="Remember which folders contain tests between runs, and only search folders which have changed.")
+
+    def initialise(self, args, env):
+        self.path = get_cache_path('discovery_index.json', env)
+        return args.discovery_index
+
+    def get_discovery_index_path(self):
+        return self.path
+
+    def __eq__(self, other):
+        return type(self) == type(other)
@@ -8,6 +8,10 @@ class FileSpecIdentifier:
     def __init__(self):
         self._specs = None
 
+    @classmethod
+    def activated_by(cls):
+        return ['specs']
+
     def setup_parser(self, parser):
         parser.add_argument(
             '--filespec',
@@ -40,6 +44,10 @@ class FileSpecIdentifier:
             if(f == file):
                 return TEST_FILE
 
+    def get_discovery_index_key(self):
+        # the files listed in the spec file can change without the command line changing
+        return self.specs
+
     @property
     def specs(self):
         if(self._specs is None):
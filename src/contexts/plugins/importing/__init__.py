@@ -1,6 +1,9 @@
-import importlib
+import importlib.machinery
+import importlib.util
 import os
 import sys
+from ... import archives
+from .dependencies import watch_imports
 
 
 class Importer(object):
@@ -14,18 +17,50 @@ class Importer(object):
             return
 
         loader = self.get_loader(module_name, filename)
-        return loader.load_module(module_name)
+        spec = importlib.util.spec_from_file_location(module_name, filename, loader=loader)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        watch_imports(module)
+        try:
+            loader.exec_module(module)
+        except BaseException:
+            sys.modules.pop(module_name, None)
+            raise
+        # a module is allowed to replace itself in sys.modules
+        return sys.modules[module_name]
 
     def get_loader(self, module_name, filename):
-        return importlib.machinery.SourceFileLoader(module_name, filename)
+        return ModuleLoader(module_name, filename)
 
     def __eq__(self, other):
         return type(self) == type(other)
 
 
+class ModuleLoader(importlib.machinery.SourceFileLoader):
+    """
+    Loads a module from a source file, which may be inside a zip archive.
+    Bytecode inside an archive is used if it's up to date, but never written.
+    """
+    def get_data(self, path):
+        archive = archives.find_archive(path)
+        if archive is None:
+            return super().get_data(path)
+        return archive.read(path)
+
+    def path_stats(self, path):
+        archive = archives.find_archive(path)
+        if archive is None:
+            return super().path_stats(path)
+        return archive.stat(path)
+
+    def set_data(self, path, data, *, _mode=0o666):
+        if archives.find_archive(path) is None:
+            super().set_data(path, data, _mode=_mode)
+
+
 def resolve_filename(dir_path, module_name):
     filename = os.path.join(dir_path, *module_name.split('.'))
-    if os.path.isdir(filename):  # it's a package
+    if os.path.isdir(filename) or archives.isdir(filename):  # it's a package
         filename = os.path.join(filename, '__init__.py')
     else:
         filename += '.py'
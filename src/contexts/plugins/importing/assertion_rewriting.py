@@ -1,10 +1,29 @@
 import ast
+import hashlib
 import importlib.abc
+import importlib.util
+import marshal
+import multiprocessing
+import os
+import struct
 import sys
-from . import Importer
+from . import Importer, ModuleLoader, resolve_filename
+from ... import archives, distributions
+from ...caching import write_atomically
+from ..parallel import ProcessCountSupplier
+
+try:
+    from _imp import _fix_co_filename
+except ImportError:  # not CPython
+    def _fix_co_filename(code, path):
+        pass
 
 
 class AssertionRewritingImporter(Importer):
+    def __init__(self):
+        self.processes = 1
+        self.precompiled = {}
+
     def setup_parser(self, parser):
         parser.add_argument('--no-assert',
                             action='store_false',
@@ -19,31 +38,194 @@ class AssertionRewritingImporter(Importer):
     def initialise(self, args, env):
         return args.rewriting
 
+    def request_plugins(self):
+        returned_plugins = yield [ProcessCountSupplier]
+        if ProcessCountSupplier in returned_plugins:
+            self.processes = returned_plugins[ProcessCountSupplier].processes
+
+    def process_module_specification_list(self, specifications):
+        if self.processes > 1:
+            self.precompile(specifications)
+
+    def precompile(self, specifications):
+        # Rewriting is CPU-bound, so it's done up front in a pool of processes.
+        # The modules still get executed one at a time, in order, by import_module.
+        filenames = sorted({resolve_filename(location, name) for location, name in specifications})
+        chunksize = len(filenames) // (self.processes * 4) + 1
+        with multiprocessing.Pool(self.processes) as pool:
+            for filename, code in pool.imap_unordered(precompile, filenames, chunksize):
+                if code is not None:
+                    self.precompiled[filename] = code
+
     def get_loader(self, module_name, filename):
-        return AssertionRewritingLoader(module_name, filename)
+        return AssertionRewritingLoader(module_name, filename, self.precompiled.pop(filename, None))
 
 
-class AssertionRewritingLoader(importlib.machinery.SourceFileLoader):
+class AssertionRewritingLoader(ModuleLoader):
     # in Python 3.4, implementing get_code won't be necessary -
     # I could just override source_to_code.
     # When 3.4 gets officially released, maybe wrap this def in an if
+    def __init__(self, fullname, path, precompiled=None):
+        super().__init__(fullname, path)
+        self.precompiled = precompiled
+
     def get_code(self, fullname):
-        source = self.get_source(fullname)
-        path = self.get_filename(fullname)
-        return self.source_to_code(source, path)
+        if self.precompiled is not None:
+            return marshal.loads(self.precompiled)
 
-    def source_to_code(self, source, path='<string>'):
-        parsed = ast.parse(source)
+        path = self.get_filename(fullname)
+        cache = RewrittenBytecodeCache(path)
 
-        transformer = AssertionRewriter()
-        transformer.visit(parsed)
+        code = cache.load()
+        if code is None:
+            code = self.source_to_code(cache.source, path)
+            cache.save(code)
+        else:
+            # the cached code may have been compiled somewhere else (before being packed into an archive, say)
+            _fix_co_filename(code, path)
+        return code
 
-        return compile(parsed, path, 'exec', dont_inherit=True, optimize=0)
+    def source_to_code(self, source, path='<string>'):
+        return rewrite(source, path)
 
     def module_repr(self, module):
         return '<module {!r} from {!r}>'.format(module.__name__, module.__file__)
 
 
+def rewrite(source, path):
+    parsed = ast.parse(source)
+
+    transformer = AssertionRewriter()
+    transformer.visit(parsed)
+
+    return compile(parsed, path, 'exec', dont_inherit=True, optimize=0)
+
+
+def precompile(filename):
+    """
+    Runs in a worker process. Returns the marshalled code for the file,
+    or None if the parent should just import it the usual way
+    (because the cache is already warm or the file is broken).
+    """
+    try:
+        cache = RewrittenBytecodeCache(filename)
+        if cache.load() is not None:
+            return filename, None
+        code = rewrite(cache.source, filename)
+        cache.save(code)
+    except Exception:
+        # let the real import report the problem
+        return filename, None
+    return filename, marshal.dumps(code)
+
+
+class RewrittenBytecodeCache(object):
+    """
+    Rewritten modules are cached next to the normal bytecode, in
+    __pycache__/<module>.<cache tag>-contexts.pyc, so they never collide with the .pyc
+    files Python writes for itself.
+
+    The header records the bytecode magic number, a fingerprint of the rewriter,
+    and the size, mtime and hash of the source. If the mtime has changed but the hash
+    hasn't (after a checkout, say) the cached code is still used.
+    """
+    # the mtime is signed, like st_mtime_ns: files can be dated before 1970
+    header = struct.Struct('<4s20sqQ20s')
+
+    def __init__(self, source_path):
+        self.source_path = source_path
+        self.cache_path = cache_from_source(source_path)
+        # a test file in an archive can come with its rewritten bytecode, but the cache can't be written to
+        self.archive = archives.find_archive(source_path)
+        if self.archive is None:
+            stat = os.stat(source_path)
+            self.mtime, self.size = stat.st_mtime_ns, stat.st_size
+        else:
+            stats = self.archive.stat(source_path)
+            self.mtime, self.size = int(stats['mtime'] * 10 ** 9), stats['size']
+        self._source = None
+
+    @property
+    def source(self):
+        if self._source is None:
+            self._source = self.read(self.source_path)
+        return self._source
+
+    def read(self, path):
+        if self.archive is not None:
+            return self.archive.read(path)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def load(self):
+        try:
+            data = self.read(self.cache_path)
+            magic, fingerprint, mtime, size, source_hash = self.header.unpack_from(data)
+        except (OSError, struct.error):
+            return None
+
+        if magic != importlib.util.MAGIC_NUMBER or fingerprint != rewriter_fingerprint():
+            return None
+        if (mtime, size) != (self.mtime, self.size) and source_hash != hash_source(self.source):
+            return None
+
+        try:
+            return marshal.loads(data[self.header.size:])
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def save(self, code):
+        if sys.dont_write_bytecode or self.archive is not None or rewriter_fingerprint() is None:
+            return
+        header = self.header.pack(
+            importlib.util.MAGIC_NUMBER,
+            rewriter_fingerprint(),
+            self.mtime,
+            self.size,
+            hash_source(self.source)
+        )
+        write_atomically(self.cache_path, header + marshal.dumps(code))
+
+
+def cache_from_source(path):
+    directory, filename = os.path.split(path)
+    module_name = os.path.splitext(filename)[0]
+    cache_filename = '{}.{}-contexts.pyc'.format(module_name, sys.implementation.cache_tag)
+    return os.path.join(directory, '__pycache__', cache_filename)
+
+
+def hash_source(source):
+    return hashlib.sha1(source).digest()
+
+
+_fingerprint = None
+
+
+def rewriter_fingerprint():
+    """
+    Changes to the rewriter (ie, a new version of Contexts) must invalidate the cache.
+    Hashing this file is cheaper than asking for the installed version, but the file can't
+    always be read (when Contexts itself was imported from a zip file, say).
+    Returns None if the rewriter can't be identified at all, in which case nothing should be cached.
+    """
+    global _fingerprint
+    if _fingerprint is None:
+        _fingerprint = read_fingerprint()
+    return _fingerprint or None
+
+
+def read_fingerprint():
+    try:
+        with open(__file__, 'rb') as f:
+            return hash_source(f.read())
+    except OSError:
+        pass
+    try:
+        return hash_source(distributions.version('contexts').encode('utf-8'))
+    except Exception:  # not installed, so there's no version to go on
+        return b''
+
+
 class AssertionRewriter(ast.NodeTransformer):
     def visit_Assert(self, assert_node):
         if assert_node.msg is not None:
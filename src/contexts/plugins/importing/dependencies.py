@@ -0,0 +1,157 @@
+import builtins
+import collections
+import importlib.abc
+import importlib.util
+import os
+import sys
+import types
+
+
+INSTALLATION_PREFIXES = tuple(os.path.realpath(p) + os.sep for p in {sys.prefix, sys.base_prefix, sys.exec_prefix})
+
+
+class DependencyGraph(importlib.abc.MetaPathFinder):
+    """
+    Keeps track of which modules imported which. The graph is kept in terms of the modules'
+    files, so that when a file changes the modules which depend on it can be found.
+
+    While it's installed the graph sits at the front of sys.meta_path. Each module it sees
+    being loaded from a source file (outside the Python installation) gets its own copy of the
+    builtins, whose __import__ records what the module imports before handing over to the
+    real one. Nothing else in the process is affected. Modules which the test runner executes
+    itself (the test files) are handed to the graph by the importer; see watch_imports.
+
+    Only import statements are seen - a module imported with importlib.import_module
+    (or imported before the graph was installed) isn't known to depend on anything.
+    """
+    def __init__(self):
+        self.imports = collections.defaultdict(set)
+        self.imported = set()
+        self.realpaths = {}
+        self.builtins = None
+
+    def install(self):
+        # taken afresh for each run, in case something has added to the builtins since
+        self.builtins = dict(vars(builtins), __import__=self.recording_import)
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        if spec.has_location and hasattr(spec.loader, 'exec_module') and not is_installed(spec.origin):
+            spec.loader = RecordingLoader(spec.loader, self)
+        return spec
+
+    def watch(self, module):
+        """
+        Record the imports which the module runs. Must be called before the module is executed.
+        """
+        module.__builtins__ = self.builtins
+
+    def recording_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        module = builtins.__import__(name, globals, locals, fromlist, level)
+        importer = self.get_filename(globals)
+        if importer is not None:
+            full_name = importlib.util.resolve_name('.' * level + name, globals.get('__package__')) if level else name
+            names = [full_name] + [full_name + '.' + item for item in fromlist or () if item != '*']
+            for imported_name in names:
+                self.record(importer, imported_name)
+        return module
+
+    def record(self, importer, module_name):
+        # a submodule depends on its package (importing the package might replace the submodule's attribute)
+        while module_name:
+            module = sys.modules.get(module_name)
+            filename = self.get_filename(vars(module) if isinstance(module, types.ModuleType) else None)
+            if filename is not None and filename != importer:
+                self.imports[importer].add(filename)
+                self.imported.add(filename)
+                importer = filename
+            module_name = module_name.rpartition('.')[0]
+
+    def get_filename(self, namespace):
+        filename = namespace.get('__file__') if namespace is not None else None
+        if not isinstance(filename, str):
+            return None
+        if filename not in self.realpaths:
+            self.realpaths[filename] = os.path.realpath(filename)
+        return self.realpaths[filename]
+
+    def __contains__(self, filename):
+        return filename in self.imported
+
+    def dependents(self, filenames):
+        """
+        Find the files which import any of the given files, directly or indirectly,
+        including the given files themselves.
+        """
+        importers = collections.defaultdict(set)
+        for importer, imported in self.imports.items():
+            for filename in imported:
+                importers[filename].add(importer)
+
+        found = set(filenames)
+        to_visit = list(found)
+        while to_visit:
+            for importer in importers[to_visit.pop()]:
+                if importer not in found:
+                    found.add(importer)
+                    to_visit.append(importer)
+        return found
+
+    def forget(self, filenames):
+        """
+        Forget what the given files imported. They'll be recorded again when they're re-imported.
+        """
+        for filename in filenames:
+            self.imports.pop(filename, None)
+
+
+class RecordingLoader(object):
+    """
+    Wraps the loader a module would have been loaded with,
+    so that the graph can watch the module before it's executed.
+    """
+    def __init__(self, loader, graph):
+        self.loader = loader
+        self.graph = graph
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.graph.watch(module)
+        self.loader.exec_module(module)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+def watch_imports(module):
+    """
+    Called by the importer for a module which it's about to execute itself, without going
+    through sys.meta_path, so that an installed DependencyGraph can see its imports too.
+    """
+    for finder in sys.meta_path:
+        if isinstance(finder, DependencyGraph):
+            finder.watch(module)
+
+
+def is_installed(filename):
+    """
+    Check whether a file is part of the Python installation (the standard library or site-packages),
+    which nobody is expected to change while the tests are being watched.
+    """
+    return os.path.realpath(filename).startswith(INSTALLATION_PREFIXES)
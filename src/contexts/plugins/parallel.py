@@ -0,0 +1,23 @@
+class ProcessCountSupplier(object):
+    @classmethod
+    def activated_by(cls):
+        return ['processes']
+
+    def setup_parser(self, parser):
+        parser.add_argument('--processes',
+                            action='store',
+                            dest='processes',
+                            type=int,
+                            default=1,
+                            metavar='N',
+                            help="Run test classes in N worker processes. (Default: 1)")
+
+    def initialise(self, args, env):
+        self.processes = args.processes
+        return self.processes > 1
+
+    def get_process_count(self):
+        return self.processes
+
+    def __eq__(self, other):
+        return type(self) == type(other)
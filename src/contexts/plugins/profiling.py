@@ -0,0 +1,239 @@
+import collections
+import cProfile
+import os
+import pstats
+import sys
+import threading
+from .parallel import ProcessCountSupplier
+from .reporting import StreamReporter
+from .reporting.cli import DurationsReporter, TimedReporter, pluralise
+
+
+SAMPLE_INTERVAL = 0.005
+
+
+class Profiler(object):
+    """
+    Profiles the code each context runs - its setup, action, assertions and teardown -
+    either with cProfile or with a thread which samples the call stack at intervals.
+    The profiler is only switched on while the test's own methods are running,
+    so the test runner and the other plugins (reporters, for example) don't show up in the profile.
+    When the run ends a profile is written for each test module.
+    """
+    @classmethod
+    def locate(cls):
+        # the profilers can only see code running in this process,
+        # so this has to answer get_process_count before ProcessCountSupplier does
+        return (None, ProcessCountSupplier)
+
+    @classmethod
+    def activated_by(cls):
+        return ['profile']
+
+    def setup_parser(self, parser):
+        parser.add_argument('--profile',
+                            action='store',
+                            dest='profile',
+                            nargs='?',
+                            const='cprofile',
+                            default=None,
+                            choices=['cprofile', 'sampling'],
+                            help="Profile the setup, action, assertion and teardown methods of each context "
+                                 "using cProfile (the default) or a sampling profiler. "
+                                 "Tests are run in a single process when profiling.")
+        parser.add_argument('--profile-dir',
+                            action='store',
+                            dest='profile_dir',
+                            default='profiles',
+                            metavar='DIR',
+                            help="Folder in which to write a profile for each test module. (Default: profiles)")
+        parser.add_argument('--profile-top',
+                            action='store',
+                            dest='profile_top',
+                            type=int,
+                            default=20,
+                            metavar='N',
+                            help="Number of functions to list in the profiling summary. (Default: 20)")
+
+    def initialise(self, args, env):
+        if args.profile is None:
+            return False
+        self.directory = args.profile_dir
+        self.recorder = CProfileRecorder() if args.profile == 'cprofile' else SamplingRecorder()
+        return True
+
+    def __init__(self):
+        self.directory = None
+        self.recorder = None
+        self.paths = []
+
+    def get_process_count(self):
+        return 1
+
+    def test_run_started(self):
+        self.recorder.start()
+
+    def user_code_started(self, cls, example):
+        self.recorder.enable(cls.__module__)
+
+    def user_code_ended(self, cls, example):
+        self.recorder.disable()
+
+    def test_run_ended(self):
+        self.recorder.stop()
+        os.makedirs(self.directory, exist_ok=True)
+        self.paths = self.recorder.write(self.directory)
+
+    def __eq__(self, other):
+        return type(self) == type(other)
+
+
+class ProfileReporter(StreamReporter):
+    """
+    Prints the functions the profiled contexts spent the most time in,
+    across all the test modules, at the end of the run.
+    """
+    @classmethod
+    def locate(cls):
+        return (DurationsReporter, TimedReporter)
+
+    @classmethod
+    def activated_by(cls):
+        return ['profile']
+
+    def initialise(self, args, env):
+        self.count = args.profile_top
+        return args.profile is not None
+
+    def __init__(self, stream=sys.stdout):
+        super().__init__(stream)
+        self.profiler = None
+
+    def request_plugins(self):
+        returned_plugins = yield [Profiler]
+        self.profiler = returned_plugins.get(Profiler)
+
+    def test_run_ended(self):
+        if self.profiler is None:
+            return
+        self._print("Wrote {} to {}".format(pluralise("profile", len(self.profiler.paths)), self.profiler.directory))
+        self.profiler.recorder.print_top(self.stream, self.count)
+
+
+class CProfileRecorder(object):
+    extension = '.pstats'
+
+    def __init__(self):
+        self.profiles = collections.OrderedDict()
+        self.current = None
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def enable(self, key):
+        if key not in self.profiles:
+            self.profiles[key] = cProfile.Profile()
+        self.current = self.profiles[key]
+        self.current.enable()
+
+    def disable(self):
+        if self.current is not None:
+            self.current.disable()
+            self.current = None
+
+    def write(self, directory):
+        paths = []
+        for key, profile in self.profiles.items():
+            path = os.path.join(directory, key + self.extension)
+            profile.dump_stats(path)
+            paths.append(path)
+        return paths
+
+    def print_top(self, stream, count):
+        if not self.profiles:
+            return
+        stats = pstats.Stats(*self.profiles.values(), stream=stream)
+        stats.sort_stats('tottime').print_stats(count)
+
+
+class SamplingRecorder(object):
+    """
+    Records the call stack of the thread running the tests every SAMPLE_INTERVAL seconds
+    (as often as the interpreter lets it), while a context is running.
+    Profiles are written in the 'collapsed stack' format used by flame graph tools:
+    one line per distinct stack, outermost frame first, followed by the number of samples.
+    """
+    extension = '.collapsed'
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = collections.OrderedDict()
+        self.current = None
+        self.thread_id = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.current = None
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def enable(self, key):
+        if key not in self.samples:
+            self.samples[key] = collections.Counter()
+        self.current = self.samples[key]
+
+    def disable(self):
+        self.current = None
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            counter = self.current
+            if counter is None:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                counter[collapse(frame)] += 1
+
+    def write(self, directory):
+        paths = []
+        for key, counter in self.samples.items():
+            path = os.path.join(directory, key + self.extension)
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in sorted(counter.items()):
+                    f.write('{} {}\n'.format(stack, count))
+            paths.append(path)
+        return paths
+
+    def print_top(self, stream, count):
+        own = collections.Counter()
+        total = collections.Counter()
+        for counter in self.samples.values():
+            for stack, samples in counter.items():
+                frames = stack.split(';')
+                own[frames[-1]] += samples
+                for frame in set(frames):
+                    total[frame] += samples
+
+        print("{:>8} {:>8}  function".format("own", "total"), file=stream)
+        for frame, samples in own.most_common(count):
+            print("{:>8} {:>8}  {}".format(samples, total[frame], frame), file=stream)
+        stream.flush()
+
+
+def collapse(frame):
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append('{} ({}:{})'.format(code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
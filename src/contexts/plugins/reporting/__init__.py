@@ -1,5 +1,6 @@
 import sys
 import traceback
+from ...errors import FormattedException
 from ...plugin_interface import PluginInterface, NO_EXAMPLE
 from .. import cleverly_get_words
 
@@ -72,5 +73,7 @@ def context_name(name, example):
 
 
 def format_exception(exception):
+    if isinstance(exception, FormattedException):
+        return exception.traceback_lines
     ret = traceback.format_exception(type(exception), exception, exception.__traceback__)
     return ''.join(ret).strip().split('\n')
@@ -1,5 +1,7 @@
 import argparse
 import datetime
+import heapq
+import itertools
 import sys
 from io import StringIO
 from . import StreamReporter, context_name, format_exception, make_readable
@@ -231,6 +233,71 @@ class TimedReporter(StreamReporter):
         self._print("({} seconds)".format(rounded))
 
 
+class DurationsReporter(StreamReporter):
+    """
+    Lists the slowest contexts at the end of the run, with how long each of their phases took.
+    Only the slowest N are kept as the run goes along.
+    """
+    @classmethod
+    def locate(cls):
+        return (FinalCountsReporter, TimedReporter)
+
+    @classmethod
+    def activated_by(cls):
+        return ['durations']
+
+    def setup_parser(self, parser):
+        parser.add_argument('--durations',
+                            action='store',
+                            dest='durations',
+                            type=int,
+                            default=0,
+                            metavar='N',
+                            help="Report the N slowest contexts and the time spent in each of their phases.")
+
+    def initialise(self, args, env):
+        self.count = args.durations
+        return self.count > 0
+
+    def __init__(self, stream=sys.stdout):
+        super().__init__(stream)
+        self.count = 0
+        self.slowest = []
+        self.phases = None
+        self.tie_breaker = itertools.count()
+
+    def context_started(self, cls, example):
+        self.name = context_name(cls.__name__, example)
+        self.phases = []
+
+    def context_phase_timed(self, cls, example, phase, nanoseconds):
+        self.phases.append((phase, nanoseconds))
+
+    def context_ended(self, cls, example):
+        self.record()
+
+    def context_errored(self, cls, example, exception):
+        self.record()
+
+    def record(self):
+        total = sum(nanoseconds for _, nanoseconds in self.phases)
+        entry = (total, next(self.tie_breaker), self.name, self.phases)
+        if len(self.slowest) < self.count:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+    def test_run_ended(self):
+        self._print("Slowest {}:".format(pluralise("context", len(self.slowest))))
+        for total, _, name, phases in sorted(self.slowest, reverse=True):
+            breakdown = ', '.join('{} {}'.format(phase, format_nanoseconds(ns)) for phase, ns in phases)
+            self._print("  {}  {} ({})".format(format_nanoseconds(total), name, breakdown))
+
+
+def format_nanoseconds(nanoseconds):
+    return "{:.3f}s".format(nanoseconds / 1e9)
+
+
 class Colouriser(StreamReporter):
     @classmethod
     def locate(cls):
@@ -0,0 +1,136 @@
+import io
+import json
+import os
+import time
+from . import context_name
+from .teamcity import TeamCityReporter
+from ...errors import FormattedException
+from ...plugin_interface import NO_EXAMPLE
+
+
+class JsonLinesReporter(object):
+    """
+    Writes every progress notification to a file as a line of JSON, as it happens,
+    so that other tools can follow a test run without waiting for it to finish.
+    Every line has an 'event' (the name of the hook) and a 'time' (from a monotonic clock, in seconds).
+    """
+    @classmethod
+    def locate(cls):
+        # TeamCityReporter swallows the notifications it handles
+        return (None, TeamCityReporter)
+
+    @classmethod
+    def activated_by(cls):
+        return ['jsonl_path', 'jsonl_fd']
+
+    def setup_parser(self, parser):
+        group = parser.add_mutually_exclusive_group(required=False)
+        group.add_argument('--jsonl',
+                           action='store',
+                           dest='jsonl_path',
+                           default=None,
+                           metavar='FILE',
+                           help="Write a line of JSON to FILE for each test event.")
+        group.add_argument('--jsonl-fd',
+                           action='store',
+                           dest='jsonl_fd',
+                           type=int,
+                           default=None,
+                           metavar='FD',
+                           help="Write a line of JSON to file descriptor FD for each test event.")
+
+    def initialise(self, args, env):
+        if args.jsonl_path is not None:
+            self.stream = io.open(args.jsonl_path, 'w', encoding='utf-8')
+            return True
+        if args.jsonl_fd is not None:
+            self.stream = os.fdopen(args.jsonl_fd, 'w', encoding='utf-8', closefd=False)
+            return True
+        return False
+
+    def __init__(self):
+        self.stream = None
+
+    def test_run_started(self):
+        self.write('test_run_started')
+
+    def test_run_ended(self):
+        self.write('test_run_ended')
+        self.stream.close()
+
+    def unexpected_error(self, exception):
+        self.write('unexpected_error', exception=describe_exception(exception))
+
+    def suite_started(self, module):
+        self.write('suite_started', **describe_module(module))
+
+    def suite_ended(self, module):
+        self.write('suite_ended', **describe_module(module))
+
+    def test_class_started(self, cls):
+        self.write('test_class_started', **describe_class(cls))
+
+    def test_class_ended(self, cls):
+        self.write('test_class_ended', **describe_class(cls))
+
+    def test_class_errored(self, cls, exception):
+        self.write('test_class_errored', exception=describe_exception(exception), **describe_class(cls))
+
+    def test_class_timed(self, cls, duration):
+        self.write('test_class_timed', duration=duration, **describe_class(cls))
+
+    def context_started(self, cls, example):
+        self.write('context_started', **describe_context(cls, example))
+
+    def context_ended(self, cls, example):
+        self.write('context_ended', **describe_context(cls, example))
+
+    def context_errored(self, cls, example, exception):
+        self.write('context_errored', exception=describe_exception(exception), **describe_context(cls, example))
+
+    def assertion_started(self, func):
+        self.write('assertion_started', assertion=func.__name__)
+
+    def assertion_passed(self, func):
+        self.write('assertion_passed', assertion=func.__name__)
+
+    def assertion_failed(self, func, exception):
+        self.write('assertion_failed', assertion=func.__name__, exception=describe_exception(exception))
+
+    def assertion_errored(self, func, exception):
+        self.write('assertion_errored', assertion=func.__name__, exception=describe_exception(exception))
+
+    def write(self, event, **fields):
+        line = {'event': event, 'time': time.monotonic()}
+        line.update(fields)
+        self.stream.write(json.dumps(line, default=str) + '\n')
+        self.stream.flush()
+
+    def __eq__(self, other):
+        return type(self) == type(other)
+
+
+def describe_module(module):
+    return {'module': module.__name__, 'file': getattr(module, '__file__', None)}
+
+
+def describe_class(cls):
+    return {'module': cls.__module__, 'class': cls.__qualname__}
+
+
+def describe_context(cls, example):
+    description = describe_class(cls)
+    description['name'] = context_name(cls.__name__, example)
+    description['example'] = None if example is NO_EXAMPLE else str(example)
+    return description
+
+
+def describe_exception(exception):
+    formatted = FormattedException.from_exception(exception)
+    return {
+        'type': formatted.type_name,
+        'message': formatted.message,
+        'traceback': formatted.traceback_lines,
+        'file': formatted.filename,
+        'line': formatted.lineno
+    }
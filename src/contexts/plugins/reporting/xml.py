@@ -45,19 +45,28 @@ class Result:
 
 
 class AssertionResult(Result):
-
+    """
+    Only the text of a failure is kept, not the exception itself,
+    so that tracebacks (and the frames they refer to) can be freed.
+    """
     def __init__(self, name):
         super(AssertionResult, self).__init__(name)
         self.failure = None
         self.error = None
+        self.msg = None
+        self.nfo = None
 
-    @property
-    def msg(self):
-        return str(self.failure or self.error)
+    def fail(self, exception):
+        self.failure = True
+        self.record(exception)
 
-    @property
-    def nfo(self):
-        return format_exception(self.failure or self.error)
+    def err(self, exception):
+        self.error = True
+        self.record(exception)
+
+    def record(self, exception):
+        self.msg = str(exception)
+        self.nfo = '\n'.join(format_exception(exception))
 
     @property
     def failures(self):
@@ -72,11 +81,58 @@ class AssertionResult(Result):
         return 0
 
 
-class XmlReporter:
+class TestSuitesWriter(object):
+    """
+    Writes a <testsuites> document one <testsuite> at a time.
+    The totals at the top of the file are written as a fixed-width placeholder
+    and filled in when the writer is closed.
+    """
+    header_width = 200
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def write(self, string):
+        if self.file is None:
+            self.file = io.open(self.path, 'wb')
+            self.file.write(b'<?xml version="1.0" encoding="utf-8"?>\n')
+            self.header_position = self.file.tell()
+            self.file.write(self.header(0, 0, 0, 0))
+        self.file.write(string.encode('utf-8'))
+
+    def close(self, tests, errors, failures, seconds):
+        self.write('</testsuites>')
+        self.file.seek(self.header_position)
+        self.file.write(self.header(tests, errors, failures, seconds))
+        self.file.close()
+        self.file = None
+
+    def header(self, tests, errors, failures, seconds):
+        attributes = [
+            ("tests", str(tests)),
+            ("errors", str(errors)),
+            ("failures", str(failures)),
+            ("time", "{0:.2f}".format(seconds))
+        ]
+        tag = '<testsuites ' + ' '.join('{}="{}"'.format(k, v) for k, v in attributes)
+        # whitespace is allowed before the closing bracket, so the header can be padded to a fixed width
+        return (tag.ljust(self.header_width) + '>').encode('ascii')
 
+
+class XmlReporter:
+    """
+    Writes each context to the file as soon as it has finished,
+    rather than keeping the whole run in memory.
+    """
     def __init__(self):
-        self.suites = Result("Test suites")
+        self.started = datetime.now()
         self.path = None
+        self.writer = None
+        self.ctx = None
+        self.tests = 0
+        self.failures = 0
+        self.errors = 0
 
     def initialise(self, args, environ):
         if(args and args.xml_path):
@@ -84,6 +140,10 @@ class XmlReporter:
             return True
         return False
 
+    @classmethod
+    def activated_by(cls):
+        return ['xml_path']
+
     def setup_parser(self, parser):
         parser.add_argument('--xml',
                             action='store',
@@ -93,12 +153,15 @@ class XmlReporter:
                             )
 
     def context_started(self, cls, example=NO_EXAMPLE):
+        self.finish_context()
         name = context_name(cls.__name__, example)
-        ctx = self.ctx = Result(name)
-        self.suites.add_child(ctx)
+        self.ctx = Result(name)
 
     def context_ended(self, cls, example=NO_EXAMPLE):
-        self.ctx.stop()
+        self.finish_context()
+
+    def context_errored(self, cls, example, exception):
+        self.finish_context()
 
     def assertion_started(self, func):
         self.test = AssertionResult(make_readable(func.__name__))
@@ -109,21 +172,30 @@ class XmlReporter:
 
     def assertion_failed(self, func, exception):
         self.test.stop()
-        self.test.failure = exception
+        self.test.fail(exception)
 
     def assertion_errored(self, func, exception):
         self.test.stop()
-        self.test.error = exception
+        self.test.err(exception)
 
-    def write_test_suites(self, builder):
-        total_tests = sum([len(suite) for suite in self.suites])
-        builder.start("testsuites", {
-            "tests": str(total_tests),
-            "errors": str(self.suites.errors),
-            "failures": str(self.suites.failures),
-            "time": "{0:.2f}".format(self.suites.time.total_seconds())
+    def finish_context(self):
+        if self.ctx is None:
+            return
+        self.ctx.stop()
+        self.tests += len(self.ctx)
+        self.failures += self.ctx.failures
+        self.errors += self.ctx.errors
 
-        })
+        builder = ET.TreeBuilder()
+        self.write_test_suite(builder, self.ctx)
+        self.end_test_suite(builder)
+        self.write(ET.tostring(builder.close(), encoding='unicode'))
+        self.ctx = None
+
+    def write(self, string):
+        if self.writer is None:
+            self.writer = TestSuitesWriter(self.path)
+        self.writer.write(string)
 
     def write_test_suite(self, builder, suite):
         builder.start("testsuite", {
@@ -162,18 +234,9 @@ class XmlReporter:
     def end_test_suite(self, builder):
         builder.end('testsuite')
 
-    def end_test_suites(self, builder):
-        builder.end('testsuites')
-
     def test_run_ended(self):
-        self.suites.stop()
-        builder = ET.TreeBuilder()
-        self.write_test_suites(builder)
-        for suite in self.suites:
-            self.write_test_suite(builder, suite)
-            self.end_test_suite(builder)
-        self.end_test_suites(builder)
-
-        el = ET.ElementTree(element=builder.close())
-        with io.open(self.path, 'wb') as f:
-            el.write(f)
+        self.finish_context()
+        if self.writer is None:
+            self.writer = TestSuitesWriter(self.path)
+        seconds = (datetime.now() - self.started).total_seconds()
+        self.writer.close(self.tests, self.errors, self.failures, seconds)
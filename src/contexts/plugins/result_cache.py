@@ -0,0 +1,135 @@
+import collections
+import json
+from ..caching import get_cache_path, write_atomically
+from .shuffling import Shuffler
+
+
+class ResultCache(object):
+    """
+    Remembers which test classes and assertions failed, and how long each test class took,
+    so that the next run can start with (or only run) the tests that failed last time.
+    Nothing is read or written unless one of its options is used (or --shard-by=duration,
+    which needs the durations). The shards of a run sharded by duration only read the cache:
+    if each one wrote back its own share of the results, the machines' caches would
+    drift apart and the next run's shards wouldn't line up.
+    """
+    @classmethod
+    def locate(cls):
+        # reorder after shuffling, so the failures come first whatever order they were shuffled into
+        return (Shuffler, None)
+
+    @classmethod
+    def activated_by(cls):
+        return ['rerun_failures', 'cache_results', 'shard_by']
+
+    def setup_parser(self, parser):
+        parser.add_argument('--cache-results',
+                            action='store_true',
+                            dest='cache_results',
+                            default=False,
+                            help="Remember which tests failed and how long each test class took, "
+                                 "for --last-failed, --failed-first and --shard-by=duration to use in later runs. "
+                                 "(Those options remember the results of the runs they're used in, too.)")
+        group = parser.add_mutually_exclusive_group(required=False)
+        group.add_argument('--last-failed',
+                           action='store_const',
+                           dest='rerun_failures',
+                           const='only',
+                           default=None,
+                           help="Only run the tests which failed last time (or everything, if nothing failed).")
+        group.add_argument('--failed-first',
+                           action='store_const',
+                           dest='rerun_failures',
+                           const='first',
+                           default=None,
+                           help="Run the tests which failed last time before the rest of the tests.")
+
+    def initialise(self, args, env):
+        if args.rerun_failures is None and not args.cache_results and getattr(args, 'shard_by', None) != 'duration':
+            return False
+        self.path = get_cache_path('results.json', env)
+        self.mode = args.rerun_failures
+        self.read_only = getattr(args, 'shard', None) is not None and getattr(args, 'shard_by', None) == 'duration'
+        self.results = self.load()
+        self.last_failures = {name for name, result in self.results.items() if result['failed']}
+        if self.mode == 'only' and not self.last_failures:
+            self.mode = None
+        return True
+
+    def __init__(self):
+        self.mode = None
+        self.read_only = False
+        self.results = {}
+        self.last_failures = set()
+        self.current_class = None
+
+    def process_module_list(self, modules):
+        failed_modules = {name.split(':')[0] for name in self.last_failures}
+        self.rearrange(modules, lambda module: module.__name__ in failed_modules)
+
+    def process_class_list(self, module, classes):
+        self.rearrange(classes, lambda cls: class_name(cls) in self.last_failures)
+
+    def process_assertion_list(self, cls, assertions):
+        failed_assertions = self.results.get(class_name(cls), {}).get('failed_assertions', [])
+        if self.mode == 'only' and not failed_assertions:
+            # the class failed before getting as far as its assertions
+            return
+        self.rearrange(assertions, lambda func: func.__name__ in failed_assertions)
+
+    def rearrange(self, l, failed_last_time):
+        if self.mode == 'only':
+            l[:] = [x for x in l if failed_last_time(x)]
+        elif self.mode == 'first':
+            l.sort(key=lambda x: not failed_last_time(x))
+
+    def test_class_started(self, cls):
+        self.current_class = class_name(cls)
+        self.results[self.current_class] = {'failed': False, 'duration': 0, 'failed_assertions': []}
+
+    def test_class_timed(self, cls, duration):
+        self.results[class_name(cls)]['duration'] = duration
+
+    def test_class_errored(self, cls, exception):
+        self.results[class_name(cls)]['failed'] = True
+
+    def context_errored(self, name, example, exception):
+        self.results[self.current_class]['failed'] = True
+
+    def assertion_failed(self, func, exception):
+        result = self.results[self.current_class]
+        result['failed'] = True
+        if func.__name__ not in result['failed_assertions']:  # classes with examples run their assertions more than once
+            result['failed_assertions'].append(func.__name__)
+
+    assertion_errored = assertion_failed
+
+    def get_expected_duration(self, cls):
+        result = self.results.get(class_name(cls))
+        if result is not None:
+            return result['duration']
+
+    def get_module_durations(self):
+        durations = collections.Counter()
+        for name, result in self.results.items():
+            durations[name.split(':')[0]] += result['duration']
+        return durations
+
+    def test_run_ended(self):
+        if self.read_only:
+            return
+        write_atomically(self.path, json.dumps(self.results).encode('utf-8'))
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def __eq__(self, other):
+        return type(self) == type(other)
+
+
+def class_name(cls):
+    return '{}:{}'.format(cls.__module__, cls.__qualname__)
@@ -0,0 +1,104 @@
+import argparse
+import os
+import zlib
+from ..discovery import with_parent_packages
+from .importing import resolve_filename
+from .result_cache import ResultCache
+
+
+class Sharder(object):
+    """
+    Runs one of several shares ('shards') of the test modules, so that a test suite
+    can be split between several machines. Modules belonging to other shards
+    are never imported (except for packages containing this shard's modules,
+    which are imported but not run).
+    """
+    @classmethod
+    def activated_by(cls):
+        return ['shard']
+
+    def setup_parser(self, parser):
+        parser.add_argument('--shard',
+                            action='store',
+                            dest='shard',
+                            type=parse_shard,
+                            default=None,
+                            metavar='K/N',
+                            help="Split the test modules into N shards and only run the Kth one.")
+        parser.add_argument('--shard-by',
+                            action='store',
+                            dest='shard_by',
+                            choices=['name', 'duration'],
+                            default='name',
+                            help="Assign modules to shards by a hash of their path (the default), "
+                                 "or using the durations recorded in the result cache.")
+
+    def initialise(self, args, env):
+        if args.shard is None:
+            return False
+        self.index, self.count = args.shard
+        self.by_duration = args.shard_by == 'duration'
+        return True
+
+    def __init__(self):
+        self.result_cache = None
+        self.assigned_files = None
+
+    def request_plugins(self):
+        returned_plugins = yield [ResultCache]
+        self.result_cache = returned_plugins.get(ResultCache)
+
+    def process_module_specification_list(self, specifications):
+        specs = sorted(set(tuple(spec) for spec in specifications))
+        if self.by_duration and self.result_cache is not None:
+            shards = self.assign_by_duration(specs)
+        else:
+            shards = [self.hash_path(spec) for spec in specs]
+        assigned = {spec for spec, shard in zip(specs, shards) if shard == self.index}
+
+        self.assigned_files = {os.path.realpath(resolve_filename(*spec)) for spec in assigned}
+        to_import = with_parent_packages(assigned)
+        specifications[:] = [spec for spec in specifications if tuple(spec) in to_import]
+
+    def process_module_list(self, modules):
+        if self.assigned_files is None:  # a single file was run, not a folder
+            return
+        # parent packages from other shards still had to be imported
+        modules[:] = [m for m in modules if os.path.realpath(m.__file__) in self.assigned_files]
+
+    def hash_path(self, spec):
+        # a path relative to the working directory, so that it's the same on every machine
+        path = os.path.relpath(resolve_filename(*spec)).replace(os.sep, '/')
+        return zlib.crc32(path.encode('utf-8')) % self.count
+
+    def assign_by_duration(self, specs):
+        """
+        Hand out the modules slowest first, each to the shard with the least work so far.
+        Every machine must have the same result cache, or the shards won't line up.
+        """
+        recorded = self.result_cache.get_module_durations()
+        durations = [recorded.get(name) for _, name in specs]
+        known = [d for d in durations if d is not None]
+        default = sum(known) / len(known) if known else 1
+        durations = [default if d is None else d for d in durations]
+
+        totals = [0] * self.count
+        shards = [None] * len(specs)
+        for i in sorted(range(len(specs)), key=lambda i: (-durations[i], specs[i])):
+            shard = totals.index(min(totals))
+            shards[i] = shard
+            totals[shard] += durations[i]
+        return shards
+
+    def __eq__(self, other):
+        return type(self) == type(other)
+
+
+def parse_shard(string):
+    try:
+        k, n = (int(x) for x in string.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected K/N, like 1/4")
+    if not 1 <= k <= n:
+        raise argparse.ArgumentTypeError("K must be between 1 and N")
+    return k - 1, n
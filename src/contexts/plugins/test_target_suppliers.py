@@ -11,16 +11,18 @@ class CommandLineSupplier(object):
         parser.add_argument('path',
                             action='store',
                             nargs='?',
-                            default=os.getcwd(),
-                            help="Path to the test file or directory to run. (Default: current directory)")
+                            default=None,
+                            help="Path to the test file, directory or zip archive to run. (Default: current directory)")
 
     def initialise(self, args, env):
+        # not the parser's default, because the parser's arguments are saved in the plugin manifest
+        target = args.path if args.path is not None else os.getcwd()
         # the path may begin with, eg, "C:/"
-        drive, path = os.path.splitdrive(args.path)
+        drive, path = os.path.splitdrive(target)
         if ':' in path:
-            path, _, classname = args.path.rpartition(':')
+            path, _, classname = target.rpartition(':')
         else:
-            path, classname = args.path, ''
+            path, classname = target, ''
 
         path = os.path.realpath(os.path.join(drive, path))
 
@@ -0,0 +1,273 @@
+"""
+A resident test runner. ``run-contexts --server`` imports the plugins (and any modules
+named with ``--preload``) once, then waits for ``run-contexts --connect`` to ask for a test run.
+Each run happens in a child forked from the server, so it starts from an image in which
+everything has already been imported, and nothing it does can leak into the next run.
+
+The client sends its standard streams to the server along with its arguments, so the
+child's output goes straight to the client's terminal (or wherever it was redirected).
+"""
+import argparse
+import array
+import importlib
+import json
+import os
+import random
+import signal
+import socket
+import sys
+import traceback
+from . import distributions
+from .caching import get_cache_path
+from .plugin_discovery import PluginManifest
+
+
+SOCKET_NAME = 'server.sock'
+INHERITED_FDS_VARIABLE = 'CONTEXTS_SERVER_FDS'
+STANDARD_STREAMS = [0, 1, 2]
+MAX_SOCKET_PATH = 100  # sockaddr_un only has room for about this many bytes
+
+
+def serve(argv, environ=os.environ):
+    """
+    Run the server until interrupted.
+    """
+    parser = argparse.ArgumentParser(prog='run-contexts --server')
+    parser.add_argument('--preload',
+                        action='append',
+                        default=[],
+                        metavar='MODULE',
+                        help="Import MODULE when the server starts, so each test run begins with it already imported. "
+                             "Can be given more than once, or as a comma-separated list.")
+    args = parser.parse_args(argv)
+
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    path = get_cache_path(SOCKET_NAME, environ)
+    inherited = environ.pop(INHERITED_FDS_VARIABLE, None)
+    if inherited is None:
+        listener = listen(path)
+        pending = []
+    else:
+        listener_fd, connection_fd = (int(fd) for fd in inherited.split(','))
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM, 0, listener_fd)
+        pending = [socket.socket(socket.AF_UNIX, socket.SOCK_STREAM, 0, connection_fd)]
+
+    server = Server(listener, argv)
+    server.preload([name for arg in args.preload for name in arg.split(',') if name])
+    print("Contexts server listening on {} (pid {})".format(path, os.getpid()))
+    sys.stdout.flush()
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for connection in pending:
+            server.handle(connection)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        os.remove(path)
+
+
+def listen(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        if connect_to(path) is not None:
+            sys.exit("A Contexts server is already listening on " + path)
+        os.remove(path)  # left behind by a server which didn't shut down cleanly
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_address(path))
+    listener.listen(16)
+    return listener
+
+
+class Server(object):
+    def __init__(self, listener, argv):
+        self.listener = listener
+        self.argv = argv
+        self.mtimes = {}
+
+    def preload(self, module_names):
+        manifest = PluginManifest.load(distributions.entry_points('contexts.plugins'))
+        for entry in manifest.plugins.values():
+            distributions.load(entry['value'])
+        for name in module_names:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                # the tests will run into the same error when they import the module, and report it properly
+                traceback.print_exc()
+        # imported here so that the client doesn't have to import watching's dependencies
+        from .watching import find_source_files
+        self.mtimes = {path: distributions.get_mtime(path) for path in find_source_files()}
+
+    def serve_forever(self):
+        # the children don't need to be waited for
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        while True:
+            connection, _ = self.listener.accept()
+            self.handle(connection)
+
+    def handle(self, connection):
+        changes = self.find_changes()
+        if changes:
+            self.reload(connection, changes)
+
+        if os.fork() == 0:
+            try:
+                self.listener.close()
+                run_child(connection)
+            finally:
+                os._exit(1)
+        connection.close()
+
+    def find_changes(self):
+        return sorted(path for path, mtime in self.mtimes.items() if distributions.get_mtime(path) != mtime)
+
+    def reload(self, connection, changes):
+        """
+        Some of the code which was imported when the server started has changed,
+        so start again in a fresh interpreter (keeping the socket, and the request
+        which is waiting to be answered) rather than running the tests against the old code.
+        """
+        print("Reloading, because {} changed".format(', '.join(changes)))
+        sys.stdout.flush()
+        self.listener.set_inheritable(True)
+        connection.set_inheritable(True)
+        environ = dict(os.environ)
+        environ[INHERITED_FDS_VARIABLE] = '{},{}'.format(self.listener.fileno(), connection.fileno())
+        os.execve(sys.executable, [sys.executable, '-m', 'contexts', '--server'] + self.argv, environ)
+
+
+def run_child(connection):
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    request, fds = receive_request(connection)
+    send_message(connection, {'pid': os.getpid()})
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    for target, fd in zip(STANDARD_STREAMS, fds):
+        os.dup2(fd, target)
+        os.close(fd)
+
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['environ'])
+    sys.argv = [sys.argv[0]] + request['argv']
+    # every child starts with the server's random state, which would make --shuffle the same every time
+    random.seed()
+
+    try:
+        exit_code = run_tests()
+    except SystemExit as e:
+        exit_code = get_exit_code(e)
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    send_message(connection, {'exit_code': exit_code})
+    connection.close()
+    os._exit(0)
+
+
+def run_tests():
+    from . import run_with_plugins
+    from .__main__ import init_colorama
+    from .plugin_discovery import load_plugins
+    init_colorama()
+    return run_with_plugins(load_plugins())
+
+
+def get_exit_code(system_exit):
+    if system_exit.code is None:
+        return 0
+    if isinstance(system_exit.code, int):
+        return system_exit.code
+    print(system_exit.code, file=sys.stderr)
+    return 1
+
+
+def receive_request(connection):
+    fd_size = array.array('i').itemsize
+    data, ancdata, _, _ = connection.recvmsg(65536, socket.CMSG_LEN(len(STANDARD_STREAMS) * fd_size))
+    fds = array.array('i')
+    for level, kind, cmsg_data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(cmsg_data[:len(cmsg_data) - (len(cmsg_data) % fd_size)])
+
+    chunks = [data]
+    while chunks[-1]:
+        chunks.append(connection.recv(65536))
+    return json.loads(b''.join(chunks).decode('utf-8')), list(fds)
+
+
+def send_message(connection, message):
+    connection.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+
+def connect(argv, environ=os.environ):
+    """
+    Ask the server which is running in this folder to run the tests,
+    and wait for the run to finish. The output is written by the server,
+    straight to this process's standard output and standard error.
+
+    Returns the exit code of the test run, or None if there's no server to ask.
+    """
+    connection = connect_to(get_cache_path(SOCKET_NAME, environ))
+    if connection is None:
+        return None
+
+    with connection:
+        request = {'argv': argv, 'cwd': os.getcwd(), 'environ': dict(environ)}
+        sys.stdout.flush()
+        sys.stderr.flush()
+        try:
+            connection.sendmsg(
+                [json.dumps(request).encode('utf-8')],
+                [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', STANDARD_STREAMS))]
+            )
+        except OSError:  # one of the standard streams is closed, perhaps
+            return None
+        connection.shutdown(socket.SHUT_WR)
+        return wait_for_result(connection.makefile('rb'))
+
+
+def wait_for_result(replies):
+    pid = None
+    try:
+        for line in replies:
+            message = json.loads(line.decode('utf-8'))
+            if 'pid' in message:
+                pid = message['pid']
+            if 'exit_code' in message:
+                return message['exit_code']
+    except KeyboardInterrupt:
+        # the child isn't in our process group, so it needs telling
+        if pid is not None:
+            os.kill(pid, signal.SIGINT)
+        raise
+    print("The Contexts server stopped before the test run finished", file=sys.stderr)
+    return 1
+
+
+def connect_to(path):
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_address(path))
+    except OSError:
+        connection.close()
+        return None
+    return connection
+
+
+def socket_address(path):
+    if len(os.fsencode(path)) <= MAX_SOCKET_PATH:
+        return path
+    return os.path.relpath(path)
@@ -0,0 +1,178 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from . import run_with_plugins
+from .discovery import with_parent_packages
+from .plugin_discovery import load_plugins
+from .plugins.importing import resolve_filename
+from .plugins.importing.dependencies import DependencyGraph, is_installed
+
+
+POLL_INTERVAL = 1
+SETTLE_TIME = 0.1
+
+
+def watch():
+    """
+    Run the tests, then keep running the tests affected by each change to the
+    test files or the modules they imported, until interrupted.
+    """
+    watcher = Watcher()
+    waiter = create_waiter()
+    try:
+        while True:
+            plugin_list = load_plugins()
+            plugin_list.insert(0, watcher)
+            run_with_plugins(plugin_list)
+
+            watcher.take_snapshot()
+            changes = wait_for_changes(watcher, waiter)
+            watcher.invalidate(changes)
+    except KeyboardInterrupt:
+        pass
+
+
+def wait_for_changes(watcher, waiter):
+    while True:
+        waiter.wait(watcher.folders)
+        time.sleep(SETTLE_TIME)  # editors often save in more than one step
+        changes = watcher.find_changes()
+        if changes:
+            return changes
+
+
+class Watcher(object):
+    """
+    A plugin which keeps track of the files involved in a test run, so that
+    when some of them change only the affected test modules need to be run again.
+    """
+    def __init__(self):
+        self.test_files = set()
+        self.affected = None
+        self.mtimes = {}
+        self.folders = set()
+        self.dependencies = DependencyGraph()
+
+    def test_run_started(self):
+        self.dependencies.install()
+
+    def test_run_ended(self):
+        self.dependencies.uninstall()
+
+    def process_module_specification_list(self, specifications):
+        files = [os.path.realpath(resolve_filename(*spec)) for spec in specifications]
+        previous_test_files, self.test_files = self.test_files, set(files)
+        if self.affected is None:
+            return
+
+        # new files haven't been run yet, so they're affected too
+        to_run = {tuple(spec) for spec, filename in zip(specifications, files)
+                  if filename in self.affected or filename not in previous_test_files}
+        specifications[:] = [spec for spec in specifications if tuple(spec) in with_parent_packages(to_run)]
+
+    def suite_started(self, module):
+        filename = getattr(module, '__file__', None)
+        if filename is not None:
+            self.test_files.add(os.path.realpath(filename))
+
+    def take_snapshot(self):
+        files = self.test_files | set(find_source_files())
+        self.folders = {os.path.dirname(f) for f in files}
+        self.mtimes = {path: get_mtime(path) for path in files | self.folders}
+
+    def find_changes(self):
+        return {path for path, mtime in self.mtimes.items() if get_mtime(path) != mtime}
+
+    def invalidate(self, changes):
+        changed_sources = {f for f in changes if f not in self.folders and f not in self.test_files}
+        changed_tests = changes & self.test_files
+        dependents = self.dependencies.dependents(changed_sources | changed_tests)
+        if any(f not in self.dependencies for f in changed_sources):
+            # we don't know which tests use the changed code, so run all of them
+            self.affected = set(self.test_files)
+        else:
+            self.affected = dependents & self.test_files
+
+        # the modules which imported a changed module have to be run again
+        # too, otherwise they'd hang on to the old version
+        to_forget = self.affected | dependents
+        self.dependencies.forget(to_forget)
+        for name, module in list(sys.modules.items()):
+            filename = getattr(module, '__file__', None)
+            if filename is not None and os.path.realpath(filename) in to_forget:
+                del sys.modules[name]
+
+
+def find_source_files():
+    """Yield the files of the imported modules which aren't part of the Python installation."""
+    for module in list(sys.modules.values()):
+        filename = getattr(module, '__file__', None)
+        if filename is None or not filename.endswith('.py'):
+            continue
+        if not is_installed(filename):
+            yield os.path.realpath(filename)
+
+
+def get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def create_waiter():
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWaiter()
+        except (OSError, AttributeError):
+            pass
+    return PollingWaiter()
+
+
+class PollingWaiter(object):
+    def wait(self, folders):
+        time.sleep(POLL_INTERVAL)
+
+
+class InotifyWaiter(object):
+    """
+    Sleeps until something happens in one of the watched folders.
+    Changes are still detected by comparing mtimes, so this only needs to wake us up;
+    it times out every so often in case a watch couldn't be added.
+    """
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_CLOEXEC = 0o2000000
+    mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watched = set()
+
+    def wait(self, folders):
+        for folder in folders - self.watched:
+            if self.libc.inotify_add_watch(self.fd, os.fsencode(folder), self.mask) >= 0:
+                self.watched.add(folder)
+
+        readable, _, _ = select.select([self.fd], [], [], POLL_INTERVAL)
+        if readable:
+            self.drain()
+
+    def drain(self):
+        while True:
+            os.read(self.fd, 64 * struct.calcsize('iIII'))
+            readable, _, _ = select.select([self.fd], [], [], 0)
+            if not readable:
+                return
@@ -0,0 +1,96 @@
+import os
+import sys
+import tempfile
+from unittest import mock
+import contexts
+from contexts import distributions
+from contexts.plugins.reporting.cli import DotsReporter
+
+
+class WhenFindingEntryPointsForTheFirstTime:
+    def establish_that_there_is_no_manifest(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.environ = {'CONTEXTS_CACHE_DIR': self.tempdir.name}
+
+    def because_we_look_for_the_plugins(self):
+        self.result = distributions.entry_points('contexts.plugins', self.environ)
+
+    def it_should_find_the_builtin_plugins(self):
+        assert ('DotsReporter', 'contexts.plugins.reporting.cli:DotsReporter') in self.result
+
+    def it_should_only_list_each_plugin_once(self):
+        assert len(set(self.result)) == len(self.result)
+
+    def it_should_write_a_manifest(self):
+        assert os.path.exists(os.path.join(self.tempdir.name, 'entry_points.json'))
+
+    def cleanup_the_tempdir(self):
+        self.tempdir.cleanup()
+
+
+class WhenTheManifestIsUpToDate:
+    def establish_that_the_entry_points_were_found_before(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.environ = {'CONTEXTS_CACHE_DIR': self.tempdir.name}
+        self.first = distributions.entry_points('contexts.plugins', self.environ)
+
+    def because_we_look_for_them_again(self):
+        with mock.patch('contexts.distributions.read_entry_points') as self.read_entry_points:
+            self.second = distributions.entry_points('contexts.plugins', self.environ)
+
+    def it_should_not_read_the_metadata(self):
+        assert not self.read_entry_points.called
+
+    def it_should_return_the_same_entry_points(self):
+        assert self.second == self.first
+
+    def cleanup_the_tempdir(self):
+        self.tempdir.cleanup()
+
+
+class WhenTheInstalledDistributionsHaveChanged:
+    def establish_that_the_entry_points_were_found_before(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.environ = {'CONTEXTS_CACHE_DIR': self.tempdir.name}
+        distributions.entry_points('contexts.plugins', self.environ)
+
+    def because_we_look_for_them_in_a_different_environment(self):
+        with mock.patch('contexts.distributions.environment_key', return_value='something else'), \
+                mock.patch('contexts.distributions.read_entry_points', return_value=[('Plugin', 'package:Plugin')]):
+            self.result = distributions.entry_points('contexts.plugins', self.environ)
+
+    def it_should_read_the_metadata_again(self):
+        assert self.result == [('Plugin', 'package:Plugin')]
+
+    def cleanup_the_tempdir(self):
+        self.tempdir.cleanup()
+
+
+class WhenTheTestsAreStartedFromADifferentFolder:
+    def establish_that_the_key_was_calculated_in_one_folder(self):
+        self.tempdirs = [tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()]
+        with mock.patch.object(sys, 'path', [self.tempdirs[0].name] + sys.path[1:]):
+            self.key_before = distributions.environment_key()
+
+    def because_we_calculate_the_key_in_another_folder(self):
+        with mock.patch.object(sys, 'path', [self.tempdirs[1].name] + sys.path[1:]):
+            self.key_after = distributions.environment_key()
+
+    def it_should_not_change_the_environment_key(self):
+        assert self.key_after == self.key_before
+
+    def cleanup_the_tempdirs(self):
+        for tempdir in self.tempdirs:
+            tempdir.cleanup()
+
+
+class WhenLoadingAnEntryPoint:
+    def because_we_load_a_plugin_class(self):
+        self.result = distributions.load('contexts.plugins.reporting.cli:DotsReporter')
+
+    def it_should_import_the_class(self):
+        assert self.result is DotsReporter
+
+
+if __name__ == "__main__":
+    contexts.main()
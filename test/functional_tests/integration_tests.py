@@ -1,6 +1,8 @@
 import os
 import shutil
+import tempfile
 import types
+import zipfile
 import contexts
 from unittest import mock
 from .tools import UnorderedList, run_object
@@ -14,7 +16,8 @@ TEST_DATA_DIR = os.path.join(os.path.dirname(THIS_FILE), "test_data")
 
 class WhenAPluginSuppliesAFileToRun:
     def establish_that_there_is_a_file_in_the_filesystem(self):
-        self.module_name = "test_file"
+        # a file of its own, so that it doesn't get in the way of the other test classes in --processes runs
+        self.module_name = "test_file_" + type(self).__name__ + "_" + str(os.getpid())
         self.write_file()
 
         self.module = types.ModuleType(self.module_name)
@@ -48,7 +51,8 @@ class WhenAPluginSuppliesAFileToRun:
 
 class WhenRunningAFile:
     def establish_that_there_is_a_file_in_the_filesystem(self):
-        self.module_name = "test_file"
+        # a file of its own, so that it doesn't get in the way of the other test classes in --processes runs
+        self.module_name = "test_file_" + type(self).__name__ + "_" + str(os.getpid())
         self.write_file()
 
         self.module = types.ModuleType(self.module_name)
@@ -203,7 +207,7 @@ class WhenRunningAFileInASubPackage:
 
 class WhenRunningInitDotPy:
     def establish_that_there_is_a_file_in_the_filesystem(self):
-        self.package_name = "package_with_one_file"
+        self.package_name = "package_with_only_an_init_file"
         self.setup_tree()
 
         self.module = types.ModuleType(self.package_name)
@@ -370,7 +374,7 @@ class WhenRunningAFolderWhichIsNotAPackage:
         shutil.rmtree(self.folder_path)
 
     def setup_filesystem(self):
-        self.folder_path = os.path.join(TEST_DATA_DIR, 'non_package_folder')
+        self.folder_path = os.path.join(TEST_DATA_DIR, 'non_package_folder2')
         os.mkdir(self.folder_path)
 
         for module_name in self.module_names:
@@ -438,7 +442,7 @@ class WhenPluginsModifyAModuleList:
         shutil.rmtree(self.folder_path)
 
     def setup_filesystem(self):
-        self.folder_path = os.path.join(TEST_DATA_DIR, 'non_package_folder')
+        self.folder_path = os.path.join(TEST_DATA_DIR, 'non_package_folder3')
         os.mkdir(self.folder_path)
 
         for module_name in self.module_names:
@@ -779,5 +783,201 @@ class WhenRunningASubpackage:
                     f.write('')
 
 
+class WhenRunningADeeplyNestedPackage:
+    def establish_that_there_are_packages_inside_packages(self):
+        self.folder_path = os.path.join(TEST_DATA_DIR, 'nested_package')
+        path = self.folder_path
+        for name in ['package1', 'package2', 'package3']:
+            path = os.path.join(path, name)
+            os.makedirs(path)
+            for module_name in ['__init__', 'test_file']:
+                with open(os.path.join(path, module_name + '.py'), 'w+') as f:
+                    f.write('')
+        with open(os.path.join(self.folder_path, '__init__.py'), 'w+') as f:
+            f.write('')
+
+        self.plugin = mock.Mock(spec=PluginInterface)
+        self.plugin.identify_folder.return_value = TEST_FOLDER
+        self.plugin.identify_file.return_value = TEST_FILE
+
+    def because_we_run_the_package(self):
+        with mock.patch('os.listdir', wraps=os.listdir) as self.listdir:
+            run_object(self.folder_path, [self.plugin])
+
+    def it_should_list_each_folder_at_most_once(self):
+        listed = [c[1][0] for c in self.listdir.mock_calls]
+        assert len(listed) == len(set(listed))
+
+    def it_should_import_the_most_deeply_nested_module_with_its_full_name(self):
+        self.plugin.import_module.assert_any_call(TEST_DATA_DIR, 'nested_package.package1.package2.package3.test_file')
+
+    def cleanup_the_file_system(self):
+        shutil.rmtree(self.folder_path)
+
+
+class DiscoveryIndexSharedContext:
+    def establish_that_there_is_a_folder_containing_subfolders(self):
+        self.folder_path = os.path.join(TEST_DATA_DIR, 'indexed_folder_' + str(os.getpid()))
+        os.mkdir(self.folder_path)
+        for subfolder in ["wanted_subfolder", "another_subfolder"]:
+            os.mkdir(os.path.join(self.folder_path, subfolder))
+            self.write_file(subfolder, "test_file1")
+
+        self.index_dir = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.index_dir.name, 'index.json')
+        self.plugin_key = None
+
+        run_object(self.folder_path, [self.create_plugin()])
+        self.plugin = self.create_plugin()
+
+    def create_plugin(self):
+        def identify_folder(folder_path):
+            if folder_path == os.path.join(self.folder_path, "wanted_subfolder"):
+                return TEST_FOLDER
+        plugin = mock.Mock(spec=PluginInterface)
+        plugin.get_discovery_index_path.return_value = self.index_path
+        plugin.get_discovery_index_key.return_value = self.plugin_key
+        plugin.identify_file.return_value = TEST_FILE
+        plugin.identify_folder.side_effect = identify_folder
+        return plugin
+
+    def write_file(self, subfolder, module_name):
+        with open(os.path.join(self.folder_path, subfolder, module_name) + ".py", 'w+') as f:
+            f.write('')
+
+    def cleanup_the_file_system(self):
+        shutil.rmtree(self.folder_path)
+        self.index_dir.cleanup()
+
+
+class WhenRunningAnIndexedFolderForTheSecondTime(DiscoveryIndexSharedContext):
+    def because_we_run_the_folder_again(self):
+        run_object(self.folder_path, [self.plugin])
+
+    def it_should_not_ask_the_plugin_to_identify_any_folders(self):
+        assert not self.plugin.identify_folder.called
+
+    def it_should_not_ask_the_plugin_to_identify_any_files(self):
+        assert not self.plugin.identify_file.called
+
+    def it_should_import_the_file_in_the_test_folder(self):
+        assert self.plugin.import_module.call_args_list == [
+            mock.call(os.path.join(self.folder_path, "wanted_subfolder"), "test_file1")
+        ]
+
+
+class WhenAFileIsAddedToAnIndexedFolder(DiscoveryIndexSharedContext):
+    def context(self):
+        self.write_file("wanted_subfolder", "test_file2")
+        # make sure the folder's mtime changes, even on file systems with coarse timestamps
+        stat = os.stat(os.path.join(self.folder_path, "wanted_subfolder"))
+        os.utime(os.path.join(self.folder_path, "wanted_subfolder"), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def because_we_run_the_folder_again(self):
+        run_object(self.folder_path, [self.plugin])
+
+    def it_should_not_ask_the_plugin_to_identify_the_unchanged_folders(self):
+        assert not self.plugin.identify_folder.called
+
+    def it_should_import_both_files_in_the_test_folder(self):
+        assert self.plugin.import_module.call_args_list == UnorderedList([
+            mock.call(os.path.join(self.folder_path, "wanted_subfolder"), "test_file1"),
+            mock.call(os.path.join(self.folder_path, "wanted_subfolder"), "test_file2")
+        ])
+
+
+class WhenAPluginChangesTheWayItIdentifiesTestsInAnIndexedFolder(DiscoveryIndexSharedContext):
+    def context(self):
+        self.plugin_key = ['a different spec file']
+        self.plugin = self.create_plugin()
+
+    def because_we_run_the_folder_again(self):
+        run_object(self.folder_path, [self.plugin])
+
+    def it_should_search_the_folders_again(self):
+        assert self.plugin.identify_folder.called
+
+    def it_should_ask_the_plugin_to_identify_the_files_again(self):
+        assert self.plugin.identify_file.called
+
+
+class WhenAFolderAboveAnIndexedPackageBecomesAPackage:
+    def establish_that_an_indexed_package_has_been_run(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.top_folder = os.path.realpath(self.tempdir.name)
+        self.outer_folder = os.path.join(self.top_folder, 'outer')
+        self.package_path = os.path.join(self.outer_folder, 'specs')
+        os.makedirs(self.package_path)
+        for module_name in ['__init__', 'test_file1']:
+            with open(os.path.join(self.package_path, module_name + '.py'), 'w') as f:
+                f.write('')
+
+        run_object(self.package_path, [self.create_plugin()])
+        self.plugin = self.create_plugin()
+
+        with open(os.path.join(self.outer_folder, '__init__.py'), 'w') as f:
+            f.write('')
+
+    def create_plugin(self):
+        plugin = mock.Mock(spec=PluginInterface)
+        plugin.get_discovery_index_path.return_value = os.path.join(self.top_folder, 'index.json')
+        plugin.get_discovery_index_key.return_value = None
+        plugin.identify_file.return_value = TEST_FILE
+        return plugin
+
+    def because_we_run_the_package_again(self):
+        run_object(self.package_path, [self.plugin])
+
+    def it_should_import_the_modules_as_part_of_the_outer_package(self):
+        assert self.plugin.import_module.call_args_list == [
+            mock.call(self.top_folder, 'outer'),
+            mock.call(self.top_folder, 'outer.specs'),
+            mock.call(self.top_folder, 'outer.specs.test_file1')
+        ]
+
+    def cleanup_the_tempdir(self):
+        self.tempdir.cleanup()
+
+
+class WhenRunningAZipArchive:
+    def establish_that_there_is_an_archive_containing_test_files(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.archive = os.path.join(os.path.realpath(self.tempdir.name), 'tests.zip')
+        with zipfile.ZipFile(self.archive, 'w') as z:
+            z.writestr('test_file1.py', '')
+            z.writestr('an_innocent_module.py', '')
+            z.writestr('wanted_subfolder/test_file2.py', '')
+            z.writestr('unwanted_subfolder/test_file3.py', '')
+            z.writestr('a_package/__init__.py', '')
+            z.writestr('a_package/test_file4.py', '')
+
+        def identify_folder(folder_path):
+            if os.path.basename(folder_path) != "unwanted_subfolder":
+                return TEST_FOLDER
+
+        def identify_file(path):
+            if os.path.basename(path).startswith("test"):
+                return TEST_FILE
+
+        self.plugin = mock.Mock(spec=PluginInterface)
+        self.plugin.identify_folder.side_effect = identify_folder
+        self.plugin.identify_file.side_effect = identify_file
+        self.plugin.get_discovery_index_path.return_value = os.path.join(self.tempdir.name, 'index.json')
+
+    def because_we_run_the_archive(self):
+        run_object(self.archive, [self.plugin])
+
+    def it_should_import_the_test_files_as_if_the_archive_were_a_folder(self):
+        assert self.plugin.import_module.call_args_list == UnorderedList([
+            mock.call(self.archive, "test_file1"),
+            mock.call(self.archive, "a_package"),
+            mock.call(self.archive, "a_package.test_file4"),
+            mock.call(os.path.join(self.archive, "wanted_subfolder"), "test_file2")
+        ])
+
+    def cleanup_the_archive(self):
+        self.tempdir.cleanup()
+
+
 if __name__ == "__main__":
     contexts.main()
@@ -0,0 +1,71 @@
+import io
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+import contexts
+from contexts.merging import merge
+from contexts.plugins.reporting.xml import TestSuitesWriter
+
+
+FIRST_REPORT = """<?xml version="1.0" encoding="utf-8"?>
+<testsuites tests="2" errors="0" failures="1" time="1.50">
+<testsuite name="When one thing" tests="2" errors="0" failures="1" time="1.00">
+<testcase name="it should pass" time="0.50" />
+<testcase name="it should fail" time="0.50"><failure type="failure" message="oops">traceback</failure></testcase>
+</testsuite>
+</testsuites>
+"""
+
+SECOND_REPORT = """<?xml version="1.0" encoding="utf-8"?>
+<testsuites tests="1" errors="1" failures="0" time="0.25">
+<testsuite name="When another thing" tests="1" errors="1" failures="0" time="0.25">
+<testcase name="it should error" time="0.25"><error type="error" message="bang">traceback</error></testcase>
+</testsuite>
+<testsuite name="When nothing happens" tests="0" errors="0" failures="0" time="0.00" />
+</testsuites>
+"""
+
+
+class WhenMergingXmlReports:
+    def establish_that_there_are_two_reports(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.inputs = []
+        for i, report in enumerate([FIRST_REPORT, SECOND_REPORT]):
+            path = os.path.join(self.tempdir.name, 'report{}.xml'.format(i))
+            with open(path, 'w') as f:
+                f.write(report)
+            self.inputs.append(path)
+        self.output = os.path.join(self.tempdir.name, 'merged.xml')
+        self.stream = io.StringIO()
+
+    def because_we_merge_them(self):
+        self.counts = merge(self.inputs, TestSuitesWriter(self.output), self.stream)
+        self.merged = ET.parse(self.output).getroot()
+
+    def it_should_include_every_suite(self):
+        assert [s.get('name') for s in self.merged] == ["When one thing", "When another thing", "When nothing happens"]
+
+    def it_should_keep_the_test_cases(self):
+        assert self.merged[0][1].find('failure').get('message') == 'oops'
+
+    def it_should_add_up_the_tests(self):
+        assert self.merged.get('tests') == '3'
+
+    def it_should_add_up_the_failures_and_errors(self):
+        assert (self.merged.get('failures'), self.merged.get('errors')) == ('1', '1')
+
+    def it_should_add_up_the_time(self):
+        assert self.merged.get('time') == '1.75'
+
+    def it_should_count_the_contexts_for_the_summary(self):
+        assert self.counts.context_count == 3
+
+    def it_should_remember_that_the_run_failed(self):
+        assert self.counts.failed
+
+    def cleanup_the_tempdir(self):
+        self.tempdir.cleanup()
+
+
+if __name__ == "__main__":
+    contexts.main()
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import tempfile
+import contexts
+
+
+SPEC_FILE = """
+import multiprocessing
+
+class WhenStartingAProcess:
+    def it_should_run_the_process(self):
+        process = multiprocessing.Process(target=int)
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+
+class WhenUsingAProcessPool:
+    def it_should_get_the_results(self):
+        with multiprocessing.Pool(2) as pool:
+            assert pool.map(abs, [-1, -2]) == [1, 2]
+
+class WhenPassing:
+    def it_should_pass(self):
+        pass
+"""
+
+
+class WhenRunningSpecsWhichUseMultiprocessingInWorkerProcesses:
+    def establish_that_there_is_a_spec_file(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        os.mkdir(os.path.join(self.tempdir.name, 'specs'))
+        with open(os.path.join(self.tempdir.name, 'specs', 'test_multiprocessing.py'), 'w') as f:
+            f.write(SPEC_FILE)
+        self.env = dict(os.environ, CONTEXTS_CACHE_DIR=os.path.join(self.tempdir.name, 'cache'))
+
+    def because_we_run_the_specs_in_two_processes(self):
+        self.result = subprocess.run([sys.executable, '-m', 'contexts', 'specs', '--processes', '2', '--no-random'],
+                                     cwd=self.tempdir.name, env=self.env,
+                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+
+    def it_should_run_every_test_without_errors(self):
+        assert "3 contexts, 3 assertions" in self.result.stdout.decode()
+        assert "error" not in self.result.stdout.decode()
+
+    def it_should_exit_successfully(self):
+        assert self.result.returncode == 0
+
+    def cleanup_the_tempdir(self):
+        self.tempdir.cleanup()
+
+
+if __name__ == "__main__":
+    contexts.main()
@@ -0,0 +1,201 @@
+import argparse
+import os
+import tempfile
+from unittest import mock
+import contexts
+from contexts.plugins.test_target_suppliers import CommandLineSupplier
+from contexts.plugin_discovery import (
+    PluginManifest, LazyCallable, record_arguments, replay_arguments, might_be_active
+)
+
+
+class ParserExited(Exception):
+    pass
+
+
+def parse_colour(string):
+    return string.upper()
+
+
+class PluginWithOptions(object):
+    def setup_parser(self, parser):
+        parser.add_argument('--colour', dest='colour', type=parse_colour, default=None)
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument('--loud', action='store_const', dest='volume', const='loud')
+        group.add_argument('--quiet', action='store_const', dest='volume', const='quiet')
+
+
+class WhenReplayingAPluginsOptions:
+    def establish_that_the_options_were_recorded(self):
+        self.calls = record_arguments(PluginWithOptions())
+
+    def because_we_replay_them_and_parse_some_arguments(self):
+        self.parser = argparse.ArgumentParser()
+        replay_arguments(self.parser, self.calls)
+        self.args = self.parser.parse_args(['--colour', 'red', '--loud'])
+
+    def it_should_parse_the_options_the_plugin_added(self):
+        assert self.args.volume == 'loud'
+
+    def it_should_not_import_the_type_until_it_is_needed(self):
+        assert isinstance(self.parser._option_string_actions['--colour'].type, LazyCallable)
+
+    def it_should_still_convert_the_value(self):
+        assert self.args.colour == 'RED'
+
+    def it_should_keep_the_group_exclusive(self):
+        with mock.patch.object(self.parser, 'exit', side_effect=ParserExited), mock.patch('sys.stderr'):
+            exception = contexts.catch(self.parser.parse_args, ['--loud', '--quiet'])
+        assert isinstance(exception, ParserExited)
+
+
+class PluginWhichSetsDefaults(object):
+    def setup_parser(self, parser):
+        parser.set_defaults(something=1)
+
+
+class WhenAPluginDoesSomethingToTheParserWhichCannotBeReplayed:
+    def because_we_record_its_options(self):
+        self.result = record_arguments(PluginWhichSetsDefaults())
+
+    def it_should_say_so(self):
+        assert self.result is None
+
+
+class WhenDecidingWhichPluginsMightBeActive:
+    def establish_that_some_options_were_given(self):
+        self.parser = argparse.ArgumentParser()
+        self.parser.add_argument('--xml', dest='xml_path', default=None)
+        self.parser.add_argument('--processes', dest='processes', type=int, default=1)
+        self.args = self.parser.parse_args(['--xml', 'out.xml'])
+
+    def because_we_check_some_plugins(self):
+        self.xml = might_be_active({'activated_by': ['xml_path']}, self.args, self.parser)
+        self.processes = might_be_active({'activated_by': ['processes']}, self.args, self.parser)
+        self.always = might_be_active({'activated_by': None}, self.args, self.parser)
+
+    def it_should_load_a_plugin_whose_option_was_used(self):
+        assert self.xml
+
+    def it_should_not_load_a_plugin_whose_options_were_left_alone(self):
+        assert not self.processes
+
+    def it_should_load_a_plugin_which_did_not_say(self):
+        assert self.always
+
+
+class WhenAPluginHasChangedSinceTheManifestWasBuilt:
+    def establish_that_there_is_a_manifest(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.plugin_file = os.path.join(self.tempdir.name, 'plugin.py')
+        with open(self.plugin_file, 'w') as f:
+            f.write('')
+        self.entry_points = [('Plugin', 'plugin:Plugin')]
+        self.manifest = PluginManifest(self.entry_points, {}, {self.plugin_file: os.stat(self.plugin_file).st_mtime_ns}, [])
+        self.up_to_date_before = self.manifest.is_up_to_date(self.entry_points)
+
+    def because_the_plugin_is_edited(self):
+        mtime = os.stat(self.plugin_file).st_mtime_ns
+        os.utime(self.plugin_file, ns=(mtime + 1000000000, mtime + 1000000000))
+
+    def it_should_be_up_to_date_beforehand(self):
+        assert self.up_to_date_before
+
+    def it_should_need_rebuilding(self):
+        assert not self.manifest.is_up_to_date(self.entry_points)
+
+    def it_should_need_rebuilding_if_a_plugin_is_installed(self):
+        assert not self.manifest.is_up_to_date(self.entry_points + [('Another', 'another:Plugin')])
+
+    def cleanup_the_tempdir(self):
+        self.tempdir.cleanup()
+
+
+class First(object):
+    def initialise(self, args, env):
+        return True
+
+
+class Middle(object):
+    @classmethod
+    def locate(cls):
+        return (First, None)
+
+    def initialise(self, args, env):
+        return True
+
+
+class Last(object):
+    @classmethod
+    def locate(cls):
+        return (Middle, None)
+
+    def initialise(self, args, env):
+        return True
+
+
+class WhenTheManifestWasBuiltInADifferentFolder:
+    def establish_that_the_command_line_options_were_recorded_in_another_folder(self):
+        self.original_cwd = os.getcwd()
+        self.first_folder = tempfile.TemporaryDirectory()
+        self.second_folder = tempfile.TemporaryDirectory()
+        os.chdir(self.first_folder.name)
+        self.calls = record_arguments(CommandLineSupplier())
+        os.chdir(self.second_folder.name)
+
+    def because_we_parse_an_empty_command_line(self):
+        parser = argparse.ArgumentParser()
+        replay_arguments(parser, self.calls)
+        self.supplier = CommandLineSupplier()
+        self.supplier.initialise(parser.parse_args([]), {})
+
+    def it_should_run_the_tests_in_the_current_folder(self):
+        assert self.supplier.get_object_to_run() == os.path.realpath(self.second_folder.name)
+
+    def cleanup_the_folders(self):
+        os.chdir(self.original_cwd)
+        self.first_folder.cleanup()
+        self.second_folder.cleanup()
+
+
+class WhenBuildingAManifest:
+    def establish_that_some_plugins_say_where_they_go(self):
+        self.entry_points = [(name, __name__ + ':' + name) for name in ['Last', 'First', 'Middle']]
+
+    def because_we_build_the_manifest(self):
+        self.manifest = PluginManifest.build(self.entry_points)
+
+    def it_should_put_the_plugins_in_order(self):
+        assert self.manifest.get_order() == ['First', 'Middle', 'Last']
+
+    def it_should_remember_the_source_files(self):
+        assert list(self.manifest.files) == [__file__]
+
+
+class WhenLoadingAManifestWhichIsUpToDate:
+    def establish_that_a_manifest_was_saved(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.environ = {'CONTEXTS_CACHE_DIR': self.tempdir.name}
+        self.entry_points = [(name, __name__ + ':' + name) for name in ['Last', 'First', 'Middle']]
+        PluginManifest.load(self.entry_points, self.environ)
+
+    def because_the_manifest_is_loaded_a_second_time(self):
+        with mock.patch('contexts.plugin_discovery.PluginManifest.build') as self.build, \
+                mock.patch('contexts.plugin_discovery.PluginListBuilder') as self.builder:
+            self.manifest = PluginManifest.load(self.entry_points, self.environ)
+
+    def it_should_not_import_the_plugins_again(self):
+        assert not self.build.called
+
+    def it_should_not_sort_the_plugins_again(self):
+        assert not self.builder.called
+
+    def it_should_remember_the_order(self):
+        assert self.manifest.get_order() == ['First', 'Middle', 'Last']
+
+    def cleanup_the_tempdir(self):
+        self.tempdir.cleanup()
+
+
+if __name__ == "__main__":
+    contexts.main()
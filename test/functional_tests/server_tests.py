@@ -0,0 +1,119 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import contexts
+from contexts.server import Server, connect
+from contexts.__main__ import parse_run_mode
+
+
+SPEC_FILE = """
+class WhenPassing:
+    def it_should_pass(self):
+        pass
+
+class WhenFailing:
+    def it_should_fail(self):
+        assert False
+"""
+
+
+class WhenRunningTestsThroughTheServer:
+    def establish_that_a_server_is_running(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        os.mkdir(os.path.join(self.tempdir.name, 'specs'))
+        with open(os.path.join(self.tempdir.name, 'specs', 'test_server.py'), 'w') as f:
+            f.write(SPEC_FILE)
+
+        self.env = dict(os.environ, CONTEXTS_CACHE_DIR=os.path.join(self.tempdir.name, 'cache'))
+        self.server = subprocess.Popen([sys.executable, '-m', 'contexts', '--server'],
+                                       cwd=self.tempdir.name, env=self.env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.wait_for(os.path.join(self.tempdir.name, 'cache', 'server.sock'))
+
+    def because_we_ask_the_server_to_run_some_tests(self):
+        self.result = subprocess.run([sys.executable, '-m', 'contexts', '--connect', 'specs', '--no-random'],
+                                     cwd=self.tempdir.name, env=self.env,
+                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+
+    def it_should_send_the_output_back(self):
+        assert "2 contexts, 2 assertions: 1 failed, 0 errors" in self.result.stdout.decode()
+
+    def it_should_exit_with_the_exit_code_of_the_run(self):
+        assert self.result.returncode == 1
+
+    def cleanup_the_server(self):
+        self.server.terminate()
+        self.server.wait()
+        self.tempdir.cleanup()
+
+    def wait_for(self, path):
+        deadline = time.time() + 30
+        while not os.path.exists(path) and time.time() < deadline:
+            time.sleep(0.05)
+
+
+class WhenThereIsNoServerToConnectTo:
+    def establish_that_no_server_is_running(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.environ = {'CONTEXTS_CACHE_DIR': self.tempdir.name}
+
+    def because_we_try_to_connect(self):
+        self.result = connect(['specs'], self.environ)
+
+    def it_should_say_so(self):
+        assert self.result is None
+
+    def cleanup_the_tempdir(self):
+        self.tempdir.cleanup()
+
+
+class WhenAPreloadedModuleChanges:
+    def establish_that_the_server_has_imported_a_module(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.module_file = os.path.join(self.tempdir.name, 'heavy.py')
+        with open(self.module_file, 'w') as f:
+            f.write('')
+        self.server = Server(None, [])
+        self.server.mtimes = {self.module_file: os.stat(self.module_file).st_mtime_ns}
+        self.changes_before = self.server.find_changes()
+
+    def because_the_module_is_edited(self):
+        mtime = os.stat(self.module_file).st_mtime_ns
+        os.utime(self.module_file, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+    def it_should_not_have_found_any_changes_beforehand(self):
+        assert self.changes_before == []
+
+    def it_should_find_the_changed_module(self):
+        assert self.server.find_changes() == [self.module_file]
+
+    def cleanup_the_tempdir(self):
+        self.tempdir.cleanup()
+
+
+class WhenAskedToConnectToTheServer:
+    def because_we_parse_the_run_mode(self):
+        self.mode, self.argv = parse_run_mode(['--connect', 'specs', '--no-random'])
+
+    def it_should_connect(self):
+        assert self.mode.connect
+
+    def it_should_not_start_a_server(self):
+        assert not self.mode.server
+
+    def it_should_send_the_other_arguments_to_the_server(self):
+        assert self.argv == ['specs', '--no-random']
+
+
+class WhenAnOptionLooksLikeAnAbbreviationOfServer:
+    def because_we_parse_the_run_mode(self):
+        self.mode, self.argv = parse_run_mode(['--serv'])
+
+    def it_should_not_start_a_server(self):
+        assert not self.mode.server
+
+
+if __name__ == "__main__":
+    contexts.main()
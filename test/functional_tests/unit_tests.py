@@ -1,9 +1,18 @@
 import collections.abc
+import gc
+import inspect
+import io
+import multiprocessing
+import os
+import sys
 import types
+import weakref
 from unittest import mock
 import contexts
 from contexts.plugin_interface import PluginInterface, CONTEXT, EXAMPLES, SETUP, ACTION, ASSERTION, TEARDOWN, NO_EXAMPLE
 from contexts import assertion
+from contexts.errors import FormattedException
+from contexts.parallel import WorkerPool
 from .tools import UnorderedList, run_object
 
 
@@ -315,7 +324,8 @@ class WhenRunningASpecWithPlugins:
 
     def because_we_run_the_spec(self):
         run_object(self.spec, [self.plugin1, self.plugin2])
-        self.calls = self.plugin1.mock_calls
+        # timings and the user code notifications are checked separately below
+        self.calls = [c for c in self.plugin1.mock_calls if not c[0].endswith('_timed') and not c[0].startswith('user_code_')]
 
     def it_should_call_test_run_started_first(self):
         assert self.calls[0] == mock.call.test_run_started()
@@ -343,8 +353,40 @@ class WhenRunningASpecWithPlugins:
     def finally_it_should_call_test_run_ended(self):
         assert self.calls[7] == mock.call.test_run_ended()
 
+    def it_should_report_how_long_each_phase_took(self):
+        timings = [c for c in self.plugin1.mock_calls if c[0] == 'context_phase_timed']
+        assert [args[:3] for _, args, _ in timings] == [
+            (self.spec, NO_EXAMPLE, 'setup'),
+            (self.spec, NO_EXAMPLE, 'action'),
+            (self.spec, NO_EXAMPLE, 'assertions'),
+            (self.spec, NO_EXAMPLE, 'teardown')
+        ]
+        assert all(isinstance(args[3], int) and args[3] >= 0 for _, args, _ in timings)
+
+    def it_should_tell_the_plugins_as_the_spec_code_starts_and_stops_running(self):
+        names = [c[0] for c in self.plugin1.mock_calls if c[0] in ('user_code_started', 'user_code_ended', 'assertion_started', 'assertion_passed')]
+        assert names == [
+            'user_code_started', 'user_code_ended',  # setup
+            'user_code_started', 'user_code_ended',  # action
+            'assertion_started', 'user_code_started', 'user_code_ended', 'assertion_passed',
+            'user_code_started', 'user_code_ended'  # teardown
+        ]
+
+    def it_should_report_the_phase_timings_before_it_finishes(self):
+        names = [c[0] for c in self.plugin1.mock_calls]
+        assert names.index('context_ended') > max(i for i, n in enumerate(names) if n == 'context_phase_timed')
+
+    def it_should_report_how_long_the_class_took(self):
+        [(_, (cls, duration), _)] = [c for c in self.plugin1.mock_calls if c[0] == 'test_class_timed']
+        assert cls is self.spec
+        assert duration >= 0
+
+    def it_should_report_the_class_duration_before_the_class_ends(self):
+        names = [c[0] for c in self.plugin1.mock_calls]
+        assert names.index('test_class_timed') < names.index('test_class_ended')
+
     def it_should_do_exactly_the_same_to_the_other_plugin(self):
-        assert self.plugin2.mock_calls == self.calls
+        assert self.plugin2.mock_calls == self.plugin1.mock_calls
 
 
 class WhenAPluginModifiesAnAssertionList:
@@ -752,5 +794,385 @@ class WhenAPluginModifiesAClassList:
         assert not self.ran_reals
 
 
+class WhenAPluginAsksForMultipleProcesses:
+    def establish_that_the_plugin_wants_two_processes(self):
+        class Spec1:
+            def it_should_pass(self):
+                print(os.getpid())
+
+        class Spec2:
+            def it_should_fail(self):
+                assert False, "failed in a worker"
+
+        self.module = types.ModuleType('fake_specs')
+        self.module.Spec1 = Spec1
+        self.module.Spec2 = Spec2
+
+        self.plugin = Mock(spec=PluginInterface)
+        self.plugin.get_process_count.return_value = 2
+        self.plugin.identify_class.return_value = CONTEXT
+        self.plugin.identify_method.return_value = ASSERTION
+        self.plugin.get_exit_code.return_value = None
+
+        self.stdout = io.StringIO()
+        self.real_stdout = sys.stdout
+        sys.stdout = self.stdout
+
+    def because_we_run_the_module(self):
+        run_object(self.module, [self.plugin])
+
+    def it_should_report_the_classes_in_order(self):
+        calls = [c for c in self.plugin.mock_calls if c[0] in ('test_class_started', 'test_class_ended')]
+        assert calls == [
+            mock.call.test_class_started(self.module.Spec1),
+            mock.call.test_class_ended(self.module.Spec1),
+            mock.call.test_class_started(self.module.Spec2),
+            mock.call.test_class_ended(self.module.Spec2)
+        ]
+
+    def it_should_report_the_passing_assertion(self):
+        self.plugin.assertion_passed.assert_called_once_with(self.module.Spec1.it_should_pass)
+
+    def it_should_report_the_failing_assertion_with_its_message(self):
+        (func, exception), _ = self.plugin.assertion_failed.call_args
+        assert func is self.module.Spec2.it_should_fail
+        assert str(exception) == "failed in a worker"
+
+    def it_should_wrap_the_suite_in_suite_notifications(self):
+        self.plugin.suite_started.assert_called_once_with(self.module)
+        self.plugin.suite_ended.assert_called_once_with(self.module)
+
+    def it_should_run_the_tests_in_another_process(self):
+        pid = int(self.stdout.getvalue())
+        assert pid != os.getpid()
+
+    def cleanup_stdout(self):
+        sys.stdout = self.real_stdout
+
+
+class WhenPluginsHaveBeenToldAboutAFailure:
+    def establish_that_a_plugin_keeps_the_exception(self):
+        class TestSpec:
+            def it_should_fail(s):
+                TestSpec.instance = weakref.ref(s)
+                raise AssertionError("failed")
+        self.spec = TestSpec
+
+        class KeepingPlugin:
+            def identify_method(s, func):
+                return ASSERTION
+
+            def assertion_failed(s, func, exception):
+                s.exception = exception
+                s.formatted = FormattedException.from_exception(exception)
+        self.plugin = KeepingPlugin()
+
+    def because_we_run_the_spec(self):
+        run_object(self.spec, [self.plugin])
+        gc.collect()
+
+    def it_should_give_the_plugin_the_traceback_while_the_hook_is_running(self):
+        assert 'raise AssertionError("failed")' in '\n'.join(self.plugin.formatted.traceback_lines)
+
+    def it_should_record_where_the_exception_came_from(self):
+        assert self.plugin.formatted.filename == __file__
+
+    def it_should_let_go_of_the_traceback_afterwards(self):
+        assert self.plugin.exception.__traceback__ is None
+
+    def it_should_not_keep_the_test_instance_alive(self):
+        assert self.spec.instance() is None
+
+
+class WhenSchedulingClassesForWorkerProcesses:
+    def establish_that_plugins_remember_how_long_some_classes_took(self):
+        class Quick:
+            pass
+
+        class Slow:
+            pass
+
+        class Unknown:
+            pass
+        self.classes = [Quick, Slow, Unknown]
+        durations = {Quick: 1, Slow: 10}
+
+        self.plugin = Mock(spec=PluginInterface)
+        self.plugin.get_expected_duration.side_effect = lambda cls: durations.get(cls)
+        composite = contexts.core.PluginComposite([self.plugin])
+        self.pool = WorkerPool(self.classes, composite, 2, None)
+
+    def because_we_schedule_the_classes(self):
+        self.schedule = self.pool.schedule()
+
+    def it_should_start_the_slowest_class_first(self):
+        assert self.schedule[0] == 1
+
+    def it_should_schedule_every_class_once(self):
+        assert sorted(self.schedule) == [0, 1, 2]
+
+
+class WhenRunningClassesInWorkerProcesses:
+    def establish_that_there_is_a_module_with_two_classes(self):
+        class Spec1:
+            def it_should_pass(self):
+                pass
+
+        class Spec2:
+            def it_should_pass(self):
+                pass
+        self.module = types.ModuleType('parallel_timing_module')
+        self.module.Spec1 = Spec1
+        self.module.Spec2 = Spec2
+
+        self.plugin = Mock(spec=PluginInterface)
+        self.plugin.get_process_count.return_value = 2
+        self.plugin.identify_class.return_value = CONTEXT
+        self.plugin.identify_method.return_value = ASSERTION
+        self.plugin.get_exit_code.return_value = None
+
+    def because_we_run_the_module(self):
+        run_object(self.module, [self.plugin])
+
+    def it_should_ask_how_long_each_class_will_take(self):
+        assert self.plugin.get_expected_duration.call_count == 2
+
+    def it_should_report_how_long_each_class_took(self):
+        timed = [c[0] for c in self.plugin.test_class_timed.call_args_list]
+        assert [cls for cls, _ in timed] == [self.module.Spec1, self.module.Spec2]
+        assert all(isinstance(duration, float) for _, duration in timed)
+
+
+class WhenAWorkerProcessDies:
+    def establish_that_one_class_kills_its_process(self):
+        class Dying:
+            def it_should_die(self):
+                os._exit(1)
+
+        class Surviving:
+            def it_should_pass(self):
+                pass
+        self.module = types.ModuleType('parallel_dying_module')
+        self.module.Dying = Dying
+        self.module.Surviving = Surviving
+
+        self.plugin = Mock(spec=PluginInterface)
+        self.plugin.get_process_count.return_value = 2
+        self.plugin.identify_class.return_value = CONTEXT
+        self.plugin.identify_method.return_value = ASSERTION
+        self.plugin.get_exit_code.return_value = None
+
+    def because_we_run_the_module(self):
+        run_object(self.module, [self.plugin])
+
+    def it_should_report_that_the_class_errored(self):
+        (cls, exception), _ = self.plugin.test_class_errored.call_args
+        assert cls is self.module.Dying
+        assert 'exited unexpectedly (exit code 1)' in str(exception)
+
+    def it_should_carry_on_with_the_other_class(self):
+        self.plugin.assertion_passed.assert_called_once_with(self.module.Surviving.it_should_pass)
+
+
+class WhenATestInAWorkerProcessStartsAProcess:
+    def establish_that_the_test_uses_multiprocessing(self):
+        class Spec:
+            def it_should_start_a_process(self):
+                process = multiprocessing.Process(target=int)
+                process.start()
+                process.join()
+                assert process.exitcode == 0
+
+        class Other:
+            def it_should_pass(self):
+                pass
+        self.module = types.ModuleType('parallel_multiprocessing_module')
+        self.module.Spec = Spec
+        self.module.Other = Other
+
+        self.plugin = Mock(spec=PluginInterface)
+        self.plugin.get_process_count.return_value = 2
+        self.plugin.identify_class.return_value = CONTEXT
+        self.plugin.identify_method.return_value = ASSERTION
+        self.plugin.get_exit_code.return_value = None
+
+    def because_we_run_the_module(self):
+        run_object(self.module, [self.plugin])
+
+    def it_should_not_report_any_errors(self):
+        assert not self.plugin.assertion_errored.called
+        assert not self.plugin.assertion_failed.called
+        assert not self.plugin.test_class_errored.called
+
+    def it_should_run_both_tests(self):
+        assert self.plugin.assertion_passed.call_count == 2
+
+
+class WhenRunningAClassWithManyExamples:
+    def establish_that_the_spec_is_parametrised(self):
+        self.log = []
+
+        class Spec:
+            @classmethod
+            def method_zero(cls):
+                yield from range(5)
+
+            def method_one(s, example):
+                self.log.append(example)
+
+            def method_two(s, a):
+                self.log.append(a)
+
+        self.spec = Spec
+        self.plugin = Mock(spec=PluginInterface)
+        self.plugin.identify_method.side_effect = lambda meth: {
+            Spec.method_zero: EXAMPLES,
+            Spec.method_one: SETUP,
+            Spec.method_two: ASSERTION
+        }[meth]
+
+    def because_we_run_the_spec(self):
+        with mock.patch.object(inspect, 'signature', wraps=inspect.signature) as self.signature:
+            run_object(self.spec, [self.plugin])
+
+    def it_should_pass_every_value_to_the_methods(self):
+        assert self.log == [0, 0, 1, 1, 2, 2, 3, 3, 4, 4]
+
+    def it_should_only_inspect_each_method_once(self):
+        inspected = [c[1][0].__func__ for c in self.signature.mock_calls if hasattr(c[1][0], '__func__')]
+        assert sorted(f.__name__ for f in inspected) == ['<lambda>', 'method_one', 'method_two']
+
+
+class WhenRunningSeveralClassesWithASharedSuperclass:
+    def establish_that_two_specs_share_a_superclass(self):
+        class Base:
+            def method_one(s):
+                pass
+
+        class Spec1(Base):
+            def method_two(s):
+                pass
+
+        class Spec2(Base):
+            def method_two(s):
+                pass
+
+        self.base = Base
+        self.module = types.ModuleType('fake_specs')
+        self.module.Spec1 = Spec1
+        self.module.Spec2 = Spec2
+
+        self.plugin = Mock(spec=PluginInterface)
+        self.plugin.identify_class.return_value = CONTEXT
+        self.plugin.identify_method.return_value = ASSERTION
+
+    def because_we_run_the_module(self):
+        run_object(self.module, [self.plugin])
+
+    def it_should_identify_the_superclass_method_once(self):
+        assert self.plugin.identify_method.call_args_list.count(mock.call(self.base.method_one)) == 1
+
+    def it_should_identify_each_subclass_method(self):
+        self.plugin.identify_method.assert_any_call(self.module.Spec1.__dict__['method_two'])
+        self.plugin.identify_method.assert_any_call(self.module.Spec2.__dict__['method_two'])
+
+
+class WhenRunningAClassAgainWithDifferentPlugins:
+    def establish_that_the_class_has_been_run_once(self):
+        class Spec:
+            def method(s):
+                pass
+        self.spec = Spec
+        first_plugin = Mock(spec=PluginInterface)
+        first_plugin.identify_method.return_value = ASSERTION
+        run_object(self.spec, [first_plugin])
+
+        self.plugin = Mock(spec=PluginInterface)
+        self.plugin.identify_method.return_value = ASSERTION
+
+    def because_we_run_the_class_again(self):
+        run_object(self.spec, [self.plugin])
+
+    def it_should_ask_the_new_plugins_to_identify_the_methods(self):
+        self.plugin.identify_method.assert_called_once_with(self.spec.method)
+
+
+class WhenAModuleWhichHasBeenRunIsDropped:
+    def establish_that_a_module_has_been_run(self):
+        module = types.ModuleType('dropped_specs')
+        exec("""
+class Base:
+    def it_should_pass(self):
+        pass
+
+class Spec(Base):
+    def it_should_call_the_superclass(self):
+        super().it_should_pass()
+""", vars(module))
+
+        class IdentifyingPlugin:
+            def identify_class(s, cls):
+                return CONTEXT
+
+            def identify_method(s, func):
+                return ASSERTION
+        run_object(module, [IdentifyingPlugin()])
+        self.spec = weakref.ref(module.Spec)
+
+    def because_we_drop_the_module(self):
+        gc.collect()
+
+    def it_should_let_go_of_the_spec_class(self):
+        assert self.spec() is None
+
+
+class WhenCallingAHookWhichOnlySomePluginsImplement:
+    def establish_that_one_plugin_does_not_implement_the_hook(self):
+        self.unimplemented = Mock(spec=PluginInterface)
+        del self.unimplemented.get_exit_code
+        self.declining = Mock(spec=PluginInterface)
+        self.declining.get_exit_code.return_value = None
+        self.answering = Mock(spec=PluginInterface)
+        self.answering.get_exit_code.return_value = 3
+        self.too_late = Mock(spec=PluginInterface)
+        self.composite = contexts.core.PluginComposite([self.unimplemented, self.declining, self.answering, self.too_late])
+
+    def because_we_call_the_hook(self):
+        self.result = self.composite.get_exit_code()
+
+    def it_should_return_the_first_reply(self):
+        assert self.result == 3
+
+    def it_should_ask_the_plugins_ahead_of_the_one_that_replied(self):
+        self.declining.get_exit_code.assert_called_once_with()
+
+    def it_should_not_ask_the_plugins_behind_the_one_that_replied(self):
+        assert not self.too_late.get_exit_code.called
+
+
+class WhenCallingAHookWhichNoPluginImplements:
+    def establish_that_nobody_implements_the_hook(self):
+        self.composite = contexts.core.PluginComposite([object(), object()])
+
+    def because_we_call_the_hook(self):
+        self.result = self.composite.identify_class(object)
+
+    def it_should_return_none(self):
+        assert self.result is None
+
+
+class WhenAskingThePluginCompositeForSomethingWhichIsNotAHook:
+    def establish_that_a_plugin_has_an_extra_method(self):
+        plugin = Mock(spec=PluginInterface)
+        plugin.not_a_hook = lambda: None
+        self.composite = contexts.core.PluginComposite([plugin])
+
+    def because_we_ask_for_the_method(self):
+        self.exception = contexts.catch(lambda: self.composite.not_a_hook)
+
+    def it_should_throw_an_attribute_error(self):
+        assert isinstance(self.exception, AttributeError)
+
+
 if __name__ == "__main__":
     contexts.main()
@@ -0,0 +1,226 @@
+import builtins
+import os
+import shutil
+import sys
+import types
+import contexts
+from unittest import mock
+from .tools import run_object
+from contexts.plugin_interface import PluginInterface, TEST_FOLDER, TEST_FILE
+from contexts.plugins.importing import Importer
+from contexts.watching import Watcher
+from contexts.__main__ import parse_run_mode
+
+
+THIS_FILE = os.path.realpath(__file__)
+TEST_DATA_DIR = os.path.join(os.path.dirname(THIS_FILE), 'test_data')
+
+
+class WatcherSharedContext:
+    def establish_that_a_watched_folder_has_been_run(self):
+        self.folder_path = os.path.realpath(os.path.join(TEST_DATA_DIR, 'watched_folder_' + str(os.getpid())))
+        os.mkdir(self.folder_path)
+        for module_name in ["test_file1", "test_file2"]:
+            self.write_file(module_name)
+
+        self.watcher = Watcher()
+        run_object(self.folder_path, [self.watcher, self.create_plugin()])
+        self.watcher.take_snapshot()
+        self.plugin = self.create_plugin()
+
+    def create_plugin(self):
+        plugin = mock.Mock(spec=PluginInterface)
+        plugin.identify_folder.return_value = TEST_FOLDER
+        plugin.identify_file.return_value = TEST_FILE
+        plugin.import_module.return_value = None
+        return plugin
+
+    def write_file(self, module_name):
+        with open(os.path.join(self.folder_path, module_name) + ".py", 'w+') as f:
+            f.write('')
+
+    def touch(self, path):
+        # make sure the mtime changes, even on file systems with coarse timestamps
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def rerun(self):
+        self.watcher.invalidate(self.watcher.find_changes())
+        run_object(self.folder_path, [self.watcher, self.plugin])
+
+    def cleanup_the_file_system(self):
+        shutil.rmtree(self.folder_path)
+
+
+class WhenAWatchedTestFileChanges(WatcherSharedContext):
+    def context(self):
+        self.touch(os.path.join(self.folder_path, "test_file1.py"))
+
+    def because_we_run_the_folder_again(self):
+        self.rerun()
+
+    def it_should_only_import_the_changed_file(self):
+        assert self.plugin.import_module.call_args_list == [
+            mock.call(self.folder_path, "test_file1")
+        ]
+
+
+class WhenATestFileIsAddedToAWatchedFolder(WatcherSharedContext):
+    def context(self):
+        self.write_file("test_file3")
+        self.touch(self.folder_path)
+
+    def because_we_run_the_folder_again(self):
+        self.rerun()
+
+    def it_should_only_import_the_new_file(self):
+        assert self.plugin.import_module.call_args_list == [
+            mock.call(self.folder_path, "test_file3")
+        ]
+
+
+class WhenNothingHasChangedInAWatchedFolder(WatcherSharedContext):
+    def because_we_look_for_changes(self):
+        self.changes = self.watcher.find_changes()
+
+    def it_should_not_find_any(self):
+        assert self.changes == set()
+
+
+class WhenAModuleWhichOnlySomeTestsDependOnChanges:
+    def establish_that_the_tests_imported_some_modules(self):
+        self.folder_path = os.path.realpath(os.path.join(TEST_DATA_DIR, 'dependency_folder'))
+        os.mkdir(self.folder_path)
+        self.write_module("watched_dependency", "VALUE = 1")
+        self.write_module("watched_dependent", "import watched_dependency")
+        self.write_module("test_uses_dependency", "from watched_dependent import watched_dependency")
+        self.write_module("test_independent", "import os")
+        sys.path.insert(0, self.folder_path)
+
+        self.watcher = Watcher()
+        run_object(self.folder_path, [self.watcher, self.create_plugin()])
+        self.watcher.take_snapshot()
+        self.old_dependent = sys.modules['watched_dependent']
+        self.plugin = self.create_plugin()
+        self.touch(os.path.join(self.folder_path, "watched_dependency.py"))
+
+    def create_plugin(self):
+        plugin = mock.Mock(spec=PluginInterface)
+        plugin.identify_folder.return_value = TEST_FOLDER
+        plugin.identify_file.side_effect = lambda path: TEST_FILE if os.path.basename(path).startswith('test') else None
+        plugin.import_module.side_effect = Importer().import_module
+        return plugin
+
+    def write_module(self, module_name, source):
+        with open(os.path.join(self.folder_path, module_name) + ".py", 'w+') as f:
+            f.write(source)
+
+    def touch(self, path):
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def because_we_run_the_folder_again(self):
+        self.watcher.invalidate(self.watcher.find_changes())
+        run_object(self.folder_path, [self.watcher, self.plugin])
+
+    def it_should_only_import_the_test_file_which_depends_on_it(self):
+        assert self.plugin.import_module.call_args_list == [
+            mock.call(self.folder_path, "test_uses_dependency")
+        ]
+
+    def it_should_reimport_the_modules_in_between(self):
+        assert sys.modules['watched_dependent'] is not self.old_dependent
+
+    def cleanup_the_file_system(self):
+        shutil.rmtree(self.folder_path)
+        sys.path.remove(self.folder_path)
+        for module_name in ["watched_dependency", "watched_dependent", "test_uses_dependency", "test_independent"]:
+            sys.modules.pop(module_name, None)
+
+
+class WhenAWatchedTestImportsSomethingWhichIsNotAModule:
+    def establish_that_sys_dot_modules_contains_an_object(self):
+        self.folder_path = os.path.realpath(os.path.join(TEST_DATA_DIR, 'odd_import_folder'))
+        os.mkdir(self.folder_path)
+        with open(os.path.join(self.folder_path, 'test_odd_import.py'), 'w+') as f:
+            f.write("import builtins\nimport not_a_module\nIMPORT_DURING_RUN = builtins.__import__\n")
+        sys.modules['not_a_module'] = object()
+        self.original_import = builtins.__import__
+
+        self.plugin = mock.Mock(spec=PluginInterface)
+        self.plugin.identify_folder.return_value = TEST_FOLDER
+        self.plugin.identify_file.return_value = TEST_FILE
+        self.plugin.import_module.side_effect = Importer().import_module
+
+    def because_we_run_the_folder(self):
+        run_object(self.folder_path, [Watcher(), self.plugin])
+
+    def it_should_import_the_test_file(self):
+        assert 'test_odd_import' in sys.modules
+        assert not self.plugin.unexpected_error.called
+
+    def it_should_not_replace_the_import_function_everywhere_else(self):
+        assert sys.modules['test_odd_import'].IMPORT_DURING_RUN is self.original_import
+
+    def cleanup_the_file_system(self):
+        shutil.rmtree(self.folder_path)
+        for module_name in ["not_a_module", "test_odd_import"]:
+            sys.modules.pop(module_name, None)
+
+
+class WhenAModuleWhichIsNotATestModuleChanges:
+    def establish_that_some_modules_have_been_imported(self):
+        self.test_file = os.path.realpath('/some/folder/test_file.py')
+        self.source_file = os.path.realpath('/some/folder/source.py')
+
+        self.test_module = types.ModuleType('watched_test_module')
+        self.test_module.__file__ = self.test_file
+        self.source_module = types.ModuleType('watched_source_module')
+        self.source_module.__file__ = self.source_file
+        sys.modules['watched_test_module'] = self.test_module
+        sys.modules['watched_source_module'] = self.source_module
+
+        self.watcher = Watcher()
+        self.watcher.test_files = {self.test_file}
+
+    def because_the_source_module_changes(self):
+        self.watcher.invalidate({self.source_file})
+
+    def it_should_treat_every_test_file_as_affected(self):
+        assert self.watcher.affected == {self.test_file}
+
+    def it_should_forget_the_changed_module(self):
+        assert 'watched_source_module' not in sys.modules
+
+    def it_should_forget_the_test_module_so_it_gets_run_again(self):
+        assert 'watched_test_module' not in sys.modules
+
+    def cleanup_sys_dot_modules(self):
+        sys.modules.pop('watched_test_module', None)
+        sys.modules.pop('watched_source_module', None)
+
+
+class WhenAskedToWatch:
+    def because_we_parse_the_run_mode(self):
+        self.mode, self.argv = parse_run_mode(['specs', '--watch', '--no-random'])
+
+    def it_should_watch(self):
+        assert self.mode.watch
+
+    def it_should_pass_the_other_arguments_on(self):
+        assert self.argv == ['specs', '--no-random']
+
+
+class WhenAnotherOptionsValueMentionsWatch:
+    def because_we_parse_the_run_mode(self):
+        self.mode, self.argv = parse_run_mode(['--argv', 'specs --watch', '--no-random'])
+
+    def it_should_not_watch(self):
+        assert not self.mode.watch
+
+    def it_should_leave_the_arguments_alone(self):
+        assert self.argv == ['--argv', 'specs --watch', '--no-random']
+
+
+if __name__ == "__main__":
+    contexts.main()
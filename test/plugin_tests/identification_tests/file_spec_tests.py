@@ -148,3 +148,18 @@ class When_a_file_is_not_listed_in_the_spec(FileSpecContext):
 
     def it_should_not_identify_the_file_for_tests(self):
         assert(self.result is None)
+
+
+class When_the_discovery_index_asks_for_a_key(FileSpecContext):
+
+    def given_a_file_spec(self):
+        self.testfile = self.make_path("acceptance", "herbivores", "cows.py")
+        file_spec = io.StringIO(self.testfile)
+        self.spec = FileSpecIdentifier()
+        self.spec.initialise(file=file_spec, cwd=self.tempdir.name)
+
+    def because_we_ask_for_the_key(self):
+        self.result = self.spec.get_discovery_index_key()
+
+    def it_should_include_the_paths_in_the_spec(self):
+        assert(self.result == [self.testfile])
@@ -2,9 +2,11 @@ import importlib
 import os
 import shutil
 import sys
+from unittest import mock
 import contexts
-from contexts import action, assertion
-from contexts.plugins.importing.assertion_rewriting import AssertionRewritingImporter
+from contexts import action, assertion, distributions
+from contexts.plugins.importing import assertion_rewriting
+from contexts.plugins.importing.assertion_rewriting import AssertionRewritingImporter, AssertionRewritingLoader
 
 
 THIS_FILE = os.path.realpath(__file__)
@@ -14,17 +16,19 @@ TEST_DATA_DIR = os.path.join(os.path.dirname(THIS_FILE), os.pardir, "test_data",
 class AssertionRewritingSharedContext:
     def establish(self):
         self.module_name = "assertion_rewriting_test_data"
+        # each process gets its own folder, so that the classes can be run in parallel
+        self.test_data_dir = TEST_DATA_DIR + '_' + str(os.getpid())
         self.old_sys_dot_modules = sys.modules.copy()
         self.importer = AssertionRewritingImporter()
 
     def write_file(self):
-        self.filename = os.path.join(TEST_DATA_DIR, self.module_name + ".py")
-        os.mkdir(TEST_DATA_DIR)
+        self.filename = os.path.join(self.test_data_dir, self.module_name + ".py")
+        os.mkdir(self.test_data_dir)
         with open(self.filename, 'w') as f:
             f.write(self.code)
 
     def cleanup_the_filesystem_and_sys_dot_modules(self):
-        shutil.rmtree(TEST_DATA_DIR)
+        shutil.rmtree(self.test_data_dir)
         del sys.modules[self.module_name]
         importlib.invalidate_caches()
 
@@ -40,7 +44,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     def it_should_not_change_the_message(self):
@@ -57,7 +61,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -84,7 +88,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -108,7 +112,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -136,7 +140,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -158,7 +162,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     def it_should_only_call_the_function_once(self):
@@ -184,7 +188,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     def it_should_only_call_the_function_once(self):
@@ -214,7 +218,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -236,7 +240,7 @@ def assertion_func():
 
 #     @action
 #     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-#         self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+#         self.module = self.importer.import_module(self.test_data_dir, self.module_name)
 #         self.exc = contexts.catch(self.module.assertion_func)
 
 #     def the_exception_should_have_the_correct_line_number(self):
@@ -269,7 +273,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -299,7 +303,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     def it_should_only_call_the_function_once(self):
@@ -331,7 +335,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     def it_should_only_call_the_function_once(self):
@@ -361,7 +365,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -388,7 +392,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -415,7 +419,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -442,7 +446,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -469,7 +473,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -496,7 +500,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -523,7 +527,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -550,7 +554,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -577,7 +581,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -605,7 +609,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -632,7 +636,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -658,7 +662,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -684,7 +688,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -704,7 +708,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -724,7 +728,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -742,7 +746,7 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
@@ -760,9 +764,173 @@ def assertion_func():
 
     @action
     def when_we_import_the_module_and_prompt_it_to_raise_the_exception(self):
-        self.module = self.importer.import_module(TEST_DATA_DIR, self.module_name)
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
         self.exc = contexts.catch(self.module.assertion_func)
 
     @assertion
     def the_exception_should_be_given_a_generated_message(self):
         assert self.exc.args[0] == "Not all elements of [True, 1, 0, False, '', 'hello'] were truthy. First falsy element: 0 at position 2"
+
+
+class WhenImportingARewrittenModuleForTheSecondTime(AssertionRewritingSharedContext):
+    def context(self):
+        self.dont_write_bytecode = sys.dont_write_bytecode
+        sys.dont_write_bytecode = False
+        self.code = """
+def assertion_func():
+    assert 1 == 2
+"""
+        self.write_file()
+        AssertionRewritingLoader(self.module_name, self.filename).get_code(self.module_name)
+
+    @action
+    def when_we_import_the_module_again(self):
+        with mock.patch.object(AssertionRewritingLoader, 'source_to_code') as self.source_to_code:
+            self.module = self.importer.import_module(self.test_data_dir, self.module_name)
+        self.exc = contexts.catch(self.module.assertion_func)
+
+    def it_should_write_the_rewritten_code_to_its_own_cache_file(self):
+        cache_dir = os.path.join(self.test_data_dir, '__pycache__')
+        assert os.listdir(cache_dir) == [self.module_name + '.' + sys.implementation.cache_tag + '-contexts.pyc']
+
+    def it_should_not_rewrite_the_source_again(self):
+        assert not self.source_to_code.called
+
+    def it_should_use_the_rewritten_code(self):
+        assert self.exc.args[0] == "Asserted 1 == 2 but found them not to be equal"
+
+    def cleanup_dont_write_bytecode(self):
+        sys.dont_write_bytecode = self.dont_write_bytecode
+
+
+class WhenImportingARewrittenModuleWhichHasChanged(AssertionRewritingSharedContext):
+    def context(self):
+        self.dont_write_bytecode = sys.dont_write_bytecode
+        sys.dont_write_bytecode = False
+        self.code = """
+def assertion_func():
+    assert 1 == 2
+"""
+        self.write_file()
+        AssertionRewritingLoader(self.module_name, self.filename).get_code(self.module_name)
+
+        with open(self.filename, 'w') as f:
+            f.write("""
+def assertion_func():
+    assert 1 == 2 + 3
+""")
+
+    @action
+    def when_we_import_the_module_again(self):
+        self.module = self.importer.import_module(self.test_data_dir, self.module_name)
+        self.exc = contexts.catch(self.module.assertion_func)
+
+    def it_should_rewrite_the_new_source(self):
+        assert self.exc.args[0] == "Asserted 1 == 5 but found them not to be equal"
+
+    def cleanup_dont_write_bytecode(self):
+        sys.dont_write_bytecode = self.dont_write_bytecode
+
+
+class WhenImportingARewrittenModuleDatedBefore1970(AssertionRewritingSharedContext):
+    def context(self):
+        self.dont_write_bytecode = sys.dont_write_bytecode
+        sys.dont_write_bytecode = False
+        self.code = """
+def assertion_func():
+    assert 1 == 2
+"""
+        self.write_file()
+        os.utime(self.filename, ns=(-10 ** 9, -10 ** 9))
+        AssertionRewritingLoader(self.module_name, self.filename).get_code(self.module_name)
+
+    @action
+    def when_we_import_the_module_again(self):
+        with mock.patch.object(AssertionRewritingLoader, 'source_to_code') as self.source_to_code:
+            self.module = self.importer.import_module(self.test_data_dir, self.module_name)
+        self.exc = contexts.catch(self.module.assertion_func)
+
+    def it_should_use_the_cached_code(self):
+        assert not self.source_to_code.called
+
+    def it_should_use_the_rewritten_code(self):
+        assert self.exc.args[0] == "Asserted 1 == 2 but found them not to be equal"
+
+    def cleanup_dont_write_bytecode(self):
+        sys.dont_write_bytecode = self.dont_write_bytecode
+
+
+class WhenTheRewritersSourceFileCannotBeRead:
+    def establish_that_contexts_was_imported_from_somewhere_unreadable(self):
+        self.file_patch = mock.patch.object(assertion_rewriting, '__file__', os.path.join(THIS_FILE, 'not_a_file.py'))
+        self.fingerprint_patch = mock.patch.object(assertion_rewriting, '_fingerprint', None)
+        self.file_patch.start()
+        self.fingerprint_patch.start()
+
+    def because_we_fingerprint_the_rewriter(self):
+        self.result = assertion_rewriting.rewriter_fingerprint()
+
+    def it_should_use_the_installed_version_instead(self):
+        assert self.result == assertion_rewriting.hash_source(distributions.version('contexts').encode('utf-8'))
+
+    def cleanup_the_patches(self):
+        self.fingerprint_patch.stop()
+        self.file_patch.stop()
+
+
+class WhenModulesArePrecompiledInWorkerProcesses(AssertionRewritingSharedContext):
+    def context(self):
+        self.code = """
+def assertion_func():
+    assert 1 == 2
+"""
+        self.write_file()
+        self.importer.processes = 2
+
+    @action
+    def when_we_process_the_specs_and_then_import_the_module(self):
+        self.importer.process_module_specification_list([(self.test_data_dir, self.module_name)])
+        with mock.patch.object(AssertionRewritingLoader, 'source_to_code') as self.source_to_code:
+            self.module = self.importer.import_module(self.test_data_dir, self.module_name)
+        self.exc = contexts.catch(self.module.assertion_func)
+
+    def it_should_not_rewrite_the_module_in_this_process(self):
+        assert not self.source_to_code.called
+
+    def it_should_use_the_rewritten_code(self):
+        assert self.exc.args[0] == "Asserted 1 == 2 but found them not to be equal"
+
+    def it_should_forget_the_code_once_the_module_is_imported(self):
+        assert self.importer.precompiled == {}
+
+
+class WhenImportingFromAnArchiveWhichContainsRewrittenCode(AssertionRewritingSharedContext):
+    def context(self):
+        self.dont_write_bytecode = sys.dont_write_bytecode
+        sys.dont_write_bytecode = False
+        self.code = """
+def assertion_func():
+    assert 1 == 2
+"""
+        self.write_file()
+        AssertionRewritingLoader(self.module_name, self.filename).get_code(self.module_name)
+        self.archive = shutil.make_archive(self.test_data_dir, 'zip', self.test_data_dir)
+
+    @action
+    def when_we_import_the_module_from_the_archive(self):
+        with mock.patch.object(AssertionRewritingLoader, 'source_to_code') as self.source_to_code:
+            self.module = self.importer.import_module(self.archive, self.module_name)
+        self.exc = contexts.catch(self.module.assertion_func)
+
+    def it_should_not_rewrite_the_source(self):
+        assert not self.source_to_code.called
+
+    def it_should_use_the_rewritten_code(self):
+        assert self.exc.args[0] == "Asserted 1 == 2 but found them not to be equal"
+
+    def it_should_say_the_code_came_from_the_archive(self):
+        assert self.module.assertion_func.__code__.co_filename == os.path.join(self.archive, self.module_name + '.py')
+
+    def cleanup_the_archive(self):
+        os.remove(self.archive)
+        sys.dont_write_bytecode = self.dont_write_bytecode
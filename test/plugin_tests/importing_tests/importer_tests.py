@@ -1,7 +1,9 @@
 import os
 import shutil
 import sys
+import tempfile
 import types
+import zipfile
 import contexts
 from contexts.plugins.importing import Importer
 
@@ -98,7 +100,7 @@ class WhenImportingAMemberOfAPackage:
     def establish_that_there_is_an_already_imported_package_with_a_not_imported_submodule(self):
         self.code = "x = 5"
 
-        self.package_name = "a_package"
+        self.package_name = "a_package_with_a_submodule"
         self.module_name = "a_submodule"
         self.setup_filesystem()
 
@@ -217,7 +219,7 @@ class WhenAFileHasAlreadyBeenImported:
 class WhenADifferentModuleWithTheSameNameHasAlreadyBeenImported:
     def establish_that_we_have_already_imported_the_module(self):
         self.code = "is_fake = False"
-        self.module_name = "already_imported_file"
+        self.module_name = "already_imported_file2"
         self.write_file()
         self.create_fake_module()
 
@@ -252,3 +254,32 @@ class WhenADifferentModuleWithTheSameNameHasAlreadyBeenImported:
         test.__file__ = "made/up/file.py"
         test.TestSpec = TestSpec
         sys.modules[self.module_name] = test
+
+
+class WhenImportingFromAZipArchive:
+    def establish_that_there_is_an_archive_containing_a_package(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.archive = os.path.join(os.path.realpath(self.tempdir.name), 'tests.zip')
+        with zipfile.ZipFile(self.archive, 'w') as z:
+            z.writestr('zipped_package/__init__.py', 'x = 5')
+            z.writestr('zipped_package/zipped_module.py', 'from . import x\ny = x + 1')
+
+        self.importer = Importer()
+
+    def because_we_import_a_package_and_a_submodule(self):
+        self.package = self.importer.import_module(self.archive, 'zipped_package')
+        self.module = self.importer.import_module(self.archive, 'zipped_package.zipped_module')
+
+    def it_should_run_the_code_in_the_package(self):
+        assert self.package.x == 5
+
+    def it_should_run_the_code_in_the_module(self):
+        assert self.module.y == 6
+
+    def it_should_set_the_module_file(self):
+        assert self.module.__file__ == os.path.join(self.archive, 'zipped_package', 'zipped_module.py')
+
+    def cleanup_the_archive_and_sys_dot_modules(self):
+        del sys.modules['zipped_package.zipped_module']
+        del sys.modules['zipped_package']
+        self.tempdir.cleanup()
@@ -0,0 +1,131 @@
+import os
+import pstats
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+import contexts
+from contexts.plugin_interface import NO_EXAMPLE
+from contexts.plugins.identification import NameBasedIdentifier
+from contexts.plugins.profiling import Profiler, ProfileReporter, SamplingRecorder
+from contexts.plugins.test_target_suppliers import ObjectSupplier
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def report_slowly(*args):
+    spin(0.01)
+
+
+def create_profiler(mode, directory):
+    profiler = Profiler()
+    profiler.initialise(mock.Mock(profile=mode, profile_dir=directory), {})
+    return profiler
+
+
+class WhenProfilingAContextWithCProfile:
+    def establish_that_profiling_is_on(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tempdir.name, 'profiles')
+        self.profiler = create_profiler('cprofile', self.directory)
+        self.spec = type('Spec', (), {'__module__': 'test_module'})
+        self.stream = StringIO()
+        self.reporter = ProfileReporter(self.stream)
+        self.reporter.initialise(mock.Mock(profile='cprofile', profile_top=5), {})
+        self.reporter.profiler = self.profiler
+
+    def because_a_spec_runs(self):
+        self.profiler.test_run_started()
+        self.profiler.user_code_started(self.spec, NO_EXAMPLE)
+        spin(0.01)
+        self.profiler.user_code_ended(self.spec, NO_EXAMPLE)
+        spin(0.01)  # not in the spec's code, so it shouldn't be profiled
+        self.profiler.test_run_ended()
+        self.reporter.test_run_ended()
+
+    def it_should_write_a_profile_for_the_module(self):
+        assert os.listdir(self.directory) == ['test_module.pstats']
+
+    def it_should_record_the_code_the_spec_ran(self):
+        stats = pstats.Stats(os.path.join(self.directory, 'test_module.pstats')).stats
+        [(_, call_count, _, _, _)] = [stats[key] for key in stats if key[2] == 'spin']
+        assert call_count == 1
+
+    def it_should_print_a_summary(self):
+        output = self.stream.getvalue()
+        assert output.startswith("Wrote 1 profile to " + self.directory)
+        assert 'Ordered by: internal time' in output
+
+    def cleanup_the_tempdir(self):
+        self.tempdir.cleanup()
+
+
+class WhenProfilingASpecAlongsideASlowPlugin:
+    def establish_that_a_plugin_takes_a_while_to_report_each_assertion(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tempdir.name, 'profiles')
+        self.profiler = create_profiler('cprofile', self.directory)
+
+        class Spec:
+            def because_we_spin(self):
+                spin(0.01)
+
+            def it_should_pass(self):
+                pass
+        self.spec = Spec
+        self.plugin = mock.Mock(assertion_started=report_slowly, assertion_passed=report_slowly, context_ended=report_slowly,
+                                spec=['assertion_started', 'assertion_passed', 'context_ended'])
+
+    def because_we_run_the_spec(self):
+        contexts.run_with_plugins([ObjectSupplier(self.spec), NameBasedIdentifier(), self.plugin, self.profiler])
+        [filename] = os.listdir(self.directory)
+        self.stats = pstats.Stats(os.path.join(self.directory, filename)).stats
+
+    def it_should_profile_the_spec(self):
+        assert any(key[2] == 'spin' for key in self.stats)
+
+    def it_should_not_profile_the_plugin(self):
+        assert not any(key[2] == 'report_slowly' for key in self.stats)
+
+    def cleanup_the_tempdir(self):
+        self.tempdir.cleanup()
+
+
+class WhenProfilingAContextBySampling:
+    def establish_that_the_sampler_is_running(self):
+        self.recorder = SamplingRecorder(interval=0.001)
+        self.recorder.start()
+        self.stream = StringIO()
+
+    def because_a_slow_spec_runs(self):
+        self.recorder.enable('test_module')
+        spin(0.2)
+        self.recorder.disable()
+        self.recorder.stop()
+        self.recorder.print_top(self.stream, 1)
+        self.stacks = [s for s in self.recorder.samples['test_module'] if 'spin (' in s]
+
+    def it_should_sample_the_stack(self):
+        assert self.stacks
+
+    def it_should_put_the_outermost_frame_first(self):
+        for stack in self.stacks:
+            assert stack.index('because_a_slow_spec_runs') < stack.index('spin (')
+
+    def it_should_list_the_function_with_the_most_samples(self):
+        assert self.stream.getvalue().splitlines()[1].endswith('spin ({}:{})'.format(__file__, spin.__code__.co_firstlineno))
+
+
+class WhenProfilingWithSeveralProcesses:
+    def establish_that_profiling_is_on(self):
+        self.profiler = create_profiler('sampling', 'profiles')
+
+    def because_the_process_count_is_requested(self):
+        self.result = self.profiler.get_process_count()
+
+    def it_should_run_the_tests_here(self):
+        assert self.result == 1
@@ -1,6 +1,7 @@
 import datetime
 from io import StringIO
 from unittest import mock
+from contexts.plugin_interface import NO_EXAMPLE
 from contexts.plugins.reporting import cli
 
 
@@ -143,3 +144,37 @@ class WhenTimingATestRun:
 
     def it_should_report_the_total_time_for_the_test_run(self):
         assert self.stringio.getvalue() == "(10.5 seconds)\n"
+
+
+class WhenReportingTheSlowestContexts:
+    def establish_that_we_only_want_the_slowest_two(self):
+        self.stringio = StringIO()
+        self.reporter = cli.DurationsReporter(self.stringio)
+        self.reporter.initialise(mock.Mock(durations=2), {})
+
+        self.quick = type('QuickSpec', (), {})
+        self.slow = type('SlowSpec', (), {})
+        self.medium = type('MediumSpec', (), {})
+        self.broken = type('BrokenSpec', (), {})
+
+    def because_some_specs_run(self):
+        self.run(self.quick, [('setup', 1000000), ('action', 1000000)])
+        self.run(self.slow, [('setup', 2000000000), ('action', 500000000), ('assertions', 0), ('teardown', 0)])
+        self.run(self.medium, [('setup', 0), ('action', 250000000)])
+        self.reporter.context_started(self.broken, NO_EXAMPLE)
+        self.reporter.context_phase_timed(self.broken, NO_EXAMPLE, 'setup', 1000)
+        self.reporter.context_errored(self.broken, NO_EXAMPLE, Exception())
+        self.reporter.test_run_ended()
+
+    def it_should_list_the_slowest_first_with_their_phases(self):
+        assert self.stringio.getvalue() == ("""\
+Slowest 2 contexts:
+  2.500s  Slow spec (setup 2.000s, action 0.500s, assertions 0.000s, teardown 0.000s)
+  0.250s  Medium spec (setup 0.000s, action 0.250s)
+""")
+
+    def run(self, cls, phases):
+        self.reporter.context_started(cls, NO_EXAMPLE)
+        for phase, nanoseconds in phases:
+            self.reporter.context_phase_timed(cls, NO_EXAMPLE, phase, nanoseconds)
+        self.reporter.context_ended(cls, NO_EXAMPLE)
@@ -0,0 +1,104 @@
+import json
+import types
+from io import StringIO
+from contexts.plugins.reporting import jsonlines
+from contexts.plugins.reporting.teamcity import TeamCityReporter
+from contexts.plugin_interface import NO_EXAMPLE
+from .. import tools
+
+
+class JsonLinesSharedContext:
+    def establish_that_the_reporter_writes_to_a_stream(self):
+        self.stream = StringIO()
+        self.stream.close = lambda: None
+        self.reporter = jsonlines.JsonLinesReporter()
+        self.reporter.stream = self.stream
+
+    @property
+    def lines(self):
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+
+class WhenLocatingTheJsonLinesReporter:
+    def because_we_ask_for_its_location(self):
+        self.result = jsonlines.JsonLinesReporter.locate()
+
+    def it_should_come_before_the_teamcity_reporter(self):
+        assert self.result == (None, TeamCityReporter)
+
+
+class WhenAContextRunsWithTheJsonLinesReporter(JsonLinesSharedContext):
+    def context(self):
+        self.module = types.ModuleType('test_module')
+        self.cls = tools.create_context('When_something_happens').cls
+        self.assertion = lambda: None
+        self.assertion.__name__ = 'it_should_pass'
+
+    def because_the_class_runs(self):
+        self.reporter.test_run_started()
+        self.reporter.suite_started(self.module)
+        self.reporter.test_class_started(self.cls)
+        self.reporter.context_started(self.cls, 3)
+        self.reporter.assertion_started(self.assertion)
+        self.reporter.assertion_passed(self.assertion)
+        self.reporter.context_ended(self.cls, 3)
+        self.reporter.test_class_timed(self.cls, 0.25)
+        self.reporter.test_class_ended(self.cls)
+        self.reporter.suite_ended(self.module)
+        self.reporter.test_run_ended()
+
+    def it_should_write_a_line_for_every_event(self):
+        assert [line['event'] for line in self.lines] == [
+            'test_run_started', 'suite_started', 'test_class_started', 'context_started',
+            'assertion_started', 'assertion_passed', 'context_ended', 'test_class_timed',
+            'test_class_ended', 'suite_ended', 'test_run_ended'
+        ]
+
+    def it_should_timestamp_the_lines_in_order(self):
+        times = [line['time'] for line in self.lines]
+        assert times == sorted(times)
+
+    def it_should_describe_the_module(self):
+        assert self.lines[1]['module'] == 'test_module'
+
+    def it_should_describe_the_running_class(self):
+        assert (self.lines[3]['name'], self.lines[3]['example']) == ('When something happens -> 3', '3')
+
+    def it_should_describe_the_assertion(self):
+        assert self.lines[5]['assertion'] == 'it_should_pass'
+
+    def it_should_include_the_duration(self):
+        assert self.lines[7]['duration'] == 0.25
+
+
+class WhenAnAssertionFailsWithTheJsonLinesReporter(JsonLinesSharedContext):
+    def context(self):
+        self.assertion = lambda: None
+        self.assertion.__name__ = 'it_should_fail'
+        try:
+            raise AssertionError("Gotcha")
+        except AssertionError as e:
+            self.exception = e
+
+    def because_the_assertion_fails(self):
+        self.reporter.assertion_failed(self.assertion, self.exception)
+
+    def it_should_include_the_exception_type(self):
+        assert self.lines[0]['exception']['type'] == 'AssertionError'
+
+    def it_should_include_the_message(self):
+        assert self.lines[0]['exception']['message'] == 'Gotcha'
+
+    def it_should_include_the_traceback(self):
+        assert self.lines[0]['exception']['traceback'][0] == 'Traceback (most recent call last):'
+
+    def it_should_include_where_the_exception_was_raised(self):
+        assert self.lines[0]['exception']['file'] == __file__
+
+
+class WhenAContextWithoutExamplesStartsWithTheJsonLinesReporter(JsonLinesSharedContext):
+    def because_a_plain_class_starts(self):
+        self.reporter.context_started(tools.create_context('When_something_happens').cls, NO_EXAMPLE)
+
+    def it_should_write_null_instead_of_a_parameter(self):
+        assert self.lines[0]['example'] is None
@@ -304,3 +304,35 @@ class When_an_assertion_errors(XmlOutputContext):
     @property
     def test(self):
         return self.suite.find('testcase')
+
+
+class When_a_context_ends_before_the_end_of_the_run(XmlOutputContext):
+
+    def because_a_ctx_ends(self):
+        ctx = tools.create_context('When_a_context_ends')
+        assertion = lambda: None
+        assertion.__name__ = 'it_should_be_written_straight_away'
+        try:
+            raise ValueError("Gotcha")
+        except ValueError as e:
+            self.exception = e
+
+        self.xml.context_started(ctx.cls)
+        self.xml.assertion_started(assertion)
+        self.xml.assertion_failed(assertion, self.exception)
+        self.xml.context_ended(ctx.cls)
+        self.xml.writer.file.flush()
+        with open(self.filename, 'rb') as f:
+            self.written = f.read()
+
+    def it_should_have_written_the_suite_to_the_file(self):
+        assert b'<testsuite name="When a context ends"' in self.written
+
+    def it_should_have_written_the_traceback_on_separate_lines(self):
+        assert b'Traceback (most recent call last):\n' in self.written
+
+    def it_should_let_go_of_the_finished_suite(self):
+        assert self.xml.ctx is None
+
+    def cleanup_the_file(self):
+        self.xml.test_run_ended()
@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import tempfile
+import types
+from unittest import mock
+from contexts.plugins.result_cache import ResultCache
+
+
+class PassingClass:
+    def it_passes(self):
+        pass
+
+
+class FailingClass:
+    def it_passes(self):
+        pass
+
+    def it_fails(self):
+        pass
+
+
+class ResultCacheSharedContext:
+    def establish_that_a_previous_run_had_a_failure(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = {'CONTEXTS_CACHE_DIR': self.cache_dir.name}
+
+        first_run = ResultCache()
+        first_run.initialise(mock.Mock(rerun_failures=None, cache_results=True), self.env)
+        first_run.test_class_started(PassingClass)
+        first_run.test_class_timed(PassingClass, 0.5)
+        first_run.test_class_started(FailingClass)
+        first_run.assertion_failed(FailingClass.it_fails, AssertionError())
+        first_run.test_class_timed(FailingClass, 2)
+        first_run.test_run_ended()
+
+        self.this_module = types.ModuleType(__name__)
+        self.other_module = types.ModuleType('some_other_module')
+        self.cache = ResultCache()
+
+    def cleanup_the_cache(self):
+        self.cache_dir.cleanup()
+
+
+class WhenATestRunEnds(ResultCacheSharedContext):
+    def because_we_read_the_cache_file(self):
+        with open(os.path.join(self.cache_dir.name, 'results.json')) as f:
+            self.results = json.load(f)
+
+    def it_should_record_the_passing_class(self):
+        assert self.results[__name__ + ':PassingClass']['failed'] is False
+
+    def it_should_record_the_failing_class(self):
+        assert self.results[__name__ + ':FailingClass']['failed'] is True
+
+    def it_should_record_which_assertions_failed(self):
+        assert self.results[__name__ + ':FailingClass']['failed_assertions'] == ['it_fails']
+
+    def it_should_record_the_durations(self):
+        assert self.results[__name__ + ':PassingClass']['duration'] == 0.5
+        assert self.results[__name__ + ':FailingClass']['duration'] == 2
+
+
+class WhenARunShardedByDurationEnds(ResultCacheSharedContext):
+    def context(self):
+        with open(os.path.join(self.cache_dir.name, 'results.json')) as f:
+            self.results_before = f.read()
+        self.cache.initialise(argparse.Namespace(rerun_failures=None, cache_results=False, shard=(0, 2), shard_by='duration'), self.env)
+        self.cache.test_class_started(PassingClass)
+        self.cache.test_class_timed(PassingClass, 10)
+
+    def because_the_shard_finishes(self):
+        self.cache.test_run_ended()
+
+    def it_should_leave_the_cache_file_alone(self):
+        with open(os.path.join(self.cache_dir.name, 'results.json')) as f:
+            assert f.read() == self.results_before
+
+
+class WhenAskingForTheExpectedDurationOfAClass(ResultCacheSharedContext):
+    def context(self):
+        self.cache.initialise(mock.Mock(rerun_failures=None, cache_results=True), self.env)
+
+    def because_we_ask_for_the_durations(self):
+        self.known = self.cache.get_expected_duration(FailingClass)
+        self.unknown = self.cache.get_expected_duration(ResultCacheSharedContext)
+
+    def it_should_return_the_duration_from_last_time(self):
+        assert self.known == 2
+
+    def it_should_return_none_for_a_class_it_has_never_seen(self):
+        assert self.unknown is None
+
+
+class WhenRunningTheFailuresFirst(ResultCacheSharedContext):
+    def context(self):
+        self.cache.initialise(mock.Mock(rerun_failures='first'), self.env)
+        self.modules = [self.other_module, self.this_module]
+        self.classes = [PassingClass, FailingClass]
+        self.assertions = [FailingClass.it_passes, FailingClass.it_fails]
+
+    def because_we_process_the_lists(self):
+        self.cache.process_module_list(self.modules)
+        self.cache.process_class_list(self.this_module, self.classes)
+        self.cache.process_assertion_list(FailingClass, self.assertions)
+
+    def it_should_move_the_module_with_failures_to_the_front(self):
+        assert self.modules == [self.this_module, self.other_module]
+
+    def it_should_move_the_failing_class_to_the_front(self):
+        assert self.classes == [FailingClass, PassingClass]
+
+    def it_should_move_the_failing_assertion_to_the_front(self):
+        assert self.assertions == [FailingClass.it_fails, FailingClass.it_passes]
+
+
+class WhenRunningOnlyTheLastFailures(ResultCacheSharedContext):
+    def context(self):
+        self.cache.initialise(mock.Mock(rerun_failures='only'), self.env)
+        self.modules = [self.other_module, self.this_module]
+        self.classes = [PassingClass, FailingClass]
+        self.assertions = [FailingClass.it_passes, FailingClass.it_fails]
+
+    def because_we_process_the_lists(self):
+        self.cache.process_module_list(self.modules)
+        self.cache.process_class_list(self.this_module, self.classes)
+        self.cache.process_assertion_list(FailingClass, self.assertions)
+
+    def it_should_remove_the_module_without_failures(self):
+        assert self.modules == [self.this_module]
+
+    def it_should_remove_the_passing_class(self):
+        assert self.classes == [FailingClass]
+
+    def it_should_remove_the_passing_assertion(self):
+        assert self.assertions == [FailingClass.it_fails]
+
+
+class WhenRunningOnlyTheLastFailuresButNothingFailed:
+    def establish_that_there_is_no_cache(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache()
+        self.cache.initialise(mock.Mock(rerun_failures='only'), {'CONTEXTS_CACHE_DIR': self.cache_dir.name})
+        self.classes = [PassingClass, FailingClass]
+
+    def because_we_process_the_class_list(self):
+        self.cache.process_class_list(None, self.classes)
+
+    def it_should_run_everything(self):
+        assert self.classes == [PassingClass, FailingClass]
+
+    def cleanup_the_cache(self):
+        self.cache_dir.cleanup()
+
+
+class WhenTheResultCacheIsNotAskedFor:
+    def establish_that_no_options_were_given(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = {'CONTEXTS_CACHE_DIR': self.cache_dir.name}
+        self.args = argparse.Namespace(rerun_failures=None, cache_results=False, shard_by='name')
+        self.cache = ResultCache()
+
+    def because_we_initialise_the_cache(self):
+        self.result = self.cache.initialise(self.args, self.env)
+
+    def it_should_not_activate(self):
+        assert not self.result
+
+    def cleanup_the_cache(self):
+        self.cache_dir.cleanup()
+
+
+class WhenShardingByDuration:
+    def establish_that_shard_by_duration_was_given(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = {'CONTEXTS_CACHE_DIR': self.cache_dir.name}
+        self.args = argparse.Namespace(rerun_failures=None, cache_results=False, shard_by='duration')
+        self.cache = ResultCache()
+
+    def because_we_initialise_the_cache(self):
+        self.result = self.cache.initialise(self.args, self.env)
+
+    def it_should_activate_to_supply_the_durations(self):
+        assert self.result
+
+    def cleanup_the_cache(self):
+        self.cache_dir.cleanup()
@@ -0,0 +1,96 @@
+import argparse
+import os
+import types
+from unittest import mock
+from contexts.plugins.sharding import Sharder, parse_shard
+
+
+def create_sharder(k, n, by_duration=False, durations=None):
+    sharder = Sharder()
+    sharder.initialise(mock.Mock(shard=(k, n), shard_by='duration' if by_duration else 'name'), {})
+    if durations is not None:
+        sharder.result_cache = mock.Mock()
+        sharder.result_cache.get_module_durations.return_value = durations
+    return sharder
+
+
+class WhenSplittingModulesIntoShards:
+    def establish_that_there_are_lots_of_modules(self):
+        self.specs = [('/tests', 'test_module{}'.format(i)) for i in range(50)]
+        self.sharders = [create_sharder(k, 3) for k in range(3)]
+
+    def because_each_shard_processes_the_list(self):
+        self.shards = []
+        for sharder in self.sharders:
+            specs = list(self.specs)
+            sharder.process_module_specification_list(specs)
+            self.shards.append(specs)
+
+    def it_should_give_every_module_to_exactly_one_shard(self):
+        assert sorted(spec for shard in self.shards for spec in shard) == sorted(self.specs)
+
+    def it_should_give_every_shard_some_modules(self):
+        assert all(self.shards)
+
+
+class WhenAShardContainsAModuleInAPackage:
+    def establish_that_a_package_and_its_module_are_in_different_shards(self):
+        self.package_spec = ('/tests', 'package')
+        self.module_spec = ('/tests', 'package.test_module')
+        self.sharder = create_sharder(0, 2)
+        self.sharder.hash_path = lambda spec: 0 if spec == self.module_spec else 1
+        self.specs = [self.package_spec, self.module_spec]
+
+        self.package = types.ModuleType('package')
+        self.package.__file__ = os.path.join('/tests', 'package', '__init__.py')
+        self.module = types.ModuleType('package.test_module')
+        self.module.__file__ = os.path.join('/tests', 'package', 'test_module.py')
+
+    def because_we_process_the_lists(self):
+        self.sharder.process_module_specification_list(self.specs)
+        self.modules = [self.package, self.module]
+        self.sharder.process_module_list(self.modules)
+
+    def it_should_still_import_the_package(self):
+        assert self.specs == [self.package_spec, self.module_spec]
+
+    def it_should_not_run_the_package(self):
+        assert self.modules == [self.module]
+
+
+class WhenSplittingModulesIntoShardsByDuration:
+    def establish_that_one_module_takes_as_long_as_the_rest(self):
+        self.specs = [('/tests', 'slow'), ('/tests', 'quick1'), ('/tests', 'quick2'), ('/tests', 'unknown')]
+        durations = {'slow': 3, 'quick1': 1, 'quick2': 1}
+        self.sharders = [create_sharder(k, 2, True, durations) for k in range(2)]
+
+    def because_each_shard_processes_the_list(self):
+        self.shards = []
+        for sharder in self.sharders:
+            specs = list(self.specs)
+            sharder.process_module_specification_list(specs)
+            self.shards.append(specs)
+
+    def it_should_put_the_slow_module_on_its_own(self):
+        assert [('/tests', 'slow')] in self.shards
+
+    def it_should_put_the_others_together(self):
+        assert sorted(self.shards[0] + self.shards[1]) == sorted(self.specs)
+
+
+class WhenParsingAShardArgument:
+    def because_we_parse_some_shards(self):
+        self.first = parse_shard('1/4')
+        self.last = parse_shard('4/4')
+        self.exception = None
+        try:
+            parse_shard('5/4')
+        except argparse.ArgumentTypeError as e:
+            self.exception = e
+
+    def it_should_count_shards_from_zero(self):
+        assert self.first == (0, 4)
+        assert self.last == (3, 4)
+
+    def it_should_reject_a_shard_past_the_end(self):
+        assert self.exception is not None